@@ -0,0 +1,46 @@
+"""
+Lazy accessors for the heavy ML backends
+
+TensorFlow/Keras, statsmodels, scikit-learn, pandas and matplotlib each
+cost seconds of import time and hundreds of MB of memory. Web processes and
+non-ML Celery workers never need them, so analytics modules must not import
+them at module level; the code paths that fit or run models call these
+accessors instead.
+"""
+
+import importlib
+import importlib.util
+import sys
+
+# Modules that must not be loaded by web process startup
+HEAVY_MODULES = (
+    'tensorflow', 'keras', 'statsmodels', 'sklearn', 'pandas',
+    'matplotlib', 'seaborn', 'prophet',
+)
+
+
+def keras():
+    return importlib.import_module('tensorflow').keras
+
+
+def sarimax():
+    return importlib.import_module('statsmodels.tsa.statespace.sarimax').SARIMAX
+
+
+def pandas():
+    return importlib.import_module('pandas')
+
+
+def prophet():
+    return importlib.import_module('prophet').Prophet
+
+
+def installed(module):
+    """Whether `module` can be imported, without importing it"""
+    return importlib.util.find_spec(module) is not None
+
+
+def loaded_heavy_modules(modules=None):
+    """Heavy backends already imported into `modules` (this process by default)"""
+    modules = sys.modules if modules is None else modules
+    return [name for name in HEAVY_MODULES if name in modules]
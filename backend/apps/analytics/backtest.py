@@ -0,0 +1,307 @@
+"""
+Forecast accuracy aggregation and rolling-origin backtesting
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from celery.exceptions import SoftTimeLimitExceeded
+from django.db.models import Avg, Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Abs, Cast, Greatest, Power, Sqrt
+from django.utils import timezone
+
+from apps.inventory.models import Product
+
+from .fitters import FITTERS, require_backend, time_budget
+from .forecasting import fit_linear, load_sales_matrix
+from .models import ForecastModel, ProductModelState, SalesForecast
+from .registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Fields stored forecasts can be grouped by
+GROUPINGS = {
+    'model': 'model_id',
+    'product': 'product_id',
+    'category': 'product__category_id',
+}
+DEFAULT_HISTORY_DAYS = 365
+
+
+def accuracy_expression():
+    """
+    Per-row accuracy as a 0..1 fraction, the SQL counterpart of
+    SalesForecast.accuracy_percentage.
+    """
+    actual = Cast('actual_sales', FloatField())
+    predicted = Cast('predicted_sales', FloatField())
+    return Case(
+        When(predicted_sales=0, then=Value(0.0)),
+        default=Greatest(
+            Value(0.0),
+            Value(1.0) - Abs(actual - predicted) / Greatest(actual, predicted),
+        ),
+        output_field=FloatField(),
+    )
+
+
+def accuracy_queryset(group_by=('model',), start_date=None, end_date=None, queryset=None):
+    """
+    MAE, RMSE, MAPE and accuracy of stored forecasts that have actual sales,
+    aggregated in the database and grouped by any of `GROUPINGS`, as a
+    values queryset ordered by the groups (see accuracy_row).
+
+    MAPE only counts days with non-zero actual sales.
+    """
+    unknown = set(group_by) - set(GROUPINGS)
+    if unknown:
+        raise ValueError(f"Unknown grouping: {', '.join(sorted(unknown))}")
+
+    rows = (queryset if queryset is not None else SalesForecast.objects).filter(actual_sales__isnull=False)
+    if start_date:
+        rows = rows.filter(forecast_date__gte=start_date)
+    if end_date:
+        rows = rows.filter(forecast_date__lte=end_date)
+
+    error = Cast(F('actual_sales'), FloatField()) - Cast(F('predicted_sales'), FloatField())
+    return (
+        rows.values(*[GROUPINGS[name] for name in group_by])
+        .annotate(
+            observations=Count('id'),
+            mae=Avg(Abs(error)),
+            rmse=Sqrt(Avg(Power(error, 2))),
+            mape=Avg(Case(
+                When(actual_sales__gt=0, then=Abs(error) / Cast('actual_sales', FloatField())),
+                output_field=FloatField(),
+            )),
+            accuracy=Avg(accuracy_expression()),
+        )
+        .order_by(*[GROUPINGS[name] for name in group_by])
+    )
+
+
+def accuracy_row(row, group_by):
+    """One accuracy_queryset row keyed by the grouping names plus the metrics"""
+    return {
+        **{name: row[GROUPINGS[name]] for name in group_by},
+        **{key: row[key] for key in ('observations', 'mae', 'rmse', 'mape', 'accuracy')},
+    }
+
+
+def stored_accuracy(group_by=('model',), start_date=None, end_date=None, queryset=None):
+    """Every row of accuracy_queryset as a list of dicts (see accuracy_row)"""
+    rows = accuracy_queryset(group_by, start_date, end_date, queryset)
+    return [accuracy_row(row, group_by) for row in rows]
+
+
+def update_model_scores(start_date=None, end_date=None):
+    """
+    Write accuracy_score, mae_score and rmse_score of every model with
+    scored forecasts, from one grouped query and one bulk update.
+    """
+    scores = {row['model']: row for row in stored_accuracy(('model',), start_date, end_date)}
+    models = list(ForecastModel.objects.filter(pk__in=scores).only('pk'))
+    for model in models:
+        for field, value in _score_fields(scores[model.pk]).items():
+            setattr(model, field, value)
+    # updated_at is left alone: it versions the forecast cache, and scores
+    # do not change any forecast
+    ForecastModel.objects.bulk_update(models, ['accuracy_score', 'mae_score', 'rmse_score'], batch_size=500)
+    return len(models)
+
+
+def _score_fields(metrics):
+    return {
+        'accuracy_score': round(min(max(metrics['accuracy'] or 0.0, 0.0), 1.0), 4),
+        'mae_score': round(metrics['mae'] or 0.0, 4),
+        'rmse_score': round(metrics['rmse'] or 0.0, 4),
+    }
+
+
+def rolling_origins(end_date, count, step_days, horizon):
+    """Forecast origins, oldest first, whose full horizon ends by `end_date`"""
+    last = end_date - timedelta(days=horizon - 1)
+    return [last - timedelta(days=step_days * k) for k in reversed(range(count))]
+
+
+def predict_batch(model, matrix, start_date, horizon, product_ids, budget=None):
+    """
+    Forecast every row of a history matrix with `model`'s method.
+
+    LINEAR is one vectorized solve, LSTM rolls the trained network forward
+    for all rows at once, and other types are fitted per product with the
+    stored per-product state (estimated on recent data, so their scores at
+    old origins lean optimistic). Rows whose fit fails fall back to LINEAR.
+    Returns (predictions, number of rows that fell back).
+    """
+    if model.model_type == 'LINEAR':
+        return fit_linear(matrix, start_date, horizon)[0], 0
+    if model.model_type == 'LSTM':
+        return _predict_recurrent_batch(model, matrix, horizon), 0
+
+    fitter = FITTERS.get(model.model_type)
+    require_backend(model.model_type)
+    states = ProductModelState.states_for(model, product_ids)
+    predictions = np.zeros((matrix.shape[0], horizon))
+    failed = np.zeros(matrix.shape[0], dtype=bool)
+    for i, product_id in enumerate(product_ids):
+        if fitter is None:
+            failed[i] = True
+            continue
+        try:
+            with time_budget(budget):
+                predictions[i] = fitter(
+                    matrix[i], start_date, horizon,
+                    {**model.hyperparameters, **states.get(str(product_id), {})},
+                )[0]
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception:
+            failed[i] = True
+    if failed.any():
+        predictions[failed] = fit_linear(matrix[failed], start_date, horizon)[0]
+    return np.clip(predictions, 0, None), int(failed.sum())
+
+
+def _predict_recurrent_batch(model, matrix, horizon):
+    """Roll a sequence model forward one day at a time for every row together"""
+    loaded = model_registry.get(model)
+    lookback = int(model.hyperparameters.get('lookback', 30))
+    window = matrix[:, -lookback:].astype(np.float64)
+    if loaded.scaler is not None:
+        window = loaded.scaler.transform(window.reshape(-1, 1)).reshape(window.shape)
+
+    scaled = np.zeros((matrix.shape[0], horizon))
+    for step in range(horizon):
+        inputs = window[:, -lookback:].astype(np.float32)[:, :, None]
+        scaled[:, step] = np.asarray(loaded.model.predict(inputs, verbose=0)).reshape(-1)
+        window = np.concatenate([window, scaled[:, step:step + 1]], axis=1)
+
+    predictions = scaled
+    if loaded.scaler is not None:
+        predictions = loaded.scaler.inverse_transform(scaled.reshape(-1, 1)).reshape(scaled.shape)
+    return np.clip(predictions, 0, None)
+
+
+def backtest_products(model, product_ids, origins, horizon, history_days=DEFAULT_HISTORY_DAYS, budget=None):
+    """
+    Rolling-origin evaluation of `model` over one chunk of products.
+
+    The sales matrix covering every origin is loaded once; at each origin
+    the model forecasts `horizon` days from the preceding `history_days`
+    and is scored against what was actually sold. Returns per-product,
+    per-horizon-step error sums (summed over origins) so chunks can be
+    merged exactly.
+    """
+    start_date = origins[0] - timedelta(days=history_days)
+    end_date = origins[-1] + timedelta(days=horizon - 1)
+    product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+
+    shape = (len(product_ids), horizon)
+    sums = {name: np.zeros(shape) for name in ('abs', 'sq', 'ape', 'ape_n', 'actual', 'accuracy')}
+    fallbacks = 0
+    for origin in origins:
+        offset = (origin - start_date).days
+        history = matrix[:, offset - history_days:offset]
+        actual = matrix[:, offset:offset + horizon]
+        predicted, failed = predict_batch(
+            model, history, origin - timedelta(days=history_days), horizon, product_ids, budget,
+        )
+        predicted = np.rint(predicted)
+        fallbacks += failed
+
+        error = actual - predicted
+        sums['abs'] += np.abs(error)
+        sums['sq'] += error ** 2
+        selling = actual > 0
+        sums['ape'] += np.where(selling, np.abs(error) / np.where(selling, actual, 1), 0)
+        sums['ape_n'] += selling
+        sums['actual'] += actual
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accuracy = np.where(
+                predicted > 0,
+                np.clip(1 - np.abs(error) / np.maximum(actual, predicted), 0, None),
+                0.0,
+            )
+        sums['accuracy'] += accuracy
+
+    return {
+        'product_ids': [str(product_id) for product_id in product_ids],
+        'origins': len(origins),
+        'fallbacks': fallbacks,
+        **{name: values.tolist() for name, values in sums.items()},
+    }
+
+
+def summarize_backtest(results):
+    """
+    Merge chunk results into overall, per-horizon-step, per-category and
+    per-product metrics.
+    """
+    results = [result for result in results if result['product_ids']]
+    if not results:
+        return None
+    product_ids = [product_id for result in results for product_id in result['product_ids']]
+    origins = results[0]['origins']
+    sums = {
+        name: np.concatenate([np.asarray(result[name]) for result in results])
+        for name in ('abs', 'sq', 'ape', 'ape_n', 'actual', 'accuracy')
+    }
+
+    def metrics(selected, axis):
+        n = selected['abs'].shape[axis] * origins if axis is not None else selected['abs'].size * origins
+        abs_sum = selected['abs'].sum(axis=axis)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'mae': abs_sum / n,
+                'rmse': np.sqrt(selected['sq'].sum(axis=axis) / n),
+                'mape': selected['ape'].sum(axis=axis) / np.maximum(selected['ape_n'].sum(axis=axis), 1),
+                'accuracy': selected['accuracy'].sum(axis=axis) / n,
+            }
+
+    overall = {name: float(value) for name, value in metrics(sums, None).items()}
+    by_horizon = metrics(sums, 0)
+    by_product = metrics(sums, 1)
+
+    categories = {
+        str(product_id): category_id
+        for product_id, category_id in Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id')
+    }
+    category_of = np.array([categories.get(product_id) or 0 for product_id in product_ids])
+    by_category = {}
+    for category_id in np.unique(category_of):
+        selected = {name: values[category_of == category_id] for name, values in sums.items()}
+        by_category[str(category_id)] = {
+            name: round(float(value), 4) for name, value in metrics(selected, None).items()
+        }
+
+    return {
+        'products': len(product_ids),
+        'origins': origins,
+        'fallbacks': sum(result['fallbacks'] for result in results),
+        'overall': {name: round(value, 4) for name, value in overall.items()},
+        'by_horizon': [
+            {'step': step + 1, **{name: round(float(values[step]), 4) for name, values in by_horizon.items()}}
+            for step in range(sums['abs'].shape[1])
+        ],
+        'by_category': by_category,
+        'by_product': {
+            product_id: {name: round(float(values[i]), 4) for name, values in by_product.items()}
+            for i, product_id in enumerate(product_ids)
+        },
+    }
+
+
+def store_backtest(model_id, summary):
+    """
+    Save a backtest summary (without the per-product breakdown) and its
+    overall scores on the ForecastModel
+    """
+    return ForecastModel.objects.filter(pk=model_id).update(
+        backtest_results={
+            'run_at': timezone.now().isoformat(),
+            **{key: value for key, value in summary.items() if key != 'by_product'},
+        },
+        **_score_fields(summary['overall']),
+    )
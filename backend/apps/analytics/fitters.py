@@ -0,0 +1,178 @@
+"""
+Per-product time series fitters used by the forecast job
+"""
+
+import signal
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+
+from . import backends
+
+
+class ForecastTimeout(Exception):
+    """Raised when a single product exceeds its fitting time budget"""
+
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Abort the enclosed block with ForecastTimeout after `seconds`.
+
+    Relies on SIGALRM, so the budget is only enforced in the main thread of
+    a process (which is where Celery prefork workers run tasks).
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum, frame):
+        raise ForecastTimeout(f"Exceeded time budget of {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _arima_orders(hyperparameters):
+    order = tuple(hyperparameters.get('order', (1, 1, 1)))
+    seasonal_order = tuple(hyperparameters.get('seasonal_order', (1, 0, 1, 7)))
+    return order, seasonal_order
+
+
+def sarimax_model(series, order, seasonal_order):
+    return backends.sarimax()(
+        series,
+        order=order,
+        seasonal_order=seasonal_order,
+        enforce_stationarity=False,
+        enforce_invertibility=False,
+    )
+
+
+def fit_arima(series, start_date, horizon, hyperparameters):
+    """
+    Fit a seasonal ARIMA model and forecast `horizon` days ahead.
+
+    When `hyperparameters` carry trained `params` for the product, the
+    series is only filtered with them instead of re-estimating the model.
+    """
+    order, seasonal_order = _arima_orders(hyperparameters)
+    model = sarimax_model(series, order, seasonal_order)
+    if hyperparameters.get('params'):
+        result = model.filter(np.asarray(hyperparameters['params']))
+    else:
+        result = model.fit(disp=False)
+    forecast = result.get_forecast(horizon)
+    bounds = np.asarray(forecast.conf_int(alpha=0.05))
+    return np.asarray(forecast.predicted_mean), bounds[:, 0], bounds[:, 1]
+
+
+def fit_prophet(series, start_date, horizon, hyperparameters):
+    """Fit a Prophet model and forecast `horizon` days ahead"""
+    pd = backends.pandas()
+    Prophet = backends.prophet()
+
+    history = pd.DataFrame({
+        'ds': pd.date_range(start_date, periods=len(series), freq='D'),
+        'y': series,
+    })
+    model = Prophet(interval_width=0.95, **hyperparameters.get('prophet', {}))
+    if hyperparameters.get('init'):
+        model.fit(history, init=hyperparameters['init'])
+    else:
+        model.fit(history)
+    future = model.make_future_dataframe(periods=horizon, include_history=False)
+    forecast = model.predict(future)
+    return (
+        forecast['yhat'].to_numpy(),
+        forecast['yhat_lower'].to_numpy(),
+        forecast['yhat_upper'].to_numpy(),
+    )
+
+
+def train_arima(series, start_date, hyperparameters, previous=None):
+    """
+    Estimate ARIMA parameters for one product.
+
+    Uses the product's cached orders from the order search when it has
+    them, and starts the optimizer from its previous parameters when the
+    orders are unchanged. Returns the state stored for the product.
+    """
+    order, seasonal_order = _arima_orders({**hyperparameters, **(previous or {})})
+    model = sarimax_model(series, order, seasonal_order)
+    start_params = None
+    if previous and previous.get('params') and (
+        tuple(previous.get('order', ())) == order
+        and tuple(previous.get('seasonal_order', ())) == seasonal_order
+    ):
+        start_params = np.asarray(previous['params'])
+    result = model.fit(start_params=start_params, disp=False)
+    return {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'params': [float(value) for value in np.asarray(result.params)],
+    }
+
+
+def train_prophet(series, start_date, hyperparameters, previous=None):
+    """Fit Prophet for one product, warm-started from its previous parameters"""
+    pd = backends.pandas()
+    Prophet = backends.prophet()
+
+    history = pd.DataFrame({
+        'ds': pd.date_range(start_date, periods=len(series), freq='D'),
+        'y': series,
+    })
+    model = Prophet(interval_width=0.95, **hyperparameters.get('prophet', {}))
+    if previous and previous.get('init'):
+        model.fit(history, init=previous['init'])
+    else:
+        model.fit(history)
+    params = model.params
+    return {
+        'init': {
+            'k': float(params['k'][0][0]),
+            'm': float(params['m'][0][0]),
+            'sigma_obs': float(params['sigma_obs'][0][0]),
+            'delta': [float(value) for value in params['delta'][0]],
+            'beta': [float(value) for value in params['beta'][0]],
+        },
+    }
+
+
+FITTERS = {
+    'ARIMA': fit_arima,
+    'PROPHET': fit_prophet,
+}
+
+# Per-product training used by selective retraining
+TRAINERS = {
+    'ARIMA': train_arima,
+    'PROPHET': train_prophet,
+}
+
+# Package each per-product model type is fitted with
+FITTER_PACKAGES = {
+    'ARIMA': 'statsmodels',
+    'PROPHET': 'prophet',
+}
+
+
+def require_backend(model_type):
+    """
+    Raise ImproperlyConfigured when the package that fits `model_type` is
+    not installed, instead of letting every product fail and fall back
+    """
+    package = FITTER_PACKAGES.get(model_type)
+    if package and not backends.installed(package):
+        raise ImproperlyConfigured(
+            f"{model_type} models need the '{package}' package; install it on the ML workers "
+            f"or deactivate the model"
+        )
@@ -0,0 +1,134 @@
+"""
+Read-through Redis cache of serialized forecast horizons
+"""
+
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from inventory_ai.db_routers import primary_reads
+
+from .models import ForecastModel, SalesForecast
+from .serializers import ForecastModelSummarySerializer, SalesForecastSerializer
+
+ACTIVE_MODEL_KEY = 'forecast:active-model'
+FILL_BATCH_SIZE = 500
+
+
+def forecast_cache():
+    return caches[settings.FORECAST_CACHE_ALIAS]
+
+
+def _product_key(active, product_id):
+    # The model's version is part of the key, so editing or retraining a
+    # model orphans every entry of the previous version at once.
+    return f"forecast:{active['model']['id']}:{active['version']}:{product_id}"
+
+
+def _describe(model):
+    return {
+        'model': ForecastModelSummarySerializer(model).data,
+        'version': int(model.updated_at.timestamp() * 1_000_000),
+    }
+
+
+def get_active_model():
+    """Summary of the active ForecastModel, cached until a model changes"""
+    cache = forecast_cache()
+    active = cache.get(ACTIVE_MODEL_KEY)
+    if active is None:
+        model = ForecastModel.get_active()
+        if model is None:
+            return None
+        active = _describe(model)
+        cache.set(ACTIVE_MODEL_KEY, active, settings.FORECAST_CACHE_TIMEOUT)
+    return active
+
+
+def get_many(active, product_ids):
+    """Cached horizons for many products in one round trip; misses are omitted"""
+    keys = {_product_key(active, product_id): str(product_id) for product_id in product_ids}
+    found = forecast_cache().get_many(list(keys))
+    return {keys[key]: value for key, value in found.items()}
+
+
+def slice_horizon(forecasts, start, days):
+    """Entries of a cached horizon from `start` for `days` days"""
+    first = start.isoformat()
+    selected = [entry for entry in forecasts if entry['forecast_date'] >= first]
+    return selected[:days]
+
+
+def load_horizons(active, product_ids=None, start=None):
+    """
+    Yield (product_id, serialized horizon) pairs of the active model from
+    the database, caching them in batches as they are produced.
+
+    Rows are read with one query in (product, forecast_date) order, which
+    matches the SalesForecast (product, forecast_date) index.
+    """
+    start = start or timezone.localdate()
+    rows = SalesForecast.objects.filter(model_id=active['model']['id'], forecast_date__gte=start)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=list(product_ids))
+    rows = rows.order_by('product_id', 'forecast_date').only(
+        'product_id', 'forecast_date', 'predicted_sales', 'confidence_lower',
+        'confidence_upper', 'confidence_level', 'actual_sales',
+    )
+
+    pending = {}
+    for product_id, forecasts in groupby(rows.iterator(chunk_size=2000), key=attrgetter('product_id')):
+        horizon = [dict(SalesForecastSerializer(forecast).data) for forecast in forecasts]
+        pending[_product_key(active, product_id)] = horizon
+        if len(pending) >= FILL_BATCH_SIZE:
+            forecast_cache().set_many(pending, settings.FORECAST_CACHE_TIMEOUT)
+            pending = {}
+        yield str(product_id), horizon
+    if pending:
+        forecast_cache().set_many(pending, settings.FORECAST_CACHE_TIMEOUT)
+
+
+def fill(model, product_ids=None, start=None):
+    """
+    Cache the stored horizons of `model` from `start` onwards.
+
+    Only the active model is cached; horizons of other models are never
+    served. Horizons are read from the primary, since they were usually
+    just written and the replica may not have them yet. Returns the
+    number of products cached.
+    """
+    active = get_active_model()
+    if active is None or active['model']['id'] != model.pk:
+        return 0
+    with primary_reads():
+        return sum(1 for _ in load_horizons(active, product_ids, start))
+
+
+def invalidate_products(model_id, product_ids):
+    """Drop cached horizons of `model_id` for the given products"""
+    # The summary is rebuilt when it has expired: the horizons it versions
+    # outlive it and would be served again under the same version
+    active = get_active_model()
+    if active is None or active['model']['id'] != model_id:
+        return
+    forecast_cache().delete_many([_product_key(active, product_id) for product_id in product_ids])
+
+
+def invalidate_active_model():
+    """Drop the cached summary, for ForecastModel changes made with .update()"""
+    forecast_cache().delete(ACTIVE_MODEL_KEY)
+
+
+def bump_active_version():
+    """
+    Move the active model to a new cache version, orphaning every cached
+    horizon at once. For bulk SQL writes that bypass post_save and touch
+    the forecasts of most products.
+    """
+    model = ForecastModel.get_active()
+    if model is not None:
+        ForecastModel.objects.filter(pk=model.pk).update(updated_at=timezone.now())
+    invalidate_active_model()
@@ -0,0 +1,256 @@
+"""
+Vectorized baseline forecasting across the whole product catalogue
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.utils import timezone
+
+from .fitters import FITTERS, require_backend, time_budget
+from .models import ProductModelState, SalesMetrics
+from .registry import model_registry
+from .training_store import SERIES_COLUMNS, open_store
+from .writers import SalesForecastWriter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DAYS = 365
+CONFIDENCE_Z = 1.96  # 95% interval
+
+
+def load_sales_matrix(product_ids=None, start_date=None, end_date=None, field='quantity_sold'):
+    """
+    Load daily SalesMetrics values into a dense (products x days) matrix.
+
+    Days without a SalesMetrics row are treated as zero sales. Reads from
+    the memory-mapped training store when it covers the requested range,
+    and from the database otherwise. Returns the product ids in row order,
+    the first date of the matrix and the matrix.
+    """
+    end_date = end_date or timezone.localdate() - timedelta(days=1)
+    start_date = start_date or end_date - timedelta(days=DEFAULT_HISTORY_DAYS - 1)
+    n_days = (end_date - start_date).days + 1
+
+    store = open_store() if field in SERIES_COLUMNS else None
+    if store is not None and store.covers(start_date, end_date):
+        product_ids, start_date, matrix = store.series(field, product_ids, start_date, end_date)
+        return product_ids, start_date, np.asarray(matrix, dtype=np.float64)
+
+    rows = SalesMetrics.objects.filter(date__gte=start_date, date__lte=end_date)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    rows = list(rows.order_by().values_list('product_id', 'date', field))
+
+    if product_ids is None:
+        product_ids = sorted({product_id for product_id, _, _ in rows}, key=str)
+    product_ids = list(product_ids)
+    index = {str(product_id): i for i, product_id in enumerate(product_ids)}
+
+    matrix = np.zeros((len(product_ids), n_days), dtype=np.float64)
+    if rows:
+        product_idx = np.fromiter((index[str(row[0])] for row in rows), dtype=np.int64, count=len(rows))
+        day_idx = np.fromiter(((row[1] - start_date).days for row in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+        matrix[product_idx, day_idx] = values
+    return product_ids, start_date, matrix
+
+
+def first_sale_offsets(matrix):
+    """
+    Column of each row's first sale, or the row length for rows without
+    any. Earlier columns are zero-filled days from before the product
+    started selling, not days without demand.
+    """
+    selling = matrix > 0
+    return np.where(selling.any(axis=1), selling.argmax(axis=1), matrix.shape[1])
+
+
+def design_matrix(start_date, n_days, offset=0, scale=None):
+    """
+    Intercept, linear trend and day-of-week dummies (Monday is the baseline).
+
+    Rows start `offset` days after `start_date`; the trend is divided by
+    `scale` (the length of the fitted history) to keep the solve well
+    conditioned.
+    """
+    t = np.arange(offset, offset + n_days)
+    weekday = (start_date.weekday() + t) % 7
+    dummies = (weekday[:, None] == np.arange(1, 7)[None, :]).astype(np.float64)
+    trend = t / float(scale or max(n_days, 1))
+    return np.column_stack([np.ones(n_days), trend, dummies])
+
+
+def fit_linear(matrix, start_date, horizon):
+    """
+    Fit trend plus day-of-week regressions for every row of `matrix` at once.
+
+    All products share the same design matrix, so a single least-squares
+    solve yields the coefficients for the whole catalogue. Returns the
+    (products x horizon) point forecasts and the lower/upper bounds of the
+    95% prediction interval.
+    """
+    n_days = matrix.shape[1]
+    X = design_matrix(start_date, n_days)
+    X_future = design_matrix(start_date, horizon, offset=n_days, scale=n_days)
+    if n_days <= X.shape[1]:
+        X, X_future = X[:, :1], X_future[:, :1]
+
+    XtX_inv = np.linalg.pinv(X.T @ X)
+    coefficients = XtX_inv @ X.T @ matrix.T  # (params x products)
+
+    residuals = matrix - (X @ coefficients).T
+    dof = max(n_days - X.shape[1], 1)
+    sigma = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+
+    predictions = np.clip((X_future @ coefficients).T, 0, None)
+    leverage = np.einsum('ij,jk,ik->i', X_future, XtX_inv, X_future)
+    spread = CONFIDENCE_Z * sigma[:, None] * np.sqrt(1 + leverage)[None, :]
+    lower = np.clip(predictions - spread, 0, None)
+    upper = predictions + spread
+    return predictions, lower, upper
+
+
+def write_forecasts(model, product_ids, first_date, predictions, lower, upper, method='upsert'):
+    """Store (products x horizon) forecast arrays for `model` in bulk"""
+    with SalesForecastWriter(model, method=method) as writer:
+        writer.add_arrays(product_ids, first_date, predictions, lower, upper)
+    return writer.rows_written
+
+
+def run_linear_forecasts(model, product_ids=None, horizon=None, history_days=DEFAULT_HISTORY_DAYS):
+    """
+    Forecast every product with the LINEAR model in one vectorized pass and
+    store the results as SalesForecast rows for `model`.
+    """
+    horizon = horizon or settings.FORECASTING_PERIOD_DAYS
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=history_days - 1)
+
+    product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+    if not product_ids:
+        return 0
+
+    predictions, lower, upper = fit_linear(matrix, start_date, horizon)
+    return write_forecasts(model, product_ids, end_date + timedelta(days=1), predictions, lower, upper)
+
+
+def run_per_product_forecasts(model, product_ids, horizon=None, budget=None,
+                              history_days=DEFAULT_HISTORY_DAYS, recommended=None):
+    """
+    Forecast `product_ids` one series at a time with the model's fitter.
+
+    Every product is fitted under its own time budget. Products whose fit
+    fails or runs out of time get the vectorized LINEAR forecast instead, so
+    one bad series never stalls the batch or leaves a gap. Products whose
+    demand pattern recommends LINEAR (`recommended` maps product ids to
+    model types) skip the fitter and take the vectorized path directly.
+    Returns the number of products forecast as intended and the number
+    that fell back.
+    """
+    horizon = horizon or settings.FORECASTING_PERIOD_DAYS
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=history_days - 1)
+
+    product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+    if not product_ids:
+        return 0, 0
+
+    predictions = np.zeros((len(product_ids), horizon))
+    lower = np.zeros_like(predictions)
+    upper = np.zeros_like(predictions)
+    failed = np.zeros(len(product_ids), dtype=bool)
+    recommended = recommended or {}
+    linear = np.array([recommended.get(str(product_id)) == 'LINEAR' for product_id in product_ids], dtype=bool)
+
+    fitter = FITTERS.get(model.model_type)
+    if not linear.all():
+        require_backend(model.model_type)
+    states = ProductModelState.states_for(model, [product_ids[i] for i in np.flatnonzero(~linear)])
+    for i, product_id in enumerate(product_ids):
+        if linear[i]:
+            continue
+        if fitter is None:
+            failed[i] = True
+            continue
+        try:
+            with time_budget(budget):
+                predictions[i], lower[i], upper[i] = fitter(
+                    matrix[i], start_date, horizon,
+                    {**model.hyperparameters, **states.get(str(product_id), {})},
+                )
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception:
+            logger.warning("%s fit failed for product %s", model.model_type, product_id, exc_info=True)
+            failed[i] = True
+
+    vectorized = failed | linear
+    if vectorized.any():
+        predictions[vectorized], lower[vectorized], upper[vectorized] = fit_linear(
+            matrix[vectorized], start_date, horizon
+        )
+
+    np.clip(predictions, 0, None, out=predictions)
+    np.clip(lower, 0, None, out=lower)
+    write_forecasts(model, product_ids, end_date + timedelta(days=1), predictions, lower, upper)
+
+    n_failed = int(failed.sum())
+    return len(product_ids) - n_failed, n_failed
+
+
+def predict_from_artifacts(forecast_model, product_id, horizon):
+    """
+    Forecast one product on demand from a trained model's artifacts.
+
+    LSTM networks and ARIMA results come from the in-process model
+    registry, so only the first call after a (re)train pays the load cost.
+    Other model types (and ARIMA artifacts that are not statsmodels
+    results) use the LINEAR fit, as the nightly job does when a fit fails.
+    Returns the point forecasts and the lower/upper bounds as 1-D arrays of
+    length `horizon`.
+    """
+    hyperparameters = forecast_model.hyperparameters
+    lookback = int(hyperparameters.get('lookback', 30))
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=lookback - 1)
+    _, _, matrix = load_sales_matrix([product_id], start_date, end_date)
+    history = matrix[0]
+
+    loaded = model_registry.get(forecast_model) if forecast_model.model_type in ('LSTM', 'ARIMA') else None
+    if forecast_model.model_type == 'LSTM':
+        predictions = _predict_recurrent(loaded, history, lookback, horizon)
+        sigma = float(hyperparameters.get('residual_std', history.std()))
+        spread = CONFIDENCE_Z * sigma
+        lower, upper = predictions - spread, predictions + spread
+    elif loaded is not None and hasattr(loaded.model, 'apply'):
+        forecast = loaded.model.apply(history).get_forecast(horizon)
+        bounds = np.asarray(forecast.conf_int(alpha=0.05))
+        predictions, lower, upper = np.asarray(forecast.predicted_mean), bounds[:, 0], bounds[:, 1]
+    else:
+        predictions, lower, upper = (values[0] for values in fit_linear(matrix, start_date, horizon))
+
+    return np.clip(predictions, 0, None), np.clip(lower, 0, None), upper
+
+
+def _predict_recurrent(loaded, history, lookback, horizon):
+    """Roll a sequence model forward one day at a time"""
+    window = history.reshape(-1, 1)
+    if loaded.scaler is not None:
+        window = loaded.scaler.transform(window)
+    window = list(window.ravel())
+
+    scaled = []
+    for _ in range(horizon):
+        inputs = np.asarray(window[-lookback:], dtype=np.float32).reshape(1, lookback, 1)
+        value = float(loaded.model.predict(inputs, verbose=0)[0, 0])
+        scaled.append(value)
+        window.append(value)
+
+    predictions = np.asarray(scaled).reshape(-1, 1)
+    if loaded.scaler is not None:
+        predictions = loaded.scaler.inverse_transform(predictions)
+    return predictions.ravel()
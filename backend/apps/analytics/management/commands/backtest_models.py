@@ -0,0 +1,75 @@
+"""
+Backtest forecast models over rolling origins and compare their accuracy
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.analytics import backtest
+from apps.analytics.models import ForecastModel
+from apps.analytics.tasks import backtest_model
+from apps.inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Evaluate forecast models by replaying them at rolling origins over "
+        "recent history. Queues the work on the ml workers unless --inline is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=int, action='append', dest='models',
+                            help='ForecastModel id (repeat to compare models; defaults to every active model)')
+        parser.add_argument('--origins', type=int, default=settings.BACKTEST_ORIGINS,
+                            help='Number of forecast origins')
+        parser.add_argument('--step', type=int, default=settings.BACKTEST_STEP_DAYS,
+                            help='Days between origins')
+        parser.add_argument('--horizon', type=int, default=settings.FORECASTING_PERIOD_DAYS,
+                            help='Days forecast from each origin')
+        parser.add_argument('--inline', action='store_true',
+                            help='Run in this process and print the comparison instead of queueing')
+
+    def handle(self, *args, **options):
+        models = ForecastModel.objects.all()
+        if options['models']:
+            models = models.filter(pk__in=options['models'])
+        else:
+            models = models.filter(status='ACTIVE')
+        models = list(models)
+        if not models:
+            raise CommandError("No forecast models to backtest")
+
+        if not options['inline']:
+            for model in models:
+                backtest_model.delay(model.pk, options['origins'], options['step'], options['horizon'])
+                self.stdout.write(f"Queued backtest of {model}")
+            return
+
+        origins = backtest.rolling_origins(
+            timezone.localdate() - timedelta(days=1), options['origins'], options['step'], options['horizon'],
+        )
+        product_ids = [str(pk) for pk in Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)]
+        size = settings.FORECAST_CHUNK_SIZE
+        for model in models:
+            results = [
+                backtest.backtest_products(
+                    model, product_ids[i:i + size], origins, options['horizon'],
+                    budget=settings.FORECAST_PRODUCT_TIME_BUDGET,
+                )
+                for i in range(0, len(product_ids), size)
+            ]
+            summary = backtest.summarize_backtest(results)
+            if summary is None:
+                self.stdout.write(f"{model}: no products to evaluate")
+                continue
+            backtest.store_backtest(model.pk, summary)
+            overall = summary['overall']
+            self.stdout.write(
+                f"{model}: MAE {overall['mae']:.3f}  RMSE {overall['rmse']:.3f}  "
+                f"MAPE {overall['mape']:.2%}  accuracy {overall['accuracy']:.2%}  "
+                f"({summary['products']} products x {summary['origins']} origins, "
+                f"{summary['fallbacks']} fallbacks)"
+            )
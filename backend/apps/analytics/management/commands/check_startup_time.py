@@ -0,0 +1,77 @@
+"""
+Benchmark web process startup and fail when it exceeds the time budget
+"""
+
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_SCRIPT = """
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+from inventory_ai.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+from apps.analytics.backends import loaded_heavy_modules
+print(json.dumps({{'seconds': elapsed, 'heavy_modules': loaded_heavy_modules()}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the WSGI application and URL configuration in a fresh "
+        "interpreter and fail if it takes longer than STARTUP_TIME_BUDGET "
+        "seconds or loads any of the heavy ML backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=settings.STARTUP_TIME_BUDGET,
+                            help='Maximum allowed startup time in seconds')
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Number of cold starts to measure; the fastest one is reported')
+        parser.add_argument('--importtime', action='store_true',
+                            help='Show the slowest imports from python -X importtime')
+
+    def handle(self, *args, **options):
+        script = STARTUP_SCRIPT.format(settings_module=settings.SETTINGS_MODULE)
+        command = [sys.executable]
+        if options['importtime']:
+            command += ['-X', 'importtime']
+        command += ['-c', script]
+
+        results = []
+        for _ in range(max(options['runs'], 1)):
+            completed = subprocess.run(command, capture_output=True, text=True, cwd=settings.BASE_DIR)
+            if completed.returncode != 0:
+                raise CommandError(f"Startup failed:\n{completed.stderr}")
+            results.append((json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr))
+
+        result, importtime = min(results, key=lambda item: item[0]['seconds'])
+        if options['importtime']:
+            self._report_slowest_imports(importtime)
+
+        self.stdout.write(f"Web startup: {result['seconds']:.2f}s (budget {options['budget']:.2f}s)")
+        if result['heavy_modules']:
+            raise CommandError(
+                f"Web startup imported ML backends: {', '.join(result['heavy_modules'])}"
+            )
+        if result['seconds'] > options['budget']:
+            raise CommandError(
+                f"Web startup took {result['seconds']:.2f}s, over the {options['budget']:.2f}s budget"
+            )
+        self.stdout.write(self.style.SUCCESS("Startup within budget"))
+
+    def _report_slowest_imports(self, stderr, limit=15):
+        timings = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative_us, name = line.split('|', 2)
+            timings.append((int(cumulative_us), name.strip()))
+        for cumulative_us, name in sorted(timings, reverse=True)[:limit]:
+            self.stdout.write(f"{cumulative_us / 1e6:8.3f}s  {name}")
@@ -0,0 +1,73 @@
+"""
+Search and cache ARIMA orders per product with a pool of worker processes
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.analytics.forecasting import DEFAULT_HISTORY_DAYS, load_sales_matrix
+from apps.analytics.models import ForecastModel, ProductModelState
+from apps.analytics.order_search import search_orders
+from apps.analytics.patterns import recommended_models
+from apps.analytics.retraining import store_product_states
+from apps.inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a time-budgeted stepwise ARIMA order search for every active product "
+        "whose demand pattern does not recommend LINEAR, and cache the orders on the model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=int, dest='model_id',
+                            help='ARIMA ForecastModel id (defaults to the active ARIMA model)')
+        parser.add_argument('--processes', type=int, default=settings.ARIMA_SEARCH_PROCESSES,
+                            help='Worker processes (0 uses every CPU)')
+        parser.add_argument('--budget', type=int, default=settings.ARIMA_SEARCH_PRODUCT_BUDGET,
+                            help='Seconds per product')
+        parser.add_argument('--total-budget', type=int, default=settings.ARIMA_SEARCH_TOTAL_BUDGET,
+                            help='Seconds for the whole run; products not started by then are skipped')
+
+    def handle(self, *args, **options):
+        models = ForecastModel.objects.filter(model_type='ARIMA')
+        if options['model_id']:
+            models = models.filter(pk=options['model_id'])
+        else:
+            models = models.filter(status='ACTIVE')
+        model = models.order_by('-updated_at').first()
+        if model is None:
+            raise CommandError("No ARIMA forecast model found")
+
+        product_ids = [str(pk) for pk in Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)]
+        recommended = recommended_models(product_ids)
+        product_ids = [product_id for product_id in product_ids if recommended.get(product_id) != 'LINEAR']
+        if not product_ids:
+            self.stdout.write("No products to search")
+            return
+
+        end_date = timezone.localdate() - timedelta(days=1)
+        start_date = end_date - timedelta(days=DEFAULT_HISTORY_DAYS - 1)
+        product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+        previous_states = ProductModelState.states_for(model, product_ids)
+
+        states = search_orders(
+            zip(product_ids, matrix),
+            budget=options['budget'],
+            total_budget=options['total_budget'],
+            processes=options['processes'],
+            starts={
+                key: (state['order'], state['seasonal_order'])
+                for key, state in previous_states.items()
+                if 'order' in state and 'seasonal_order' in state
+            },
+        )
+        for state in states.values():
+            state['trained_through'] = end_date.isoformat()
+        store_product_states(model.pk, states)
+        self.stdout.write(self.style.SUCCESS(
+            f"Cached ARIMA orders for {len(states)} of {len(product_ids)} products on {model}"
+        ))
@@ -41,6 +41,16 @@ class ForecastModel(models.Model):
     model_file_path = models.CharField(max_length=500, blank=True)
     scaler_file_path = models.CharField(max_length=500, blank=True)
     
+    # Forecast run progress
+    products_total = models.PositiveIntegerField(default=0)
+    products_completed = models.PositiveIntegerField(default=0)
+    products_failed = models.PositiveIntegerField(default=0)
+    last_run_started_at = models.DateTimeField(null=True, blank=True)
+    last_run_finished_at = models.DateTimeField(null=True, blank=True)
+    
+    # Latest rolling-origin backtest: overall, per-horizon and per-category metrics
+    backtest_results = models.JSONField(default=dict, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -54,6 +64,51 @@ class ForecastModel(models.Model):
     def __str__(self):
         return f"{self.name} ({self.model_type})"
 
+    @classmethod
+    def get_active(cls):
+        """Most recently trained active model, used for serving forecasts"""
+        return (
+            cls.objects.filter(status='ACTIVE')
+            .order_by(models.F('last_training_date').desc(nulls_last=True), '-created_at')
+            .first()
+        )
+
+    @property
+    def progress_percentage(self):
+        """Share of products processed in the current or last forecast run"""
+        if self.products_total > 0:
+            done = self.products_completed + self.products_failed
+            return round(done / self.products_total * 100, 2)
+        return 0
+
+
+class ProductModelState(models.Model):
+    """
+    Trained per-product state of a ForecastModel: ARIMA orders and
+    parameters, Prophet warm-start values and the day trained through.
+
+    Kept out of ForecastModel.hyperparameters so retraining a chunk of
+    products rewrites only their rows instead of the model's whole JSON.
+    """
+    model = models.ForeignKey(ForecastModel, on_delete=models.CASCADE, related_name='product_states')
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='model_states')
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['model', 'product']
+
+    def __str__(self):
+        return f"{self.model} - {self.product_id}"
+
+    @classmethod
+    def states_for(cls, model, product_ids=None):
+        """{product id (as str): state} of `model`, for `product_ids` or every product"""
+        rows = cls.objects.filter(model=model)
+        if product_ids is not None:
+            rows = rows.filter(product_id__in=list(product_ids))
+        return {str(product_id): state for product_id, state in rows.values_list('product_id', 'state')}
+
 
 class SalesForecast(models.Model):
     """Generated sales forecasts for products"""
@@ -162,6 +217,16 @@ class SalesMetrics(models.Model):
         return f"{self.product.name} - {self.date} - {self.quantity_sold} sold"
 
 
+class AggregationCheckpoint(models.Model):
+    """Progress marks for incrementally maintained aggregates"""
+    name = models.CharField(max_length=100, unique=True)
+    last_processed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_processed_at}"
+
+
 class AIRecommendation(models.Model):
     """AI-generated recommendations for inventory management"""
     RECOMMENDATION_TYPES = [
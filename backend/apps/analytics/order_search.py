@@ -0,0 +1,231 @@
+"""
+Time-budgeted stepwise ARIMA order search
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+
+from .fitters import ForecastTimeout, sarimax_model, time_budget
+
+logger = logging.getLogger(__name__)
+
+SEASONAL_PERIOD = 7
+DEFAULT_START = ((1, 1, 1), (1, 0, 1, SEASONAL_PERIOD))
+# Upper bounds of p, d, q and of seasonal P, D, Q
+MAX_ORDER = (3, 1, 3)
+MAX_SEASONAL_ORDER = (1, 1, 1)
+# Positions of p, q, P and Q among the six terms; d and D are never searched
+SEARCHED_TERMS = (0, 2, 3, 5)
+# Stop once a full round of neighbours improves the AIC by less than this
+MIN_AIC_IMPROVEMENT = 2.0
+# 5% critical value of the KPSS level-stationarity test
+KPSS_CRITICAL_VALUE = 0.463
+# Seasonal strength above which a series is seasonally differenced
+SEASONAL_STRENGTH_THRESHOLD = 0.64
+
+
+def kpss_statistic(series):
+    """
+    KPSS statistic for level stationarity, with a Bartlett-weighted
+    long-run variance over trunc(4 * (n / 100) ** 0.25) lags
+    """
+    n = len(series)
+    residuals = series - series.mean()
+    partial = np.cumsum(residuals)
+    lags = min(int(4 * (n / 100) ** 0.25), n - 1)
+    variance = residuals @ residuals / n
+    for lag in range(1, lags + 1):
+        variance += 2 * (1 - lag / (lags + 1)) * (residuals[lag:] @ residuals[:-lag]) / n
+    if variance <= 0:
+        return 0.0
+    return float(partial @ partial / (n ** 2 * variance))
+
+
+def seasonal_strength(series, period=SEASONAL_PERIOD):
+    """
+    Share of the detrended variance explained by the weekly profile, from a
+    classical decomposition: 1 - Var(remainder) / Var(seasonal + remainder)
+    """
+    n = len(series)
+    if n < 2 * period + 1:
+        return 0.0
+    half = period // 2
+    trend = np.convolve(series, np.ones(period) / period, mode='valid')
+    detrended = series[half:n - half] - trend
+    phases = (np.arange(len(detrended)) + half) % period
+    profile = np.bincount(phases, weights=detrended, minlength=period) / np.bincount(phases, minlength=period)
+    remainder = detrended - (profile - profile.mean())[phases]
+    total = detrended.var()
+    if total <= 0:
+        return 0.0
+    return float(max(0.0, 1.0 - remainder.var() / total))
+
+
+def differencing_orders(series):
+    """
+    Differencing orders (d, D) of a series, fixed before the search.
+
+    AICs of models with different differencing are computed on different
+    series and cannot be compared, so d and D are chosen by tests instead:
+    D from the strength of the weekly pattern, then d by differencing
+    until the KPSS test no longer rejects level stationarity.
+    """
+    seasonal = 0
+    if MAX_SEASONAL_ORDER[1] and seasonal_strength(series) > SEASONAL_STRENGTH_THRESHOLD:
+        seasonal = 1
+        series = series[SEASONAL_PERIOD:] - series[:-SEASONAL_PERIOD]
+    differences = 0
+    while differences < MAX_ORDER[1] and len(series) > 2 and kpss_statistic(series) > KPSS_CRITICAL_VALUE:
+        series = np.diff(series)
+        differences += 1
+    return differences, seasonal
+
+
+def neighbours(order, seasonal_order):
+    """Orders one step away from (order, seasonal_order) in any single p, q, P or Q term"""
+    candidates = []
+    terms = list(order) + list(seasonal_order[:3])
+    bounds = list(MAX_ORDER) + list(MAX_SEASONAL_ORDER)
+    for index in SEARCHED_TERMS:
+        value = terms[index]
+        for step in (-1, 1):
+            changed = value + step
+            if 0 <= changed <= bounds[index]:
+                candidate = list(terms)
+                candidate[index] = changed
+                candidates.append((tuple(candidate[:3]), tuple(candidate[3:]) + (SEASONAL_PERIOD,)))
+    return candidates
+
+
+def search_product(series, budget, start=None):
+    """
+    Stepwise search for the ARIMA orders of one series with the lowest AIC.
+
+    The differencing orders d and D are fixed up front by
+    differencing_orders(), and only p, q, P and Q are searched. Starts at
+    `start` (the cached orders, or DEFAULT_START, with the tested d and
+    D), then fits every neighbour one term away and moves to the best
+    one, as long as it lowers the AIC by at least MIN_AIC_IMPROVEMENT.
+    The search stops when no neighbour improves or `budget` seconds are
+    spent, and keeps the best orders found so far. Returns a product state
+    with the orders, their AIC and fitted params, or None if nothing could
+    be fitted.
+    """
+    deadline = time.monotonic() + budget if budget else None
+    fitted = {}
+
+    def evaluate(order, seasonal_order):
+        key = (order, seasonal_order)
+        if key in fitted:
+            return fitted[key]
+        remaining = deadline - time.monotonic() if deadline else None
+        if remaining is not None and remaining <= 0:
+            raise ForecastTimeout("Order search budget exhausted")
+        try:
+            with time_budget(remaining):
+                result = sarimax_model(series, order, seasonal_order).fit(disp=False)
+            fitted[key] = (float(result.aic), [float(value) for value in np.asarray(result.params)])
+        except ForecastTimeout:
+            raise
+        except Exception:
+            fitted[key] = (np.inf, None)
+        return fitted[key]
+
+    order, seasonal_order = start or DEFAULT_START
+    differences, seasonal_differences = differencing_orders(series)
+    current = (
+        (order[0], differences, order[2]),
+        (seasonal_order[0], seasonal_differences, seasonal_order[2], SEASONAL_PERIOD),
+    )
+    try:
+        best_aic, _ = evaluate(*current)
+        while True:
+            improved = None
+            for candidate in neighbours(*current):
+                aic, _ = evaluate(*candidate)
+                if aic < best_aic - MIN_AIC_IMPROVEMENT and (improved is None or aic < improved[0]):
+                    improved = (aic, candidate)
+            if improved is None:
+                break
+            best_aic, current = improved
+    except ForecastTimeout:
+        pass
+
+    scored = [(aic, key) for key, (aic, params) in fitted.items() if params is not None]
+    if not scored:
+        return None
+    best_aic, (order, seasonal_order) = min(scored)
+    return {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'aic': round(best_aic, 4),
+        'params': fitted[(order, seasonal_order)][1],
+        'orders_evaluated': len(fitted),
+    }
+
+
+def _search_job(product_id, series, budget, start):
+    return product_id, search_product(series, budget, start)
+
+
+def search_orders(series_by_product, budget=None, total_budget=None, processes=None, starts=None):
+    """
+    Search ARIMA orders for many series.
+
+    `series_by_product` is an iterable of (product_id, series); `starts`
+    maps product ids to cached orders to resume from. Each product gets
+    `budget` seconds; once `total_budget` seconds have passed no further
+    products are started and unstarted ones are skipped. Series are
+    searched in a pool of `processes` worker processes, or in this process
+    when it cannot have children (inside a Celery prefork worker) or only
+    one process is requested. Returns {product_id: state}.
+    """
+    budget = budget if budget is not None else settings.ARIMA_SEARCH_PRODUCT_BUDGET
+    total_budget = total_budget if total_budget is not None else settings.ARIMA_SEARCH_TOTAL_BUDGET
+    processes = processes or settings.ARIMA_SEARCH_PROCESSES or os.cpu_count() or 1
+    starts = starts or {}
+    deadline = time.monotonic() + total_budget if total_budget else None
+    jobs = [
+        (str(product_id), np.asarray(series, dtype=np.float64), budget, starts.get(str(product_id)))
+        for product_id, series in series_by_product
+    ]
+
+    results = {}
+    if processes <= 1 or multiprocessing.current_process().daemon:
+        for job in jobs:
+            if deadline and time.monotonic() >= deadline:
+                break
+            product_id, state = _search_job(*job)
+            if state is not None:
+                results[product_id] = state
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            pending = {pool.submit(_search_job, *job) for job in jobs}
+            while pending:
+                timeout = max(deadline - time.monotonic(), 0) if deadline else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    product_id, state = future.result()
+                    if state is not None:
+                        results[product_id] = state
+                if not done:
+                    # Global budget spent: drop queued products, wait for the running ones
+                    for future in pending:
+                        future.cancel()
+                    for future in wait(pending).done:
+                        if not future.cancelled():
+                            product_id, state = future.result()
+                            if state is not None:
+                                results[product_id] = state
+                    break
+
+    skipped = len(jobs) - len(results)
+    if skipped:
+        logger.info("ARIMA order search skipped or failed for %s of %s products", skipped, len(jobs))
+    return results
@@ -0,0 +1,273 @@
+"""
+Vectorized demand pattern detection across the product catalogue
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .forecasting import first_sale_offsets, load_sales_matrix
+from .models import DemandPattern
+
+ANALYSIS_DAYS = 2 * 365
+MIN_HISTORY_DAYS = 28
+
+# Syntetos-Boylan cut-offs for the average demand interval and the squared
+# coefficient of variation of non-zero demand sizes
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+
+# Periodicities (in days) treated as calendar seasonality; any other strong
+# periodicity is reported as a cycle
+SEASONAL_PERIODS = (7, 14, 28, 29, 30, 31, 91, 365)
+SEASONAL_ACF_THRESHOLD = 0.3
+CYCLE_STRENGTH_THRESHOLD = 0.2
+TREND_T_THRESHOLD = 2.58  # 99% two-sided
+TREND_MIN_CHANGE = 0.2  # Relative change over the window
+
+# Per-product fits only pay off with enough history to learn from
+PROPHET_MIN_DAYS = 2 * 365
+LSTM_MIN_DAYS = 180
+
+
+def selling_mask(matrix):
+    """
+    True from each row's first sale on. Earlier days are zero-filled days
+    from before the product existed, not days without demand.
+    """
+    return np.arange(matrix.shape[1])[None, :] >= first_sale_offsets(matrix)[:, None]
+
+
+def autocorrelation(matrix, max_lag, mask=None):
+    """
+    Autocorrelation of every row for lags 0..max_lag, computed with one
+    zero-padded FFT over the whole matrix. Days outside `mask` are left
+    out: each row is centred on its masked days and the others are zeroed.
+    """
+    n_days = matrix.shape[1]
+    if mask is None:
+        centred = matrix - matrix.mean(axis=1, keepdims=True)
+    else:
+        means = np.where(mask, matrix, 0.0).sum(axis=1, keepdims=True) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        centred = np.where(mask, matrix - means, 0.0)
+    size = 1 << int(np.ceil(np.log2(2 * n_days)))
+    spectrum = np.fft.rfft(centred, n=size, axis=1)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=1)[:, :max_lag + 1]
+    variance = acov[:, :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acf = np.where(variance > 0, acov / variance, 0.0)
+    return acf
+
+
+def _linear_fit(matrix, mask=None):
+    """
+    OLS line through the masked days (all days by default) of every row.
+    Returns the slope, the residuals (zero outside the mask), the centred
+    day sum of squares and the number of masked days per row.
+    """
+    mask = np.ones(matrix.shape, dtype=bool) if mask is None else mask
+    count = mask.sum(axis=1)
+    t = np.arange(matrix.shape[1], dtype=np.float64)
+    divisor = np.maximum(count, 1)
+    t_centred = np.where(mask, t[None, :] - ((mask * t).sum(axis=1) / divisor)[:, None], 0.0)
+    sxx = (t_centred ** 2).sum(axis=1)
+    means = np.where(mask, matrix, 0.0).sum(axis=1) / divisor
+    deviations = np.where(mask, matrix - means[:, None], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, (deviations * t_centred).sum(axis=1) / sxx, 0.0)
+    return slope, deviations - slope[:, None] * t_centred, sxx, count
+
+
+def trend_statistics(matrix, mask=None):
+    """
+    OLS slope per row over the masked days, its t statistic and the fitted
+    change relative to the mean
+    """
+    slope, residuals, sxx, count = _linear_fit(matrix, mask)
+    residual_var = (residuals ** 2).sum(axis=1) / np.maximum(count - 2, 1)
+    means = (matrix if mask is None else np.where(mask, matrix, 0.0)).sum(axis=1) / np.maximum(count, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = np.where((residual_var > 0) & (sxx > 0), slope / np.sqrt(residual_var / sxx), 0.0)
+        relative_change = np.where(means > 0, slope * count / means, 0.0)
+    return slope, t_stat, relative_change
+
+
+def history_days(matrix):
+    """Days from each row's first sale to the end of the window (0 without sales)"""
+    return matrix.shape[1] - first_sale_offsets(matrix)
+
+
+def intermittency(matrix):
+    """
+    Average demand interval (ADI) and CV squared of non-zero demand per row.
+
+    Both are measured from each row's first sale, so a product launched
+    late in the window is not classed as intermittent for the zero-filled
+    days before it existed.
+    """
+    nonzero = matrix > 0
+    count = nonzero.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        adi = np.where(count > 0, history_days(matrix) / count, np.inf)
+        sizes = np.where(nonzero, matrix, 0.0)
+        mean_size = np.where(count > 0, sizes.sum(axis=1) / count, 0.0)
+        var_size = np.where(
+            count > 0,
+            (np.where(nonzero, (matrix - mean_size[:, None]) ** 2, 0.0)).sum(axis=1) / count,
+            0.0,
+        )
+        cv2 = np.where(mean_size > 0, var_size / mean_size ** 2, 0.0)
+    return adi, cv2
+
+
+def demand_class(adi, cv2):
+    if not np.isfinite(adi):
+        return 'none'
+    if adi < ADI_CUTOFF:
+        return 'smooth' if cv2 < CV2_CUTOFF else 'erratic'
+    return 'intermittent' if cv2 < CV2_CUTOFF else 'lumpy'
+
+
+def dominant_periods(matrix, mask=None):
+    """
+    Strongest periodicity of each row, detrended over its masked days, and
+    its share of spectral power
+    """
+    n_days = matrix.shape[1]
+    _, detrended, _, _ = _linear_fit(matrix, mask)
+    power = np.abs(np.fft.rfft(detrended, axis=1)) ** 2
+    power[:, 0] = 0.0
+    total = power.sum(axis=1)
+    # Ignore periods shorter than two days or longer than half the window
+    frequencies = np.fft.rfftfreq(n_days)
+    usable = (frequencies > 0) & (frequencies <= 0.5) & (frequencies >= 2.0 / n_days)
+    masked = np.where(usable[None, :], power, 0.0)
+    peak = masked.argmax(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        periods = np.where(frequencies[peak] > 0, 1.0 / frequencies[peak], 0.0)
+        strength = np.where(total > 0, masked[np.arange(len(peak)), peak] / total, 0.0)
+    return periods, strength
+
+
+def recommend_model(pattern_type, demand, n_days):
+    """Cheapest model type expected to capture the detected pattern"""
+    if demand in ('intermittent', 'lumpy', 'none') or pattern_type == 'RANDOM':
+        return 'LINEAR'
+    if pattern_type == 'SEASONAL':
+        return 'PROPHET' if n_days >= PROPHET_MIN_DAYS else 'ARIMA'
+    if pattern_type == 'CYCLICAL':
+        return 'LSTM' if n_days >= LSTM_MIN_DAYS else 'ARIMA'
+    return 'ARIMA'
+
+
+def classify(matrix):
+    """
+    Classify every row of a (products x days) sales matrix in one pass.
+
+    Returns one dict per row with the pattern type, a confidence in [0, 1]
+    and the statistics behind it (stored as DemandPattern.pattern_data).
+    """
+    n_products, n_days = matrix.shape
+    max_lag = min(n_days // 2, max(SEASONAL_PERIODS))
+    # Trend and seasonality are measured from each row's first sale, like
+    # intermittency, so a launch inside the window is not a trend
+    selling = selling_mask(matrix)
+    acf = autocorrelation(matrix, max_lag, selling)
+    slope, t_stat, relative_change = trend_statistics(matrix, selling)
+    adi, cv2 = intermittency(matrix)
+    periods, strength = dominant_periods(matrix, selling)
+
+    seasonal_lags = [lag for lag in SEASONAL_PERIODS if lag <= max_lag]
+    seasonal_acf = acf[:, seasonal_lags] if seasonal_lags else np.zeros((n_products, 1))
+    best_seasonal = seasonal_acf.argmax(axis=1)
+    seasonal_score = seasonal_acf.max(axis=1)
+    nearest_lag = np.clip(np.rint(periods).astype(np.int64), 0, max_lag)
+    cycle_acf = acf[np.arange(n_products), nearest_lag]
+    # Days since the first recorded sale, i.e. how much history a model could learn from
+    active_days = history_days(matrix)
+    trend_r = np.clip(np.abs(t_stat) / np.sqrt(t_stat ** 2 + np.maximum(active_days - 2, 1)), 0, 1)
+
+    results = []
+    for i in range(n_products):
+        demand = demand_class(adi[i], cv2[i])
+        scores = {}
+        if seasonal_score[i] >= SEASONAL_ACF_THRESHOLD:
+            scores['SEASONAL'] = float(seasonal_score[i])
+        if abs(t_stat[i]) >= TREND_T_THRESHOLD and abs(relative_change[i]) >= TREND_MIN_CHANGE:
+            scores['TRENDING'] = float(trend_r[i])
+        period = float(periods[i])
+        is_calendar = any(abs(period - lag) <= 1 for lag in SEASONAL_PERIODS)
+        if not is_calendar and strength[i] >= CYCLE_STRENGTH_THRESHOLD and cycle_acf[i] > 0:
+            scores['CYCLICAL'] = float(np.sqrt(strength[i] * cycle_acf[i]))
+        if demand in ('intermittent', 'lumpy', 'none') or not scores:
+            pattern_type = 'RANDOM'
+            confidence = 1.0 - max(scores.values(), default=0.0)
+        else:
+            pattern_type = max(scores, key=scores.get)
+            confidence = scores[pattern_type]
+
+        results.append({
+            'pattern_type': pattern_type,
+            'confidence': round(float(np.clip(confidence, 0, 1)), 4),
+            'pattern_data': {
+                'recommended_model': recommend_model(pattern_type, demand, int(active_days[i])),
+                'demand_class': demand,
+                'adi': round(float(adi[i]), 4) if np.isfinite(adi[i]) else None,
+                'cv2': round(float(cv2[i]), 4),
+                'seasonal_period': seasonal_lags[best_seasonal[i]] if seasonal_lags else None,
+                'seasonal_acf': round(float(seasonal_score[i]), 4),
+                'dominant_period': round(period, 2),
+                'dominant_strength': round(float(strength[i]), 4),
+                'trend_slope': round(float(slope[i]), 6),
+                'trend_t': round(float(t_stat[i]), 4),
+                'trend_change': round(float(relative_change[i]), 4),
+                'history_days': int(active_days[i]),
+            },
+        })
+    return results
+
+
+def detect_demand_patterns(product_ids, end_date=None, analysis_days=ANALYSIS_DAYS):
+    """
+    Classify `product_ids` and replace their DemandPattern rows in bulk.
+
+    Products keep one current DemandPattern; the previous analysis is
+    replaced. Returns the number of patterns written.
+    """
+    end_date = end_date or timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=analysis_days - 1)
+    product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+    if not product_ids or matrix.shape[1] < MIN_HISTORY_DAYS:
+        return 0
+
+    patterns = [
+        DemandPattern(
+            product_id=product_id,
+            pattern_type=result['pattern_type'],
+            confidence_score=result['confidence'],
+            pattern_data=result['pattern_data'],
+            analysis_start_date=start_date,
+            analysis_end_date=end_date,
+        )
+        for product_id, result in zip(product_ids, classify(matrix))
+    ]
+    with transaction.atomic():
+        DemandPattern.objects.filter(product_id__in=product_ids).delete()
+        DemandPattern.objects.bulk_create(patterns, batch_size=1000)
+    return len(patterns)
+
+
+def recommended_models(product_ids):
+    """Recommended model type per product id (as str) from the latest analysis"""
+    rows = (
+        DemandPattern.objects
+        .filter(product_id__in=list(product_ids))
+        .order_by('product_id', '-analysis_end_date')
+        .values_list('product_id', 'pattern_data')
+    )
+    recommended = {}
+    for product_id, pattern_data in rows:
+        recommended.setdefault(str(product_id), (pattern_data or {}).get('recommended_model'))
+    return recommended
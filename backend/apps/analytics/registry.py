@@ -0,0 +1,140 @@
+"""
+In-process registry of trained model artifacts
+"""
+
+import logging
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from . import backends
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """Artifacts loaded for one ForecastModel training run"""
+
+    def __init__(self, model, scaler=None, size_bytes=0):
+        self.model = model
+        self.scaler = scaler
+        self.size_bytes = size_bytes
+
+
+def resolve_artifact_path(path):
+    """Resolve a model_file_path/scaler_file_path value against AI_MODELS_PATH"""
+    if not path:
+        return None
+    if os.path.isabs(path):
+        return path
+    return os.path.join(settings.AI_MODELS_PATH, path)
+
+
+def load_artifact(path):
+    """
+    Load a single artifact based on its file extension.
+
+    Keras models are loaded without compiling, NumPy blobs are memory-mapped
+    read-only so their pages are shared with the OS page cache, and anything
+    else (statsmodels results, scikit-learn scalers) is unpickled.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.keras', '.h5'):
+        return backends.keras().models.load_model(path, compile=False)
+    if extension == '.npy':
+        return np.load(path, mmap_mode='r')
+    if extension == '.npz':
+        return np.load(path)
+    with open(path, 'rb') as handle:
+        return pickle.load(handle)
+
+
+def estimate_size(path, artifact):
+    """Resident memory attributed to an artifact for budget accounting"""
+    if isinstance(artifact, np.memmap):
+        # Memory-mapped pages are reclaimable by the OS and shared between
+        # processes, so they do not count towards the cache budget.
+        return 0
+    if isinstance(artifact, np.ndarray):
+        return artifact.nbytes
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return sys.getsizeof(artifact)
+
+
+class ModelRegistry:
+    """
+    Bounded LRU cache of loaded model artifacts.
+
+    Entries are keyed by (ForecastModel id, last_training_date), so a
+    retrain produces a new key and the stale entry is dropped the next time
+    the model is requested. Entries are evicted least recently used first
+    once the estimated memory of the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or settings.AI_MODEL_CACHE_BYTES
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+
+    def get(self, forecast_model):
+        """Return the LoadedModel for a ForecastModel, loading it on first use"""
+        key = (forecast_model.pk, forecast_model.last_training_date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._load(forecast_model)
+
+        with self._lock:
+            self.invalidate(forecast_model.pk)
+            self._entries[key] = entry
+            self.current_bytes += entry.size_bytes
+            self._evict()
+        return entry
+
+    def invalidate(self, model_id):
+        """Drop every cached entry for a ForecastModel id"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == model_id]:
+                self.current_bytes -= self._entries.pop(key).size_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _load(self, forecast_model):
+        model_path = resolve_artifact_path(forecast_model.model_file_path)
+        if model_path is None:
+            raise FileNotFoundError(f"{forecast_model} has no trained model file")
+        scaler_path = resolve_artifact_path(forecast_model.scaler_file_path)
+
+        logger.info("Loading artifacts for %s", forecast_model)
+        model = load_artifact(model_path)
+        size = estimate_size(model_path, model)
+        scaler = None
+        if scaler_path:
+            scaler = load_artifact(scaler_path)
+            size += estimate_size(scaler_path, scaler)
+        return LoadedModel(model, scaler, size)
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone is
+        # larger than the budget.
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.size_bytes
+            logger.info("Evicted model artifacts for ForecastModel %s", key[0])
+
+
+model_registry = ModelRegistry()
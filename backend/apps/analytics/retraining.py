@@ -0,0 +1,229 @@
+"""
+Drift-aware selection and warm-started retraining of per-product models
+"""
+
+import json
+import logging
+from datetime import date, timedelta
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+from . import forecast_cache
+from .fitters import TRAINERS, require_backend, time_budget
+from .forecasting import DEFAULT_HISTORY_DAYS, load_sales_matrix
+from .models import ProductModelState, SalesForecast, SalesMetrics
+from .order_search import search_orders
+from .patterns import recommended_models
+
+logger = logging.getLogger(__name__)
+
+# Reasons for which ARIMA orders are searched again rather than refitted
+SEARCH_REASONS = ('untrained', 'error')
+
+# Past forecast days whose actual sales are (re)recorded on every run, so
+# late folds into SalesMetrics are reflected
+ACTUALS_LOOKBACK_DAYS = 7
+ERROR_WINDOW_DAYS = 28
+MIN_ERROR_OBSERVATIONS = 7
+# Product states upserted per statement
+STATE_BATCH_SIZE = 1000
+
+
+def record_actual_sales(start_date, end_date):
+    """
+    Copy SalesMetrics.quantity_sold into SalesForecast.actual_sales for
+    forecasts dated `start_date`..`end_date`, in one UPDATE. Days without a
+    SalesMetrics row had no sales. Returns the number of forecasts updated.
+    """
+    forecasts = connection.ops.quote_name(SalesForecast._meta.db_table)
+    metrics = connection.ops.quote_name(SalesMetrics._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {forecasts} AS f SET actual_sales = COALESCE((
+                SELECT m.quantity_sold FROM {metrics} AS m
+                WHERE m.product_id = f.product_id AND m.date = f.forecast_date
+            ), 0)
+            WHERE f.forecast_date BETWEEN %s AND %s
+            """,
+            [start_date, end_date],
+        )
+        updated = cursor.rowcount
+    # The UPDATE bypasses post_save, and cached horizons carry actual_sales
+    forecast_cache.bump_active_version()
+    return updated
+
+
+def forecast_errors(model, start_date, end_date, product_ids=None):
+    """
+    Per-product error of `model` over forecasts with recorded actuals.
+
+    Returns {product_id: (observations, WAPE, bias)}, where WAPE is the
+    absolute error and bias the signed error (actual minus predicted), both
+    relative to total actual sales.
+    """
+    rows = SalesForecast.objects.filter(
+        model=model, forecast_date__gte=start_date, forecast_date__lte=end_date,
+        actual_sales__isnull=False,
+    )
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=list(product_ids))
+    rows = (
+        rows.values('product_id')
+        .annotate(
+            observations=Count('id'),
+            absolute_error=Sum(Abs(F('actual_sales') - F('predicted_sales'))),
+            signed_error=Sum(F('actual_sales') - F('predicted_sales')),
+            actual=Sum('actual_sales'),
+        )
+        .order_by()
+    )
+    errors = {}
+    for row in rows:
+        actual = max(row['actual'] or 0, 1)
+        errors[str(row['product_id'])] = (
+            row['observations'],
+            (row['absolute_error'] or 0) / actual,
+            (row['signed_error'] or 0) / actual,
+        )
+    return errors
+
+
+def new_data_days(since, until):
+    """Number of SalesMetrics days per product after `since` (all history when None)"""
+    rows = SalesMetrics.objects.filter(date__lte=until)
+    if since is not None:
+        rows = rows.filter(date__gt=since)
+    rows = rows.values('product_id').annotate(days=Count('id')).values_list('product_id', 'days').order_by()
+    return {str(product_id): days for product_id, days in rows}
+
+
+def retrain_candidates(model, today=None):
+    """
+    Products of `model` whose parameters should be re-estimated, with the
+    reason for each.
+
+    Only products with new SalesMetrics rows since the model was last
+    trained are considered, so the work scales with what changed rather
+    than with the catalogue. Of those, a product is retrained when it has
+    never been trained, when its recent forecast error (WAPE) or bias
+    exceeds RETRAIN_ERROR_THRESHOLD / RETRAIN_BIAS_THRESHOLD, or when its
+    parameters are older than RETRAIN_MAX_AGE_DAYS. Products whose demand
+    pattern recommends LINEAR are never trained.
+    """
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    since = timezone.localdate(model.last_training_date) if model.last_training_date else None
+
+    changed = new_data_days(since, yesterday)
+    if not changed:
+        return {}
+    recommended = recommended_models(changed)
+    errors = forecast_errors(model, today - timedelta(days=ERROR_WINDOW_DAYS), yesterday, changed)
+    states = ProductModelState.states_for(model, changed)
+
+    candidates = {}
+    for product_id in changed:
+        if recommended.get(product_id) == 'LINEAR':
+            continue
+        state = states.get(product_id)
+        observations, wape, bias = errors.get(product_id, (0, 0.0, 0.0))
+        if state is None:
+            candidates[product_id] = 'untrained'
+        elif observations >= MIN_ERROR_OBSERVATIONS and wape >= settings.RETRAIN_ERROR_THRESHOLD:
+            candidates[product_id] = 'error'
+        elif observations >= MIN_ERROR_OBSERVATIONS and abs(bias) >= settings.RETRAIN_BIAS_THRESHOLD:
+            candidates[product_id] = 'bias'
+        elif (yesterday - _trained_through(state, yesterday)).days >= settings.RETRAIN_MAX_AGE_DAYS:
+            candidates[product_id] = 'stale'
+    return candidates
+
+
+def _trained_through(state, default):
+    value = state.get('trained_through')
+    return date.fromisoformat(value) if value else default
+
+
+def retrain_products(model, product_ids, budget=None, history_days=DEFAULT_HISTORY_DAYS,
+                     search_ids=(), search_budget=None):
+    """
+    Re-estimate per-product parameters for `product_ids`, warm-starting
+    from each product's previous parameters, and merge the new states into
+    their ProductModelState rows. ARIMA products in `search_ids` get an
+    order search of up to `search_budget` seconds each (resumed from their
+    cached orders) instead of a refit with fixed orders. Returns (trained,
+    failed) counts.
+    """
+    trainer = TRAINERS.get(model.model_type)
+    if trainer is None:
+        return 0, len(product_ids)
+    require_backend(model.model_type)
+
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=history_days - 1)
+    product_ids, start_date, matrix = load_sales_matrix(product_ids, start_date, end_date)
+    previous_states = ProductModelState.states_for(model, product_ids)
+
+    search_ids = {str(product_id) for product_id in search_ids} if model.model_type == 'ARIMA' else set()
+    searched = [i for i, product_id in enumerate(product_ids) if str(product_id) in search_ids]
+    states = search_orders(
+        ((product_ids[i], matrix[i]) for i in searched),
+        budget=search_budget,
+        starts={
+            key: (state['order'], state['seasonal_order'])
+            for key, state in previous_states.items()
+            if key in search_ids and 'order' in state and 'seasonal_order' in state
+        },
+    ) if searched else {}
+    failed = len(searched) - len(states)
+
+    for i, product_id in enumerate(product_ids):
+        key = str(product_id)
+        if key in search_ids:
+            continue
+        try:
+            with time_budget(budget):
+                states[key] = trainer(matrix[i], start_date, model.hyperparameters, previous_states.get(key))
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception:
+            logger.warning("%s training failed for product %s", model.model_type, product_id, exc_info=True)
+            failed += 1
+
+    for state in states.values():
+        state['trained_through'] = end_date.isoformat()
+    store_product_states(model.pk, states)
+    return len(states), failed
+
+
+def store_product_states(model_id, states):
+    """
+    Upsert per-product states ({product id: state}) of a model into
+    ProductModelState, STATE_BATCH_SIZE rows per statement. An existing
+    state is merged key by key, so keys a new state does not carry (such as
+    searched orders) are kept, and concurrent chunks only touch their own
+    products' rows.
+    """
+    if not states:
+        return
+    table = connection.ops.quote_name(ProductModelState._meta.db_table)
+    now = timezone.now()
+    rows = [(model_id, product_id, json.dumps(state), now) for product_id, state in states.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), STATE_BATCH_SIZE):
+            batch = rows[start:start + STATE_BATCH_SIZE]
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (model_id, product_id, state, updated_at)
+                VALUES {', '.join(['(%s, %s, %s::jsonb, %s)'] * len(batch))}
+                ON CONFLICT (model_id, product_id) DO UPDATE SET
+                    state = {table}.state || EXCLUDED.state,
+                    updated_at = EXCLUDED.updated_at
+                """,
+                [value for row in batch for value in row],
+            )
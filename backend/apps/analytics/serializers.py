@@ -0,0 +1,24 @@
+"""
+Serializers for analytics and AI forecasting
+"""
+
+from rest_framework import serializers
+
+from .models import ForecastModel, SalesForecast
+
+
+class ForecastModelSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ForecastModel
+        fields = ['id', 'name', 'model_type', 'status', 'accuracy_score', 'last_training_date']
+
+
+class SalesForecastSerializer(serializers.ModelSerializer):
+    accuracy_percentage = serializers.ReadOnlyField()
+
+    class Meta:
+        model = SalesForecast
+        fields = [
+            'forecast_date', 'predicted_sales', 'confidence_lower', 'confidence_upper',
+            'confidence_level', 'actual_sales', 'accuracy_percentage',
+        ]
@@ -0,0 +1,25 @@
+"""
+Signal handlers for analytics models
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import forecast_cache
+from .models import ForecastModel, SalesForecast
+from .registry import model_registry
+
+
+@receiver(post_save, sender=ForecastModel)
+@receiver(post_delete, sender=ForecastModel)
+def invalidate_model_artifacts(sender, instance, **kwargs):
+    """Drop cached artifacts when a model is retrained, edited or removed"""
+    model_registry.invalidate(instance.pk)
+    forecast_cache.invalidate_active_model()
+
+
+@receiver(post_save, sender=SalesForecast)
+@receiver(post_delete, sender=SalesForecast)
+def invalidate_cached_forecast(sender, instance, **kwargs):
+    """Drop a product's cached horizon when one of its forecasts changes"""
+    forecast_cache.invalidate_products(instance.model_id, [instance.product_id])
@@ -0,0 +1,262 @@
+"""
+Monte Carlo simulation of stock policies across the catalogue
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.inventory.models import Product
+
+from .forecasting import first_sale_offsets, load_sales_matrix
+from .models import ForecastModel
+from .stock_policy import DAYS_PER_YEAR, forecast_matrix, product_lead_times
+
+logger = logging.getLogger(__name__)
+
+# Sales history that demand is bootstrapped from beyond the forecast horizon
+HISTORY_DAYS = 365
+# Products simulated per job; a chunk of 250 products x 1,000 paths keeps
+# every per-day array around 2 MB
+SIMULATION_CHUNK_SIZE = 250
+METRICS = ('stockout_probability', 'stockout_days', 'fill_rate', 'holding_cost', 'orders', 'ending_stock')
+
+
+def sample_demand(rng, day, forecast, sigma, has_forecast, history, history_start, paths):
+    """
+    One day of demand for every product and path.
+
+    Days with a stored forecast are drawn from a normal distribution around
+    the prediction with the spread implied by its confidence interval;
+    other days resample a random day of the product's sales history from
+    its `history_start` column (its first sale) on.
+    """
+    n_products = forecast.shape[0]
+    demand = np.zeros((n_products, paths))
+    forecast_rows = has_forecast[:, day] if day < forecast.shape[1] else np.zeros(n_products, dtype=bool)
+    history_rows = np.flatnonzero(~forecast_rows)
+    if history.shape[1] and len(history_rows):
+        days = rng.integers(history_start[history_rows, None], history.shape[1], size=(len(history_rows), paths))
+        demand[history_rows] = history[history_rows[:, None], days]
+    if forecast_rows.any():
+        rows = np.flatnonzero(forecast_rows)
+        demand[rows] = rng.normal(forecast[rows, day, None], sigma[rows, day, None], size=(len(rows), paths))
+    return np.rint(np.clip(demand, 0, None, out=demand), out=demand)
+
+
+def simulate(inputs, paths, days, holding_cost_rate, seed=None):
+    """
+    Replay `paths` sampled demand paths of `days` days against each
+    product's (reorder point, order-up-to level) policy, all products and
+    paths at once.
+
+    Each day, orders due arrive, demand is served from stock (unmet demand
+    is lost), and products whose stock position (on hand plus on order) is
+    at or below the reorder point order up to their order-up-to level,
+    arriving after a lead time drawn from the supplier's lead times.
+    Returns per-product arrays of METRICS, averaged over paths.
+    """
+    rng = np.random.default_rng(seed)
+    n_products = len(inputs['initial_stock'])
+    reorder_point = inputs['reorder_point'][:, None].astype(np.float64)
+    order_up_to = inputs['order_up_to'][:, None].astype(np.float64)
+    lead_mean = inputs['lead_mean'][:, None]
+    lead_sd = inputs['lead_sd'][:, None]
+    max_lead = max(int(np.ceil((inputs['lead_mean'] + 3 * inputs['lead_sd']).max(initial=1))), 1)
+
+    on_hand = np.repeat(inputs['initial_stock'][:, None].astype(np.float64), paths, axis=1)
+    on_order = np.zeros_like(on_hand)
+    # Ring buffer of arrivals: slot (day % len) holds what arrives that day
+    pipeline = np.zeros((max_lead + 1, n_products, paths))
+    demanded = np.zeros_like(on_hand)
+    served = np.zeros_like(on_hand)
+    held = np.zeros_like(on_hand)
+    orders = np.zeros_like(on_hand)
+    stockout_days = np.zeros_like(on_hand)
+
+    for day in range(days):
+        slot = day % (max_lead + 1)
+        on_hand += pipeline[slot]
+        on_order -= pipeline[slot]
+        pipeline[slot] = 0
+
+        demand = sample_demand(
+            rng, day, inputs['forecast'], inputs['sigma'], inputs['has_forecast'],
+            inputs['history'], inputs['history_start'], paths,
+        )
+        sold = np.minimum(on_hand, demand)
+        stockout_days += demand > sold
+        on_hand -= sold
+        demanded += demand
+        served += sold
+        held += on_hand
+
+        position = on_hand + on_order
+        ordering = np.nonzero((position <= reorder_point) & (order_up_to > position))
+        if len(ordering[0]):
+            quantity = order_up_to[ordering[0], 0] - position[ordering]
+            lead = rng.normal(lead_mean[ordering[0], 0], lead_sd[ordering[0], 0])
+            lead = np.clip(np.rint(lead), 1, max_lead).astype(np.int64)
+            pipeline[(day + lead) % (max_lead + 1), ordering[0], ordering[1]] += quantity
+            on_order[ordering] += quantity
+            orders[ordering] += 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fill_rate = np.where(demanded.sum(axis=1) > 0, served.sum(axis=1) / demanded.sum(axis=1), 1.0)
+    return {
+        'stockout_probability': (stockout_days > 0).mean(axis=1),
+        'stockout_days': stockout_days.mean(axis=1),
+        'fill_rate': fill_rate,
+        'holding_cost': held.mean(axis=1) * inputs['unit_cost'] * holding_cost_rate / DAYS_PER_YEAR,
+        'orders': orders.mean(axis=1),
+        'ending_stock': on_hand.mean(axis=1),
+        'demand': demanded.mean(axis=1),
+    }
+
+
+def _simulate_job(inputs, paths, days, holding_cost_rate, seed):
+    return simulate(inputs, paths, days, holding_cost_rate, seed)
+
+
+def load_inputs(product_ids, days, model=None, today=None):
+    """
+    Current stock, thresholds, cost, lead times, forecasts and sales
+    history of the active products among `product_ids`, as arrays
+    """
+    today = today or timezone.localdate()
+    model = model if model is not None else ForecastModel.get_active()
+    products = list(
+        Product.objects.filter(pk__in=product_ids, is_active=True)
+        .values_list('pk', 'current_stock', 'reorder_point', 'max_stock_level', 'cost')
+        .order_by('pk')
+    )
+    ids = [row[0] for row in products]
+    n = len(ids)
+    lead = product_lead_times(ids)
+    if model is not None:
+        forecast, sigma, has_forecast = forecast_matrix(model, ids, today, days)
+    else:
+        forecast, sigma, has_forecast = np.zeros((n, 0)), np.zeros((n, 0)), np.zeros((n, 0), dtype=bool)
+    _, _, history = load_sales_matrix(ids, today - timedelta(days=HISTORY_DAYS), today - timedelta(days=1))
+    # Products without sales bootstrap from their (all zero) last day
+    history_start = np.minimum(first_sale_offsets(history), max(history.shape[1] - 1, 0))
+    return {
+        'ids': ids,
+        'initial_stock': np.fromiter((row[1] for row in products), dtype=np.int64, count=n),
+        'reorder_point': np.fromiter((row[2] for row in products), dtype=np.int64, count=n),
+        'order_up_to': np.fromiter((row[3] for row in products), dtype=np.int64, count=n),
+        'unit_cost': np.fromiter((float(row[4]) for row in products), dtype=np.float64, count=n),
+        'lead_mean': lead[:, 0],
+        'lead_sd': np.sqrt(lead[:, 1]),
+        'forecast': forecast,
+        'sigma': sigma,
+        'has_forecast': has_forecast,
+        'history': np.asarray(history, dtype=np.float32),
+        'history_start': history_start.astype(np.int64),
+    }
+
+
+def simulate_policies(product_ids, candidates=None, paths=None, days=None, processes=None,
+                      seed=None, model=None, inputs=None):
+    """
+    Simulate stock policies for `product_ids` and return per-product
+    metrics plus demand-weighted totals.
+
+    `candidates` maps product ids to (reorder_point, max_stock_level) to
+    try instead of the current thresholds. Products are simulated in
+    chunks of SIMULATION_CHUNK_SIZE on a pool of `processes` worker
+    processes, or in this process when it cannot have children (inside a
+    Celery prefork worker) or only one is requested. Pass `inputs` from
+    load_inputs to compare several candidate sets on the same data.
+    """
+    paths = paths or settings.SIMULATION_PATHS
+    days = days or settings.SIMULATION_DAYS
+    processes = processes or settings.SIMULATION_PROCESSES or os.cpu_count() or 1
+    inputs = dict(inputs or load_inputs(product_ids, days, model))
+    ids = inputs.pop('ids')
+    if not ids:
+        return None
+    if candidates:
+        inputs['reorder_point'] = inputs['reorder_point'].copy()
+        inputs['order_up_to'] = inputs['order_up_to'].copy()
+        for i, product_id in enumerate(ids):
+            if product_id in candidates:
+                inputs['reorder_point'][i], inputs['order_up_to'][i] = candidates[product_id]
+
+    chunks = [
+        {name: values[start:start + SIMULATION_CHUNK_SIZE] for name, values in inputs.items()}
+        for start in range(0, len(ids), SIMULATION_CHUNK_SIZE)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    holding_cost_rate = settings.STOCK_HOLDING_COST_RATE
+    if processes <= 1 or len(chunks) == 1 or multiprocessing.current_process().daemon:
+        results = [_simulate_job(chunk, paths, days, holding_cost_rate, s) for chunk, s in zip(chunks, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as pool:
+            results = list(pool.map(
+                _simulate_job, chunks, [paths] * len(chunks), [days] * len(chunks),
+                [holding_cost_rate] * len(chunks), seeds,
+            ))
+
+    metrics = {name: np.concatenate([result[name] for result in results]) for name in (*METRICS, 'demand')}
+    demand = metrics['demand']
+    return {
+        'products': len(ids),
+        'paths': paths,
+        'days': days,
+        'summary': {
+            'fill_rate': round(float((metrics['fill_rate'] * demand).sum() / demand.sum()) if demand.sum() else 1.0, 4),
+            'stockout_probability': round(float(metrics['stockout_probability'].mean()), 4),
+            'stockout_days': round(float(metrics['stockout_days'].mean()), 4),
+            'holding_cost': round(float(metrics['holding_cost'].sum()), 2),
+            'orders': round(float(metrics['orders'].sum()), 2),
+        },
+        'by_product': {
+            str(product_id): {name: round(float(metrics[name][i]), 4) for name in METRICS}
+            for i, product_id in enumerate(ids)
+        },
+    }
+
+
+def fill_rate_regressions(policies, rows, paths=None, days=None, seed=None):
+    """
+    Rows of `policies` (from stock_policy.compute_policies) among `rows`
+    whose candidate thresholds simulate to a lower fill rate than the
+    product's current ones, by more than STOCK_POLICY_FILL_RATE_TOLERANCE.
+
+    Both policies are replayed on the same inputs and seed, so they face
+    the same sampled demand. Returns a boolean array in policies['ids']
+    order.
+    """
+    worse = np.zeros(len(policies['ids']), dtype=bool)
+    rows = np.flatnonzero(rows)
+    if not len(rows):
+        return worse
+    ids = [policies['ids'][i] for i in rows]
+    days = days or settings.SIMULATION_DAYS
+    inputs = load_inputs(ids, days, model=policies['model'])
+    candidates = {
+        policies['ids'][i]: (int(policies['levels'][i, 1]), int(policies['levels'][i, 2])) for i in rows
+    }
+    run = {
+        'paths': paths or settings.STOCK_POLICY_SIMULATION_PATHS, 'days': days,
+        'seed': seed if seed is not None else np.random.SeedSequence().entropy,
+    }
+    current = simulate_policies(ids, inputs=inputs, **run)
+    candidate = simulate_policies(ids, candidates=candidates, inputs=inputs, **run)
+    if current is None:
+        return worse
+    for i in rows:
+        key = str(policies['ids'][i])
+        if key in current['by_product']:
+            worse[i] = (
+                candidate['by_product'][key]['fill_rate']
+                < current['by_product'][key]['fill_rate'] - settings.STOCK_POLICY_FILL_RATE_TOLERANCE
+            )
+    return worse
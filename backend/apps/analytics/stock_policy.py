@@ -0,0 +1,333 @@
+"""
+Vectorized safety stock, reorder point and order quantity optimization
+"""
+
+import logging
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.inventory.alerts import evaluate_stock_alerts
+from apps.inventory.models import Product
+from apps.orders.models import PurchaseOrder
+from apps.orders.replenishment import last_suppliers
+
+from .forecasting import first_sale_offsets, load_sales_matrix
+from .models import AIRecommendation, ForecastModel, SalesForecast
+
+logger = logging.getLogger(__name__)
+
+# Days of forecast demand the policy is planned over
+PLANNING_DAYS = 30
+# Sales history used for products without stored forecasts
+HISTORY_DAYS = 90
+# Delivered purchase orders that supplier lead times are estimated from
+LEAD_TIME_HISTORY_DAYS = 365
+DEFAULT_LEAD_TIME_DAYS = 7.0
+DAYS_PER_YEAR = 365
+# Confidence given to recommendations when no scored forecast model backs them
+HISTORY_CONFIDENCE = 0.5
+
+
+def z_score(probability):
+    return NormalDist().inv_cdf(probability)
+
+
+def forecast_matrix(model, product_ids, start_date, days=PLANNING_DAYS):
+    """
+    `model`'s stored forecasts for `days` days from `start_date` as dense
+    (products x days) arrays of predicted sales and daily standard
+    deviation, plus a mask of the days that have a forecast.
+
+    The standard deviation is recovered from each forecast's confidence
+    interval and level.
+    """
+    offsets = {product_id: row for row, product_id in enumerate(product_ids)}
+    rows = list(
+        SalesForecast.objects
+        .filter(model=model, product_id__in=product_ids,
+                forecast_date__gte=start_date, forecast_date__lt=start_date + timedelta(days=days))
+        .values_list('product_id', 'forecast_date', 'predicted_sales', 'confidence_lower',
+                     'confidence_upper', 'confidence_level')
+        .order_by()
+    )
+    shape = (len(product_ids), days)
+    predicted, sigma, has_forecast = np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=bool)
+    if not rows:
+        return predicted, sigma, has_forecast
+
+    count = len(rows)
+    index = np.fromiter((offsets[row[0]] for row in rows), dtype=np.int64, count=count)
+    day = np.fromiter(((row[1] - start_date).days for row in rows), dtype=np.int64, count=count)
+    values, lower, upper, level = (
+        np.fromiter((float(row[k]) for row in rows), dtype=np.float64, count=count) for k in range(2, 6)
+    )
+    z = np.ones(count)
+    for value in np.unique(level):
+        if 0 < value < 100:
+            z[level == value] = z_score(0.5 + value / 200)
+    predicted[index, day] = values
+    sigma[index, day] = np.clip(upper - lower, 0, None) / (2 * z)
+    has_forecast[index, day] = True
+    return predicted, sigma, has_forecast
+
+
+def forecast_moments(model, product_ids, start_date, days=PLANNING_DAYS):
+    """
+    Mean and variance of daily demand per product from `model`'s stored
+    forecasts over `days` days from `start_date`. Returns (mean, variance,
+    has_forecast) arrays in `product_ids` order.
+    """
+    predicted, sigma, has_forecast = forecast_matrix(model, product_ids, start_date, days)
+    covered = np.maximum(has_forecast.sum(axis=1), 1)
+    return predicted.sum(axis=1) / covered, (sigma ** 2).sum(axis=1) / covered, has_forecast.any(axis=1)
+
+
+def history_moments(product_ids, end_date, days=HISTORY_DAYS):
+    """
+    Mean and variance of daily sales over the last `days` days, counted
+    from each product's first sale in that window so that new products
+    are not averaged over days before they were sold
+    """
+    _, _, matrix = load_sales_matrix(product_ids, end_date - timedelta(days=days - 1), end_date)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    first = first_sale_offsets(matrix)
+    observed = np.arange(matrix.shape[1])[None, :] >= first[:, None]
+    count = np.maximum(matrix.shape[1] - first, 1)
+    mean = matrix.sum(axis=1) / count
+    variance = np.where(observed, (matrix - mean[:, None]) ** 2, 0.0).sum(axis=1) / count
+    return mean, variance
+
+
+def supplier_lead_times(since):
+    """
+    Mean and variance of lead time in days per supplier, from purchase
+    orders delivered since `since` (order_date to actual_delivery_date)
+    """
+    rows = list(
+        PurchaseOrder.objects
+        .filter(status='DELIVERED', actual_delivery_date__isnull=False, order_date__gte=since)
+        .values_list('supplier_id', 'order_date', 'actual_delivery_date')
+        .order_by()
+    )
+    if not rows:
+        return {}
+    suppliers, index = np.unique([row[0] for row in rows], return_inverse=True)
+    days = np.fromiter(
+        (max((delivered - ordered).total_seconds() / 86400, 0.0) for _, ordered, delivered in rows),
+        dtype=np.float64, count=len(rows),
+    )
+    count = np.bincount(index)
+    mean = np.bincount(index, weights=days) / count
+    variance = np.bincount(index, weights=days ** 2) / count - mean ** 2
+    return {
+        supplier_id: (float(mean[i]), float(max(variance[i], 0.0)))
+        for i, supplier_id in enumerate(suppliers.tolist())
+    }
+
+
+def optimize(mean, variance, lead_time, lead_time_variance, unit_cost,
+             service_level=None, ordering_cost=None, holding_cost_rate=None):
+    """
+    Safety stock, reorder point and economic order quantity for every
+    product at once.
+
+    Safety stock covers demand and lead time uncertainty at the target
+    service level: z * sqrt(L * var(d) + mean(d)^2 * var(L)). The reorder
+    point adds expected demand over the lead time, and EOQ is
+    sqrt(2 * annual demand * ordering cost / annual holding cost per unit).
+    Products without a cost fall back to a month of demand as their order
+    quantity. Returns (safety_stock, reorder_point, order_quantity).
+    """
+    service_level = service_level or settings.STOCK_SERVICE_LEVEL
+    ordering_cost = ordering_cost if ordering_cost is not None else settings.STOCK_ORDERING_COST
+    holding_cost_rate = holding_cost_rate if holding_cost_rate is not None else settings.STOCK_HOLDING_COST_RATE
+
+    safety_stock = z_score(service_level) * np.sqrt(lead_time * variance + mean ** 2 * lead_time_variance)
+    reorder_point = mean * lead_time + safety_stock
+    holding_cost = unit_cost * holding_cost_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.where(
+            holding_cost > 0,
+            np.sqrt(2 * mean * DAYS_PER_YEAR * ordering_cost / holding_cost),
+            mean * PLANNING_DAYS,
+        )
+    return safety_stock, reorder_point, eoq
+
+
+def recommendation_priority(current_stock, safety_stock):
+    return np.where(
+        current_stock == 0, 'CRITICAL',
+        np.where(current_stock <= safety_stock, 'HIGH', 'MEDIUM'),
+    )
+
+
+def product_lead_times(product_ids):
+    """
+    Lead time mean and variance in days per product, as an (n, 2) array,
+    from the supplier each product was last bought from. Products never
+    bought before get the average supplier lead time.
+    """
+    lead_times = supplier_lead_times(timezone.now() - timedelta(days=LEAD_TIME_HISTORY_DAYS))
+    suppliers = last_suppliers(product_ids)
+    default = (
+        (float(np.mean([mean for mean, _ in lead_times.values()])), 0.0) if lead_times
+        else (DEFAULT_LEAD_TIME_DAYS, 0.0)
+    )
+    return np.array(
+        [lead_times.get(suppliers.get(product_id, (None,))[0], default) for product_id in product_ids],
+        dtype=np.float64,
+    ).reshape(len(product_ids), 2)
+
+
+def compute_policies(product_ids, model=None, today=None):
+    """
+    Candidate stock levels for the active products among `product_ids`,
+    without writing anything.
+
+    Demand comes from the serving model's forecasts (sales history for
+    products without any), lead times from the product's last supplier.
+    The candidate min_stock_level is the safety stock, reorder_point the
+    reorder point and max_stock_level the reorder point plus EOQ. Returns
+    a dict of per-product arrays in 'ids' order ('levels' and 'current'
+    are (n, 3) min/reorder/max arrays), or None without products.
+    """
+    today = today or timezone.localdate()
+    model = model if model is not None else ForecastModel.get_active()
+    products = list(
+        Product.objects.filter(pk__in=product_ids, is_active=True)
+        .values_list('pk', 'name', 'sku', 'cost', 'current_stock', 'min_stock_level', 'reorder_point', 'max_stock_level')
+        .order_by('pk')
+    )
+    if not products:
+        return None
+    ids = [row[0] for row in products]
+    n = len(ids)
+
+    if model is not None:
+        mean, variance, has_forecast = forecast_moments(model, ids, today)
+    else:
+        mean, variance, has_forecast = np.zeros(n), np.zeros(n), np.zeros(n, dtype=bool)
+    if not has_forecast.all():
+        missing = np.flatnonzero(~has_forecast)
+        history_mean, history_variance = history_moments([ids[i] for i in missing], today - timedelta(days=1))
+        mean[missing] = history_mean
+        variance[missing] = history_variance
+
+    cost = np.fromiter((float(row[3]) for row in products), dtype=np.float64, count=n)
+    lead = product_lead_times(ids)
+    safety_stock, reorder_point, eoq = optimize(mean, variance, lead[:, 0], lead[:, 1], cost)
+    levels = np.stack([
+        np.ceil(safety_stock),
+        np.ceil(reorder_point),
+        np.ceil(reorder_point + np.maximum(eoq, 1)),
+    ], axis=1).astype(np.int64)
+    levels[:, 1] = np.maximum(levels[:, 1], levels[:, 0])
+    levels[:, 2] = np.maximum(levels[:, 2], levels[:, 1] + 1)
+
+    return {
+        'ids': ids,
+        'names': [row[1] for row in products],
+        'skus': [row[2] for row in products],
+        'cost': cost,
+        'stock': np.fromiter((row[4] for row in products), dtype=np.int64, count=n),
+        'current': np.array([row[5:8] for row in products], dtype=np.int64).reshape(n, 3),
+        'levels': levels,
+        'mean': mean,
+        'lead': lead,
+        'safety_stock': safety_stock,
+        'eoq': eoq,
+        'model': model,
+    }
+
+
+def optimize_stock_policies(product_ids, model=None, today=None, simulate=True):
+    """
+    Recompute min/reorder/max stock levels for `product_ids` (see
+    compute_policies) and raise REORDER recommendations for products at or
+    below their new reorder point.
+
+    Products without demand are left alone. With `simulate`, changed
+    thresholds are first replayed against the current ones by Monte Carlo
+    simulation, and products whose fill rate would drop keep their current
+    thresholds (see simulation.fill_rate_regressions). Thresholds are
+    written with one bulk_update, previous open REORDER recommendations of
+    these products are expired, and the new ones are inserted with
+    bulk_create and expire after STOCK_RECOMMENDATION_TTL_DAYS. Returns
+    (products updated, recommendations created).
+    """
+    policies = compute_policies(product_ids, model, today)
+    if policies is None:
+        return 0, 0
+    ids, levels, stock, mean, lead = (
+        policies['ids'], policies['levels'], policies['stock'], policies['mean'], policies['lead'],
+    )
+    model = policies['model']
+
+    selling = mean > 0
+    changed = selling & (levels != policies['current']).any(axis=1)
+    if simulate and changed.any():
+        # simulation imports this module
+        from .simulation import fill_rate_regressions
+
+        rejected = fill_rate_regressions(policies, changed)
+        levels[rejected] = policies['current'][rejected]
+        changed &= ~rejected
+    reorder = selling & (stock <= levels[:, 1])
+    priority = recommendation_priority(stock, policies['safety_stock'])
+    confidence = (
+        float(model.accuracy_score) if model is not None and model.accuracy_score is not None else HISTORY_CONFIDENCE
+    )
+
+    now = timezone.now()
+    # bulk_update does not apply auto_now, so updated_at is set here
+    updates = [
+        Product(pk=ids[i], min_stock_level=int(levels[i, 0]), reorder_point=int(levels[i, 1]),
+                max_stock_level=int(levels[i, 2]), updated_at=now)
+        for i in np.flatnonzero(changed)
+    ]
+    expires_at = now + timedelta(days=settings.STOCK_RECOMMENDATION_TTL_DAYS)
+    recommendations = []
+    for i in np.flatnonzero(reorder):
+        name, sku = policies['names'][i], policies['skus'][i]
+        quantity = int(levels[i, 2] - stock[i])
+        recommendations.append(AIRecommendation(
+            product_id=ids[i],
+            recommendation_type='REORDER',
+            priority=str(priority[i]),
+            title=f"Reorder {name}",
+            description=(
+                f"{name} ({sku}) has {stock[i]} in stock against a reorder point of {levels[i, 1]}. "
+                f"Expected demand is {mean[i]:.1f} a day over a {lead[i, 0]:.0f}-day lead time; "
+                f"safety stock is {levels[i, 0]}."
+            ),
+            suggested_quantity=quantity,
+            estimated_impact=(
+                f"Order {quantity} units (EOQ {policies['eoq'][i]:.0f}) to restock up to {levels[i, 2]}"
+            ),
+            confidence_score=round(confidence, 4),
+            expires_at=expires_at,
+        ))
+
+    with transaction.atomic():
+        # bulk_update skips the post_save signal, so alerts are re-evaluated below
+        Product.objects.bulk_update(
+            updates, ['min_stock_level', 'reorder_point', 'max_stock_level', 'updated_at'], batch_size=1000,
+        )
+        AIRecommendation.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            product_id__in=ids, recommendation_type='REORDER', is_implemented=False,
+        ).update(expires_at=now)
+        AIRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+        evaluate_stock_alerts([product.pk for product in updates])
+
+    logger.info(
+        "Stock policies: %s of %s products updated, %s reorder recommendations",
+        len(updates), len(ids), len(recommendations),
+    )
+    return len(updates), len(recommendations)
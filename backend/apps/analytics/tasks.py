@@ -0,0 +1,315 @@
+"""
+Celery tasks for analytics and AI forecasting
+"""
+
+import logging
+from collections import Counter
+from datetime import date, timedelta
+
+from celery import chord, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.models import Product
+from inventory_ai.db_routers import replica_reads
+
+from . import backtest, forecast_cache, patterns, retraining, stock_policy, training_store
+from .fitters import TRAINERS, require_backend
+from .forecasting import run_linear_forecasts, run_per_product_forecasts
+from .materializer import refresh_sales_metrics as refresh_sales_metrics_rollup
+from .models import ForecastModel
+
+logger = logging.getLogger(__name__)
+
+# Headroom on top of the per-product budgets for loading and writing a chunk
+CHUNK_OVERHEAD_SECONDS = 120
+# Days of forecasts with actual sales that model scores are computed over
+SCORE_WINDOW_DAYS = 28
+# Products classified per vectorized pass (a chunk of two-year series is ~60 MB)
+PATTERN_CHUNK_SIZE = 10000
+# Products whose stock policies are optimized per vectorized pass
+STOCK_POLICY_CHUNK_SIZE = 5000
+
+
+@shared_task
+def refresh_sales_metrics():
+    """Recompute SalesMetrics for products with new stock movements or sale order changes"""
+    written = refresh_sales_metrics_rollup()
+    logger.info("Refreshed %s SalesMetrics rows", written)
+    return written
+
+
+@shared_task
+def sync_training_store():
+    """Append yesterday's SalesMetrics to the memory-mapped training store"""
+    with replica_reads():
+        read = training_store.sync()
+    logger.info("Synced %s SalesMetrics rows into the training store", read)
+    return read
+
+
+@shared_task
+def detect_demand_patterns():
+    """Classify the demand pattern of every active product"""
+    with replica_reads():
+        product_ids = list(
+            Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+        )
+    written = 0
+    for start in range(0, len(product_ids), PATTERN_CHUNK_SIZE):
+        with replica_reads():
+            written += patterns.detect_demand_patterns(product_ids[start:start + PATTERN_CHUNK_SIZE])
+    logger.info("Detected demand patterns for %s products", written)
+    return written
+
+
+@shared_task
+def update_daily_forecasts():
+    """
+    Fan the nightly forecast run out over chunks of active products.
+
+    Each active ForecastModel gets a chord of forecast_product_chunk tasks,
+    so the fits spread over every worker process, followed by
+    finalize_forecast_run once all chunks are done.
+    """
+    with replica_reads():
+        product_ids = [
+            str(pk) for pk in
+            Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+        ]
+    size = settings.FORECAST_CHUNK_SIZE
+    chunks = [product_ids[i:i + size] for i in range(0, len(product_ids), size)]
+    if not chunks:
+        return 0
+
+    models = []
+    for model in ForecastModel.objects.filter(status='ACTIVE'):
+        try:
+            require_backend(model.model_type)
+        except ImproperlyConfigured as exc:
+            logger.error("Not forecasting with %s: %s", model, exc)
+            ForecastModel.objects.filter(pk=model.pk).update(status='ERROR')
+            forecast_cache.invalidate_active_model()
+            continue
+        models.append(model)
+
+    for model in models:
+        ForecastModel.objects.filter(pk=model.pk).update(
+            products_total=len(product_ids),
+            products_completed=0,
+            products_failed=0,
+            last_run_started_at=timezone.now(),
+            last_run_finished_at=None,
+        )
+        soft_limit = size * settings.FORECAST_PRODUCT_TIME_BUDGET + CHUNK_OVERHEAD_SECONDS
+        header = [
+            forecast_product_chunk.s(model.pk, chunk).set(soft_time_limit=soft_limit)
+            for chunk in chunks
+        ]
+        chord(header)(finalize_forecast_run.s(model.pk))
+    return len(models)
+
+
+@shared_task(bind=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3, acks_late=True)
+def forecast_product_chunk(self, model_id, product_ids):
+    """Forecast one chunk of products and add it to the model's progress"""
+    model = ForecastModel.objects.get(pk=model_id)
+    try:
+        # Training data is read from the replica; forecasts are written to the primary
+        with replica_reads():
+            if model.model_type == 'LINEAR':
+                run_linear_forecasts(model, product_ids)
+                completed, failed = len(product_ids), 0
+            else:
+                completed, failed = run_per_product_forecasts(
+                    model, product_ids, budget=settings.FORECAST_PRODUCT_TIME_BUDGET,
+                    recommended=patterns.recommended_models(product_ids),
+                )
+    except SoftTimeLimitExceeded:
+        logger.error("Forecast chunk for model %s ran out of time (%s products)", model_id, len(product_ids))
+        completed, failed = 0, len(product_ids)
+
+    ForecastModel.objects.filter(pk=model_id).update(
+        products_completed=F('products_completed') + completed,
+        products_failed=F('products_failed') + failed,
+    )
+    # Refresh the serving cache straight after the bulk write
+    forecast_cache.fill(model, product_ids)
+    return {'completed': completed, 'failed': failed}
+
+
+@shared_task
+def finalize_forecast_run(results, model_id):
+    """Mark a forecast run as finished once every chunk has reported"""
+    completed = sum(result['completed'] for result in results)
+    failed = sum(result['failed'] for result in results)
+    ForecastModel.objects.filter(pk=model_id).update(last_run_finished_at=timezone.now())
+    logger.info("Forecast run for model %s finished: %s fitted, %s fell back", model_id, completed, failed)
+    return {'completed': completed, 'failed': failed}
+
+
+@shared_task
+def retrain_models():
+    """
+    Queue retraining only for the products whose forecasts drifted.
+
+    Actual sales are recorded against recent forecasts first, then each
+    active model with per-product training gets a chord of
+    retrain_product_chunk tasks over its retrain candidates, followed by
+    finalize_retrain. Models without candidates are left alone. ARIMA
+    products that are untrained or forecasting badly get their orders
+    searched again; the rest are refitted with their cached orders.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    retraining.record_actual_sales(yesterday - timedelta(days=retraining.ACTUALS_LOOKBACK_DAYS - 1), yesterday)
+
+    size = settings.FORECAST_CHUNK_SIZE
+    queued = {}
+    for model in ForecastModel.objects.filter(status='ACTIVE', model_type__in=list(TRAINERS)):
+        with replica_reads():
+            candidates = retraining.retrain_candidates(model)
+        if not candidates:
+            continue
+        product_ids = sorted(candidates)
+        logger.info(
+            "Retraining %s products of %s: %s", len(product_ids), model,
+            dict(Counter(candidates.values())),
+        )
+        search_ids = {
+            product_id for product_id, reason in candidates.items()
+            if model.model_type == 'ARIMA' and reason in retraining.SEARCH_REASONS
+        }
+        header = []
+        for i in range(0, len(product_ids), size):
+            chunk = product_ids[i:i + size]
+            chunk_search_ids = [product_id for product_id in chunk if product_id in search_ids]
+            soft_limit = (
+                (len(chunk) - len(chunk_search_ids)) * settings.FORECAST_PRODUCT_TIME_BUDGET
+                + len(chunk_search_ids) * settings.ARIMA_SEARCH_PRODUCT_BUDGET
+                + CHUNK_OVERHEAD_SECONDS
+            )
+            header.append(
+                retrain_product_chunk.s(model.pk, chunk, chunk_search_ids).set(soft_time_limit=soft_limit)
+            )
+        chord(header)(finalize_retrain.s(model.pk))
+        queued[model.pk] = len(product_ids)
+    return queued
+
+
+@shared_task(bind=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3, acks_late=True)
+def retrain_product_chunk(self, model_id, product_ids, search_ids=()):
+    """Re-estimate the parameters of one chunk of products, searching orders for `search_ids`"""
+    model = ForecastModel.objects.get(pk=model_id)
+    try:
+        with replica_reads():
+            trained, failed = retraining.retrain_products(
+                model, product_ids, budget=settings.FORECAST_PRODUCT_TIME_BUDGET,
+                search_ids=search_ids, search_budget=settings.ARIMA_SEARCH_PRODUCT_BUDGET,
+            )
+    except SoftTimeLimitExceeded:
+        logger.error("Retrain chunk for model %s ran out of time (%s products)", model_id, len(product_ids))
+        trained, failed = 0, len(product_ids)
+    return {'trained': trained, 'failed': failed}
+
+
+@shared_task
+def finalize_retrain(results, model_id):
+    """Record the training date once every retrain chunk has reported"""
+    trained = sum(result['trained'] for result in results)
+    failed = sum(result['failed'] for result in results)
+    ForecastModel.objects.filter(pk=model_id).update(last_training_date=timezone.now())
+    # The training date picks the active model and is part of its cached summary
+    forecast_cache.invalidate_active_model()
+    logger.info("Retrain of model %s finished: %s trained, %s failed", model_id, trained, failed)
+    return {'trained': trained, 'failed': failed}
+
+
+@shared_task
+def score_forecast_models():
+    """Refresh every model's accuracy, MAE and RMSE from forecasts with actuals"""
+    end_date = timezone.localdate() - timedelta(days=1)
+    start_date = end_date - timedelta(days=SCORE_WINDOW_DAYS - 1)
+    with replica_reads():
+        updated = backtest.update_model_scores(start_date, end_date)
+    forecast_cache.invalidate_active_model()
+    logger.info("Scored %s forecast models", updated)
+    return updated
+
+
+@shared_task
+def backtest_model(model_id, origins=None, step_days=None, horizon=None):
+    """
+    Rolling-origin backtest of one model, fanned out over product chunks.
+
+    Each chunk replays the model at every origin; finalize_backtest merges
+    the error sums and stores the summary and scores on the model.
+    """
+    horizon = horizon or settings.FORECASTING_PERIOD_DAYS
+    end_date = timezone.localdate() - timedelta(days=1)
+    origin_dates = backtest.rolling_origins(
+        end_date, origins or settings.BACKTEST_ORIGINS, step_days or settings.BACKTEST_STEP_DAYS, horizon,
+    )
+    with replica_reads():
+        product_ids = [
+            str(pk) for pk in
+            Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+        ]
+    size = settings.FORECAST_CHUNK_SIZE
+    origin_strings = [origin.isoformat() for origin in origin_dates]
+    soft_limit = len(origin_dates) * (size * settings.FORECAST_PRODUCT_TIME_BUDGET) + CHUNK_OVERHEAD_SECONDS
+    header = [
+        backtest_product_chunk.s(model_id, product_ids[i:i + size], origin_strings, horizon)
+        .set(soft_time_limit=soft_limit)
+        for i in range(0, len(product_ids), size)
+    ]
+    if not header:
+        return 0
+    chord(header)(finalize_backtest.s(model_id))
+    return len(product_ids)
+
+
+@shared_task(bind=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3, acks_late=True)
+def backtest_product_chunk(self, model_id, product_ids, origins, horizon):
+    """Replay one model over one chunk of products at every origin"""
+    model = ForecastModel.objects.get(pk=model_id)
+    with replica_reads():
+        return backtest.backtest_products(
+            model, product_ids, [date.fromisoformat(origin) for origin in origins], horizon,
+            budget=settings.FORECAST_PRODUCT_TIME_BUDGET,
+        )
+
+
+@shared_task
+def finalize_backtest(results, model_id):
+    """Merge chunk results and store the backtest on the model"""
+    summary = backtest.summarize_backtest(results)
+    if summary is None:
+        return None
+    backtest.store_backtest(model_id, summary)
+    forecast_cache.invalidate_active_model()
+    logger.info("Backtest of model %s: %s", model_id, summary['overall'])
+    return summary['overall']
+
+
+@shared_task
+def optimize_stock_policies():
+    """
+    Recompute stock thresholds for the whole catalogue and raise REORDER
+    recommendations, one vectorized pass per chunk of products. Candidate
+    thresholds that simulate to a worse fill rate are not written.
+    """
+    product_ids = list(Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+    model = ForecastModel.get_active()
+    updated = recommended = 0
+    for start in range(0, len(product_ids), STOCK_POLICY_CHUNK_SIZE):
+        with replica_reads():
+            chunk_updated, chunk_recommended = stock_policy.optimize_stock_policies(
+                product_ids[start:start + STOCK_POLICY_CHUNK_SIZE], model=model,
+            )
+        updated += chunk_updated
+        recommended += chunk_recommended
+    return {'updated': updated, 'recommended': recommended}
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.analytics.models import ForecastModel, SalesForecast
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def scored_products(user, make_product):
+    model = ForecastModel.objects.create(name='Linear', model_type='LINEAR', status='ACTIVE', created_by=user)
+    yesterday = timezone.localdate() - timedelta(days=1)
+    products = [make_product() for _ in range(5)]
+    for product in products:
+        SalesForecast.objects.create(
+            product=product, model=model, forecast_date=yesterday, predicted_sales=4,
+            confidence_lower=2, confidence_upper=6, actual_sales=5,
+        )
+    return products
+
+
+def test_accuracy_by_product_is_paginated(client, scored_products):
+    url = reverse('analytics:forecast-accuracy')
+
+    first = client.get(url, {'group_by': 'product', 'page_size': 2}).json()
+    last = client.get(url, {'group_by': 'product', 'page_size': 2, 'page': 3}).json()
+
+    assert first['count'] == 5
+    assert first['group_by'] == ['product']
+    assert len(first['results']) == 2
+    assert first['results'][0]['mae'] == pytest.approx(1.0)
+    assert len(last['results']) == 1
+    assert last['next'] is None
+
+
+def test_accuracy_by_model_is_a_plain_list(client, scored_products):
+    body = client.get(reverse('analytics:forecast-accuracy')).json()
+
+    assert set(body) == {'group_by', 'results'}
+    assert body['results'][0]['observations'] == 5
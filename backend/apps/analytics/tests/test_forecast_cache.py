@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.analytics import forecast_cache
+from apps.analytics.models import ForecastModel, SalesForecast, SalesMetrics
+from apps.analytics.retraining import record_actual_sales
+from apps.analytics.tasks import finalize_retrain
+from apps.analytics.writers import SalesForecastWriter
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def active_model(user):
+    return ForecastModel.objects.create(name='Linear', model_type='LINEAR', status='ACTIVE', created_by=user)
+
+
+def cached_horizon(product):
+    active = forecast_cache.get_active_model()
+    return forecast_cache.get_many(active, [product.pk]).get(str(product.pk))
+
+
+@pytest.mark.parametrize('method', ['upsert', 'copy'])
+def test_writer_drops_cached_horizons_on_commit(make_product, active_model, django_capture_on_commit_callbacks, method):
+    product = make_product()
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    SalesForecast.objects.create(
+        product=product, model=active_model, forecast_date=tomorrow,
+        predicted_sales=3, confidence_lower=1, confidence_upper=5,
+    )
+    forecast_cache.fill(active_model)
+    assert cached_horizon(product)[0]['predicted_sales'] == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with SalesForecastWriter(active_model, method=method) as writer:
+            writer.add(product.pk, tomorrow, 8, 6, 10)
+
+    assert cached_horizon(product) is None
+    forecast_cache.fill(active_model)
+    assert cached_horizon(product)[0]['predicted_sales'] == 8
+
+
+def test_recording_actual_sales_moves_the_cache_version(make_product, active_model):
+    product = make_product()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    SalesForecast.objects.create(
+        product=product, model=active_model, forecast_date=yesterday,
+        predicted_sales=3, confidence_lower=1, confidence_upper=5,
+    )
+    SalesMetrics.objects.create(product=product, date=yesterday, quantity_sold=4, day_of_week=yesterday.isoweekday())
+    forecast_cache.fill(active_model, start=yesterday)
+    version = forecast_cache.get_active_model()['version']
+
+    assert record_actual_sales(yesterday, yesterday) == 1
+
+    assert forecast_cache.get_active_model()['version'] > version
+    assert cached_horizon(product) is None
+
+
+def test_forecast_writes_invalidate_after_the_summary_expired(make_product, active_model):
+    product = make_product()
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    forecast = SalesForecast.objects.create(
+        product=product, model=active_model, forecast_date=tomorrow,
+        predicted_sales=3, confidence_lower=1, confidence_upper=5,
+    )
+    forecast_cache.fill(active_model)
+    cache.delete(forecast_cache.ACTIVE_MODEL_KEY)
+
+    forecast.predicted_sales = 8
+    forecast.save()
+
+    assert cached_horizon(product) is None
+
+
+def test_finalizing_a_retrain_refreshes_the_cached_summary(active_model):
+    assert forecast_cache.get_active_model()['model']['last_training_date'] is None
+
+    finalize_retrain([{'trained': 1, 'failed': 0}], active_model.pk)
+
+    assert forecast_cache.get_active_model()['model']['last_training_date'] is not None
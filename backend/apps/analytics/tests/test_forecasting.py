@@ -0,0 +1,32 @@
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics.forecasting import predict_from_artifacts
+from apps.analytics.models import ForecastModel, SalesMetrics
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('model_type', ['LINEAR', 'PROPHET'])
+def test_models_without_statsmodels_artifacts_forecast_linearly(make_product, user, model_type):
+    product = make_product()
+    today = timezone.localdate()
+    for days_ago in range(1, 31):
+        day = today - timedelta(days=days_ago)
+        SalesMetrics.objects.create(
+            product=product, date=day, quantity_sold=5, day_of_week=day.isoweekday(),
+        )
+    model = ForecastModel.objects.create(
+        name=model_type, model_type=model_type, status='ACTIVE', model_file_path='models/artifact.pkl', created_by=user,
+    )
+
+    with mock.patch('apps.analytics.forecasting.model_registry') as registry:
+        predictions, lower, upper = predict_from_artifacts(model, product.pk, 7)
+
+    registry.get.assert_not_called()
+    assert predictions.shape == lower.shape == upper.shape == (7,)
+    np.testing.assert_allclose(predictions, 5, atol=1e-6)
@@ -0,0 +1,135 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.analytics.materializer import refresh_sales_metrics
+from apps.analytics.models import AggregationCheckpoint, SalesMetrics
+from apps.inventory.ledger import record_stock_movement, signed_quantity_expression
+from apps.inventory.models import StockMovement
+from apps.orders.models import SaleOrder, SaleOrderItem
+
+pytestmark = pytest.mark.django_db
+
+
+def days_ago(days):
+    return timezone.localdate() - timedelta(days=days)
+
+
+def at_noon(day):
+    return timezone.make_aware(datetime.combine(day, time(12)))
+
+
+def move(product, user, movement_type, quantity, day):
+    movement = record_stock_movement(product=product, movement_type=movement_type, quantity=quantity, created_by=user)
+    StockMovement.objects.filter(pk=movement.pk).update(created_at=at_noon(day))
+    return movement
+
+
+def sell(product, user, quantity, day, unit_price=Decimal('10.00')):
+    order = SaleOrder.objects.create(customer_name='A', customer_email='a@b.test', created_by=user)
+    SaleOrderItem.objects.create(sale_order=order, product=product, quantity=quantity, unit_price=unit_price)
+    SaleOrder.objects.filter(pk=order.pk).update(order_date=at_noon(day))
+    return order
+
+
+def metrics(product):
+    return {
+        row.date: (row.opening_stock, row.closing_stock, row.stock_in, row.stock_out, row.quantity_sold)
+        for row in SalesMetrics.objects.filter(product=product)
+    }
+
+
+def test_signed_quantity_expression_matches_movement_delta(make_product, user):
+    product = make_product(current_stock=50)
+    for movement_type, quantity in [('IN', 5), ('OUT', 3), ('DAMAGE', -2), ('ADJUSTMENT', -4), ('RETURN', 1)]:
+        record_stock_movement(product=product, movement_type=movement_type, quantity=quantity, created_by=user)
+    total = StockMovement.objects.aggregate(total=Sum(signed_quantity_expression()))['total']
+    product.refresh_from_db()
+    assert total == 5 - 3 - 2 - 4 + 1
+    assert product.current_stock == 50 + total
+
+
+def test_backfill_derives_each_days_stock_from_movements(make_product, user):
+    product = make_product()
+    move(product, user, 'IN', 10, days_ago(3))
+    move(product, user, 'OUT', 3, days_ago(2))
+    sell(product, user, 3, days_ago(2))
+    move(product, user, 'IN', 5, days_ago(1))
+
+    refresh_sales_metrics()
+
+    assert metrics(product) == {
+        days_ago(3): (0, 10, 10, 0, 0),
+        days_ago(2): (10, 7, 0, 3, 3),
+        days_ago(1): (7, 12, 5, 0, 0),
+    }
+    assert SalesMetrics.objects.get(product=product, date=days_ago(2)).revenue == Decimal('30.00')
+
+
+def test_refresh_is_idempotent(make_product, user):
+    product = make_product()
+    move(product, user, 'IN', 10, days_ago(2))
+    sell(product, user, 2, days_ago(1))
+    refresh_sales_metrics()
+    first = metrics(product)
+
+    AggregationCheckpoint.objects.update(last_processed_at=None)
+    refresh_sales_metrics()
+    refresh_sales_metrics()
+    assert metrics(product) == first
+
+
+def test_rows_committed_after_the_last_run_are_picked_up(make_product, user):
+    product = make_product()
+    move(product, user, 'IN', 10, days_ago(3))
+    move(product, user, 'OUT', 2, days_ago(1))
+    refresh_sales_metrics()
+    last_run = AggregationCheckpoint.objects.get().last_processed_at
+
+    # Inserted before the last run read the tables but committed after it
+    late = move(product, user, 'IN', 4, timezone.localdate())
+    StockMovement.objects.filter(pk=late.pk).update(created_at=last_run - timedelta(minutes=5))
+    # A backdated sale changes an older day
+    sell(product, user, 1, days_ago(3))
+    refresh_sales_metrics()
+
+    assert metrics(product) == {
+        days_ago(3): (0, 10, 10, 0, 1),
+        days_ago(1): (10, 8, 0, 2, 0),
+        timezone.localdate(): (8, 12, 4, 0, 0),
+    }
+
+
+def test_cancelled_orders_are_subtracted(make_product, user):
+    product = make_product()
+    kept = sell(product, user, 2, days_ago(1))
+    cancelled = sell(product, user, 5, days_ago(1))
+    refresh_sales_metrics()
+    assert SalesMetrics.objects.get(product=product).quantity_sold == 7
+
+    cancelled.status = 'CANCELLED'
+    cancelled.save()
+    refresh_sales_metrics()
+
+    row = SalesMetrics.objects.get(product=product)
+    assert row.quantity_sold == 2
+    assert row.revenue == Decimal('20.00')
+    assert kept.status == 'DRAFT'
+
+
+def test_a_backdated_row_only_widens_its_own_products_window(make_product, user):
+    backdated, recent = make_product(), make_product()
+    move(recent, user, 'IN', 10, days_ago(10))
+    refresh_sales_metrics()
+    untouched = SalesMetrics.objects.get(product=recent, date=days_ago(10)).updated_at
+
+    sell(backdated, user, 1, days_ago(30))
+    move(recent, user, 'IN', 2, timezone.localdate())
+    refresh_sales_metrics()
+
+    assert SalesMetrics.objects.get(product=recent, date=days_ago(10)).updated_at == untouched
+    assert metrics(recent)[timezone.localdate()] == (10, 12, 2, 0, 0)
+    assert metrics(backdated) == {days_ago(30): (0, 0, 0, 0, 1)}
@@ -0,0 +1,53 @@
+from unittest import mock
+
+import numpy as np
+
+from apps.analytics import order_search
+from apps.analytics.order_search import differencing_orders, kpss_statistic, neighbours, search_product
+
+rng = np.random.default_rng(7)
+NOISE = rng.normal(10, 1, 365)
+RANDOM_WALK = np.cumsum(rng.normal(0, 1, 365)) + 50
+WEEKLY = 10 + 5 * (np.arange(365) % 7 == 5) + rng.normal(0, 0.5, 365)
+
+
+def test_kpss_separates_stationary_series_from_random_walks():
+    assert kpss_statistic(NOISE) < order_search.KPSS_CRITICAL_VALUE < kpss_statistic(RANDOM_WALK)
+    assert kpss_statistic(np.zeros(60)) == 0.0
+
+
+def test_differencing_orders_come_from_the_tests():
+    assert differencing_orders(NOISE) == (0, 0)
+    assert differencing_orders(RANDOM_WALK) == (1, 0)
+    assert differencing_orders(WEEKLY) == (0, 1)
+
+
+def test_neighbours_never_change_differencing():
+    for order, seasonal_order in neighbours((1, 1, 1), (1, 0, 1, 7)):
+        assert order[1] == 1
+        assert (seasonal_order[1], seasonal_order[3]) == (0, 7)
+
+
+class FakeResult:
+    def __init__(self, order, seasonal_order):
+        # Lowest at p=2, q=0, P=0, Q=1
+        p, _, q = order
+        seasonal_p, _, seasonal_q, _ = seasonal_order
+        self.aic = 100 + 10 * (abs(p - 2) + q + seasonal_p + abs(seasonal_q - 1))
+        self.params = [0.5]
+
+
+def fake_model(series, order, seasonal_order):
+    model = mock.Mock()
+    model.fit.return_value = FakeResult(order, seasonal_order)
+    return model
+
+
+def test_search_only_compares_orders_with_the_tested_differencing():
+    with mock.patch('apps.analytics.order_search.sarimax_model', side_effect=fake_model) as fitted:
+        state = search_product(RANDOM_WALK, budget=None, start=((1, 0, 1), (1, 1, 1, 7)))
+
+    assert state['order'] == [2, 1, 0]
+    assert state['seasonal_order'] == [0, 0, 1, 7]
+    assert {call.args[1][1] for call in fitted.call_args_list} == {1}
+    assert {call.args[2][1] for call in fitted.call_args_list} == {0}
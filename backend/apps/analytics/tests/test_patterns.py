@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics.models import DemandPattern, SalesMetrics
+from apps.analytics.patterns import classify, detect_demand_patterns, intermittency
+
+
+def weekly_series(n_days, rng):
+    day = np.arange(n_days)
+    return 10 + 6 * np.sin(2 * np.pi * day / 7) + rng.normal(0, 0.5, n_days)
+
+
+def test_weekly_cycle_is_seasonal():
+    rng = np.random.default_rng(0)
+    [result] = classify(weekly_series(365, rng)[None, :])
+
+    assert result['pattern_type'] == 'SEASONAL'
+    assert result['pattern_data']['seasonal_period'] == 7
+    assert result['pattern_data']['demand_class'] == 'smooth'
+    assert result['pattern_data']['recommended_model'] == 'ARIMA'
+
+
+def test_steady_growth_is_trending():
+    rng = np.random.default_rng(1)
+    series = np.linspace(5, 50, 365) + rng.normal(0, 1, 365)
+
+    [result] = classify(series[None, :])
+
+    assert result['pattern_type'] == 'TRENDING'
+    assert result['pattern_data']['trend_slope'] > 0
+
+
+def test_sparse_demand_is_random_and_forecast_linearly():
+    series = np.zeros(365)
+    series[::9] = [1, 8] * 20 + [3]
+
+    [result] = classify(series[None, :])
+
+    assert result['pattern_type'] == 'RANDOM'
+    assert result['pattern_data']['demand_class'] == 'lumpy'
+    assert result['pattern_data']['recommended_model'] == 'LINEAR'
+
+
+def test_products_without_sales_have_no_demand_class():
+    [result] = classify(np.zeros((1, 120)))
+
+    assert result['pattern_type'] == 'RANDOM'
+    assert result['pattern_data']['demand_class'] == 'none'
+    assert result['pattern_data']['adi'] is None
+    assert result['pattern_data']['history_days'] == 0
+
+
+def test_intermittency_is_measured_from_the_first_sale():
+    late_launch = np.zeros(730)
+    late_launch[-100:] = 5
+    late_launch[-100::2] = 7
+
+    adi, cv2 = intermittency(late_launch[None, :])
+    [result] = classify(late_launch[None, :])
+
+    assert adi[0] == pytest.approx(1.0)
+    assert cv2[0] == pytest.approx(1 / 36)
+    assert result['pattern_data']['demand_class'] == 'smooth'
+    assert result['pattern_data']['history_days'] == 100
+
+
+def test_a_launch_inside_the_window_is_not_a_trend():
+    rng = np.random.default_rng(3)
+    flat = np.zeros(730)
+    flat[-200:] = 10 + rng.normal(0, 1, 200)
+    weekly = np.zeros(730)
+    weekly[-200:] = weekly_series(200, rng)
+
+    flat_result, weekly_result = classify(np.vstack([flat, weekly]))
+
+    assert flat_result['pattern_type'] == 'RANDOM'
+    assert abs(flat_result['pattern_data']['trend_t']) < 2.58
+    assert weekly_result['pattern_type'] == 'SEASONAL'
+    assert weekly_result['pattern_data']['seasonal_period'] == 7
+
+
+def test_rows_are_classified_independently():
+    rng = np.random.default_rng(2)
+    matrix = np.vstack([weekly_series(365, rng), np.zeros(365)])
+
+    results = classify(matrix)
+
+    assert [result['pattern_data']['demand_class'] for result in results] == ['smooth', 'none']
+
+
+@pytest.mark.django_db
+def test_detect_demand_patterns_replaces_the_previous_analysis(make_product):
+    product = make_product()
+    end_date = timezone.localdate() - timedelta(days=1)
+    for days_ago in range(60):
+        day = end_date - timedelta(days=days_ago)
+        SalesMetrics.objects.create(product=product, date=day, quantity_sold=4, day_of_week=day.isoweekday())
+
+    assert detect_demand_patterns([product.pk], end_date=end_date, analysis_days=60) == 1
+    assert detect_demand_patterns([product.pk], end_date=end_date, analysis_days=60) == 1
+
+    pattern = DemandPattern.objects.get(product=product)
+    assert pattern.analysis_end_date == end_date
+    assert pattern.pattern_data['demand_class'] == 'smooth'
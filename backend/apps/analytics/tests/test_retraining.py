@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.analytics.models import ForecastModel, ProductModelState, SalesMetrics
+from apps.analytics.retraining import retrain_candidates, store_product_states
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def arima(user):
+    return ForecastModel.objects.create(name='ARIMA', model_type='ARIMA', status='ACTIVE', created_by=user)
+
+
+def test_states_are_stored_per_product_and_merged_key_by_key(arima, make_product):
+    first, second = make_product(), make_product()
+    store_product_states(arima.pk, {
+        str(first.pk): {'order': [1, 1, 1], 'params': [0.1]},
+        str(second.pk): {'order': [2, 1, 0]},
+    })
+
+    store_product_states(arima.pk, {str(first.pk): {'params': [0.3], 'trained_through': '2026-01-01'}})
+
+    assert ProductModelState.states_for(arima) == {
+        str(first.pk): {'order': [1, 1, 1], 'params': [0.3], 'trained_through': '2026-01-01'},
+        str(second.pk): {'order': [2, 1, 0]},
+    }
+    assert ProductModelState.states_for(arima, [second.pk]) == {str(second.pk): {'order': [2, 1, 0]}}
+    arima.refresh_from_db()
+    assert 'products' not in arima.hyperparameters
+
+
+def test_untrained_and_stale_products_are_retrain_candidates(arima, make_product, settings):
+    settings.RETRAIN_MAX_AGE_DAYS = 30
+    untrained, fresh, stale = make_product(), make_product(), make_product()
+    today = timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    for product in (untrained, fresh, stale):
+        SalesMetrics.objects.create(product=product, date=yesterday, quantity_sold=2, day_of_week=yesterday.isoweekday())
+    store_product_states(arima.pk, {
+        str(fresh.pk): {'trained_through': (yesterday - timedelta(days=2)).isoformat()},
+        str(stale.pk): {'trained_through': (yesterday - timedelta(days=45)).isoformat()},
+    })
+
+    assert retrain_candidates(arima, today=today) == {str(untrained.pk): 'untrained', str(stale.pk): 'stale'}
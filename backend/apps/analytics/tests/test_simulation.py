@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics.models import SalesMetrics
+from apps.analytics.simulation import HISTORY_DAYS, load_inputs, sample_demand
+
+
+def test_history_days_are_resampled_from_the_first_sale():
+    history = np.array([[0, 0, 0, 5, 5], [0, 0, 0, 0, 0]], dtype=np.float32)
+    no_forecast = np.zeros((2, 0))
+
+    demand = sample_demand(
+        np.random.default_rng(0), 0, no_forecast, no_forecast, no_forecast.astype(bool),
+        history, np.array([3, 4]), paths=500,
+    )
+
+    assert (demand[0] == 5).all()
+    assert (demand[1] == 0).all()
+
+
+@pytest.mark.django_db
+def test_load_inputs_marks_each_products_first_sale(make_product):
+    launched, never_sold = make_product(), make_product()
+    today = timezone.localdate()
+    for days_ago in range(1, 11):
+        day = today - timedelta(days=days_ago)
+        SalesMetrics.objects.create(product=launched, date=day, quantity_sold=3, day_of_week=day.isoweekday())
+
+    inputs = load_inputs([launched.pk, never_sold.pk], days=30, today=today)
+
+    starts = dict(zip(inputs['ids'], inputs['history_start']))
+    assert starts[launched.pk] == HISTORY_DAYS - 10
+    assert starts[never_sold.pk] == HISTORY_DAYS - 1
@@ -0,0 +1,24 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from apps.analytics.backends import loaded_heavy_modules
+
+
+def test_loaded_heavy_modules_only_lists_ml_backends():
+    modules = {'json': object(), 'statsmodels': object(), 'prophet': object()}
+
+    assert loaded_heavy_modules(modules) == ['statsmodels', 'prophet']
+
+
+def test_web_startup_loads_no_ml_backends(capsys):
+    # A fresh interpreter sets up Django and the URLconf; statsmodels,
+    # prophet, matplotlib and the other backends must stay unimported
+    call_command('check_startup_time', budget=60, runs=1)
+
+    assert 'Startup within budget' in capsys.readouterr().out
+
+
+def test_slow_startup_fails_the_benchmark():
+    with pytest.raises(CommandError, match='over the 0.00s budget'):
+        call_command('check_startup_time', budget=0, runs=1)
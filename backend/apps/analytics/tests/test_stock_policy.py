@@ -0,0 +1,124 @@
+from datetime import timedelta
+from statistics import NormalDist
+from unittest import mock
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics.models import SalesMetrics
+from apps.analytics.stock_policy import (
+    PLANNING_DAYS, compute_policies, history_moments, optimize, optimize_stock_policies,
+)
+
+
+def test_optimize_combines_demand_and_lead_time_uncertainty():
+    safety_stock, reorder_point, eoq = optimize(
+        np.array([10.0]), np.array([4.0]), np.array([5.0]), np.array([1.0]), np.array([20.0]),
+        service_level=0.95, ordering_cost=50.0, holding_cost_rate=0.25,
+    )
+
+    expected_safety = NormalDist().inv_cdf(0.95) * np.sqrt(5 * 4 + 10 ** 2 * 1)
+    assert safety_stock[0] == pytest.approx(expected_safety)
+    assert reorder_point[0] == pytest.approx(10 * 5 + expected_safety)
+    assert eoq[0] == pytest.approx(np.sqrt(2 * 10 * 365 * 50 / (20 * 0.25)))
+
+
+def test_optimize_without_uncertainty_needs_no_safety_stock():
+    safety_stock, reorder_point, _ = optimize(
+        np.array([3.0]), np.array([0.0]), np.array([7.0]), np.array([0.0]), np.array([5.0]),
+        service_level=0.99, ordering_cost=10.0, holding_cost_rate=0.2,
+    )
+
+    assert safety_stock[0] == 0
+    assert reorder_point[0] == pytest.approx(21.0)
+
+
+def test_optimize_falls_back_to_a_month_of_demand_without_a_cost():
+    _, _, eoq = optimize(
+        np.array([2.0, 2.0]), np.zeros(2), np.ones(2), np.zeros(2), np.array([0.0, 8.0]),
+        service_level=0.95, ordering_cost=50.0, holding_cost_rate=0.25,
+    )
+
+    assert eoq[0] == pytest.approx(2.0 * PLANNING_DAYS)
+    assert eoq[1] == pytest.approx(np.sqrt(2 * 2 * 365 * 50 / 2))
+
+
+def test_higher_service_level_holds_more_safety_stock():
+    args = (np.array([10.0]), np.array([9.0]), np.array([4.0]), np.array([2.0]), np.array([10.0]))
+
+    low, _, _ = optimize(*args, service_level=0.9, ordering_cost=50.0, holding_cost_rate=0.25)
+    high, _, _ = optimize(*args, service_level=0.99, ordering_cost=50.0, holding_cost_rate=0.25)
+
+    assert high[0] > low[0]
+
+
+def add_sales(product, end_date, days, quantity):
+    for days_ago in range(days):
+        day = end_date - timedelta(days=days_ago)
+        SalesMetrics.objects.create(product=product, date=day, quantity_sold=quantity, day_of_week=day.isoweekday())
+
+
+@pytest.mark.django_db
+def test_history_moments_start_at_the_first_sale(make_product):
+    launched, steady = make_product(), make_product()
+    end_date = timezone.localdate() - timedelta(days=1)
+    add_sales(launched, end_date, 10, 6)
+    add_sales(steady, end_date, 90, 6)
+
+    mean, variance = history_moments([launched.pk, steady.pk], end_date, days=90)
+
+    np.testing.assert_allclose(mean, [6.0, 6.0])
+    np.testing.assert_allclose(variance, [0.0, 0.0])
+
+
+@pytest.mark.django_db
+def test_compute_policies_from_sales_history(make_product):
+    product = make_product(cost=20, current_stock=5)
+    today = timezone.localdate()
+    add_sales(product, today - timedelta(days=1), 30, 10)
+
+    policies = compute_policies([product.pk], today=today)
+
+    assert policies['ids'] == [product.pk]
+    assert policies['mean'][0] == pytest.approx(10.0)
+    safety, reorder, maximum = policies['levels'][0]
+    assert safety == 0
+    assert reorder == 70
+    assert maximum == reorder + np.ceil(np.sqrt(2 * 10 * 365 * 50 / (20 * 0.25)))
+
+
+@pytest.mark.django_db
+def test_thresholds_that_simulate_worse_are_kept(make_product):
+    kept = make_product(cost=20, current_stock=500, min_stock_level=1, reorder_point=2, max_stock_level=3)
+    replaced = make_product(cost=20, current_stock=500, min_stock_level=1, reorder_point=2, max_stock_level=3)
+    today = timezone.localdate()
+    add_sales(kept, today - timedelta(days=1), 30, 10)
+    add_sales(replaced, today - timedelta(days=1), 30, 10)
+    rows = sorted([kept.pk, replaced.pk])
+
+    with mock.patch('apps.analytics.simulation.fill_rate_regressions') as regressions:
+        regressions.side_effect = lambda policies, changed: np.array([pk == kept.pk for pk in policies['ids']])
+        updated, _ = optimize_stock_policies(rows, today=today)
+
+    assert updated == 1
+    kept_at, replaced_at = kept.updated_at, replaced.updated_at
+    kept.refresh_from_db()
+    replaced.refresh_from_db()
+    assert (kept.reorder_point, kept.max_stock_level) == (2, 3)
+    assert kept.updated_at == kept_at
+    assert replaced.reorder_point == 70
+    assert replaced.updated_at > replaced_at
+
+
+@pytest.mark.django_db
+def test_candidates_that_raise_the_fill_rate_pass_the_simulation(make_product):
+    product = make_product(cost=20, current_stock=20, min_stock_level=0, reorder_point=0, max_stock_level=1)
+    today = timezone.localdate()
+    add_sales(product, today - timedelta(days=1), 30, 10)
+
+    updated, _ = optimize_stock_policies([product.pk], today=today)
+
+    assert updated == 1
+    product.refresh_from_db()
+    assert product.reorder_point == 70
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.utils import timezone
+
+from apps.analytics import training_store
+from apps.analytics.models import SalesMetrics
+
+pytestmark = pytest.mark.django_db
+
+
+def add_sales(product, day, quantity):
+    SalesMetrics.objects.update_or_create(
+        product=product, date=day,
+        defaults={'quantity_sold': quantity, 'day_of_week': day.isoweekday()},
+    )
+
+
+def test_refresh_leaves_open_readers_on_their_generation(make_product, tmp_path):
+    product = make_product()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    for days_ago in range(1, 6):
+        add_sales(product, yesterday - timedelta(days=days_ago - 1), 2)
+    training_store.sync(through=yesterday - timedelta(days=1), path=tmp_path)
+    reader = training_store.TrainingStore.open(tmp_path)
+    _, _, before = reader.series('quantity_sold', [product.pk])
+
+    # A late fold into a refreshed day plus a new day
+    add_sales(product, yesterday - timedelta(days=1), 7)
+    training_store.sync(through=yesterday, path=tmp_path)
+
+    _, _, still = reader.series('quantity_sold', [product.pk])
+    np.testing.assert_array_equal(still, before)
+    _, _, after = training_store.TrainingStore.open(tmp_path).series('quantity_sold', [product.pk])
+    np.testing.assert_array_equal(after, [[2, 2, 2, 7, 2]])
+
+
+def test_syncs_within_capacity_extend_the_base_in_place(make_product, tmp_path):
+    product = make_product()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    for days_ago in range(6, 0, -1):
+        day = yesterday - timedelta(days=days_ago - 1)
+        add_sales(product, day, days_ago)
+        training_store.sync(through=day, path=tmp_path)
+
+    store = training_store.TrainingStore.open(tmp_path)
+    assert (store.base, store.meta['generation']) == (1, 6)
+    assert store.tail_start == store.n_days - training_store.REFRESH_DAYS
+    _, _, matrix = store.series('quantity_sold', [product.pk])
+    np.testing.assert_array_equal(matrix, [[6, 5, 4, 3, 2, 1]])
+    _, _, view = store.series(
+        'quantity_sold', start_date=yesterday - timedelta(days=5), end_date=yesterday - timedelta(days=3),
+    )
+    assert view.base is not None
+    np.testing.assert_array_equal(view[store.offsets[str(product.pk)]], [6, 5, 4])
+
+
+def test_syncing_backwards_rebuilds_the_base(make_product, tmp_path):
+    product = make_product()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    for days_ago in range(1, 6):
+        add_sales(product, yesterday - timedelta(days=days_ago - 1), days_ago)
+    training_store.sync(through=yesterday, path=tmp_path)
+
+    training_store.sync(through=yesterday - timedelta(days=1), path=tmp_path)
+
+    store = training_store.TrainingStore.open(tmp_path)
+    assert store.base == 2
+    _, _, matrix = store.series('quantity_sold', [product.pk])
+    np.testing.assert_array_equal(matrix, [[5, 4, 3, 2]])
+
+
+def test_only_the_current_and_replaced_generations_are_kept(make_product, tmp_path):
+    product = make_product()
+    yesterday = timezone.localdate() - timedelta(days=1)
+    for days_ago in range(3, 0, -1):
+        day = yesterday - timedelta(days=days_ago - 1)
+        add_sales(product, day, 1)
+        training_store.sync(through=day, path=tmp_path)
+
+    assert sorted(path.name for path in tmp_path.glob('quantity_sold.*.npy')) == [
+        'quantity_sold.1.npy', 'quantity_sold.2.tail.npy', 'quantity_sold.3.tail.npy',
+    ]
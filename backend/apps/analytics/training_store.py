@@ -0,0 +1,382 @@
+"""
+Memory-mapped columnar store of daily SalesMetrics series for model training
+"""
+
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import SalesMetrics
+
+logger = logging.getLogger(__name__)
+
+# (products x days) columns and their on-disk dtypes
+SERIES_COLUMNS = {
+    'quantity_sold': np.float32,
+    'revenue': np.float64,
+    'opening_stock': np.int32,
+    'closing_stock': np.int32,
+    'stock_in': np.int32,
+    'stock_out': np.int32,
+}
+# Per-day calendar columns, shared by every product
+CALENDAR_COLUMNS = {
+    'is_holiday': np.uint8,
+    'is_weekend': np.uint8,
+}
+
+META_FILE = 'meta.json'
+LOCK_FILE = '.lock'
+# Trailing days re-read on every sync, so late folds into recent buckets are picked up
+REFRESH_DAYS = 3
+# Spare room added whenever the arrays grow, so column shapes rarely change between syncs
+SPARE_DAYS = 366
+SPARE_PRODUCTS = 1024
+READ_BATCH_SIZE = 100_000
+
+
+def store_path():
+    return settings.TRAINING_STORE_PATH
+
+
+def _column_file(path, column, generation):
+    return os.path.join(path, f"{column}.{generation}.npy")
+
+
+def _tail_file(path, column, generation):
+    return os.path.join(path, f"{column}.{generation}.tail.npy")
+
+
+def _meta_files(path, meta):
+    """Paths of the column files a meta file refers to"""
+    files = set()
+    for column in {**SERIES_COLUMNS, **CALENDAR_COLUMNS}:
+        files.add(_column_file(path, column, meta.get('base', meta['generation'])))
+        if 'tail_start' in meta:
+            files.add(_tail_file(path, column, meta['generation']))
+    return files
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, META_FILE)) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(path, meta):
+    # Readers only ever see a complete meta file
+    temporary = os.path.join(path, META_FILE + '.tmp')
+    with open(temporary, 'w') as handle:
+        json.dump(meta, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, os.path.join(path, META_FILE))
+
+
+@contextmanager
+def _exclusive(path):
+    with open(os.path.join(path, LOCK_FILE), 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class TrainingStore:
+    """
+    Read-only view of the store.
+
+    Each column is a base .npy file with one row per product and one column
+    per day from `start_date`, opened with np.load(mmap_mode='r'), plus a
+    small tail file holding the days from `tail_start` on, which the next
+    sync re-reads. Processes opening the same store share the OS page cache
+    instead of each holding a copy, and slicing a date range of every
+    product within either file is a zero-copy view. The meta file maps
+    product ids to row offsets; day offsets are days since `start_date`.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.start_date = date.fromisoformat(meta['start_date'])
+        self.synced_through = date.fromisoformat(meta['synced_through'])
+        self.n_days = meta['n_days']
+        # Stores written before tail files existed keep every day in the base
+        self.base = meta.get('base', meta['generation'])
+        self.tail_start = meta.get('tail_start', self.n_days)
+        self.product_ids = meta['products']
+        self.offsets = {product_id: row for row, product_id in enumerate(self.product_ids)}
+        self._columns = {}
+
+    @classmethod
+    def open(cls, path=None):
+        """Open the store at `path`, or return None if it has not been built"""
+        path = path or store_path()
+        meta = _read_meta(path)
+        return cls(path, meta) if meta else None
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(_column_file(self.path, name, self.base), mmap_mode='r')
+        return self._columns[name]
+
+    def tail(self, name):
+        key = (name, 'tail')
+        if key not in self._columns:
+            self._columns[key] = np.load(
+                _tail_file(self.path, name, self.meta['generation']), mmap_mode='r'
+            )
+        return self._columns[key]
+
+    def days(self, name, first, last, rows=None):
+        """
+        Day offsets first..last (exclusive) of a column, of the rows selected
+        by `rows` (all of a calendar column). A view unless the range spans
+        both the base and the tail file.
+        """
+        def take(array, start, stop):
+            return array[start:stop] if rows is None else array[rows, start:stop]
+
+        split = self.tail_start
+        if last <= split:
+            return take(self.column(name), first, last)
+        if first >= split:
+            return take(self.tail(name), first - split, last - split)
+        return np.concatenate(
+            [take(self.column(name), first, split), take(self.tail(name), 0, last - split)], axis=-1,
+        )
+
+    def covers(self, start_date, end_date):
+        return self.start_date <= start_date and end_date <= self.synced_through
+
+    def series(self, field, product_ids=None, start_date=None, end_date=None):
+        """
+        Daily values of `field` as (product ids, first date, products x days).
+
+        Without `product_ids` every stored product is returned, as a
+        read-only view of the memory map when the range stays within the
+        base or the tail file (see days). Products not in the store get
+        zero rows, matching days without a SalesMetrics row.
+        """
+        start_date = start_date or self.start_date
+        end_date = end_date or self.synced_through
+        first = (start_date - self.start_date).days
+        last = (end_date - self.start_date).days + 1
+
+        if product_ids is None:
+            return (
+                list(self.product_ids), start_date,
+                self.days(field, first, last, rows=slice(None, len(self.product_ids))),
+            )
+
+        product_ids = list(product_ids)
+        rows = np.fromiter(
+            (self.offsets.get(str(product_id), -1) for product_id in product_ids),
+            dtype=np.int64, count=len(product_ids),
+        )
+        matrix = np.zeros((len(product_ids), last - first), dtype=self.column(field).dtype)
+        found = rows >= 0
+        matrix[found] = self.days(field, first, last, rows=rows[found])
+        return product_ids, start_date, matrix
+
+    def calendar(self, field, start_date=None, end_date=None):
+        """Per-day calendar flags (is_holiday/is_weekend) as a 1-D view"""
+        start_date = start_date or self.start_date
+        end_date = end_date or self.synced_through
+        first = (start_date - self.start_date).days
+        return self.days(field, first, (end_date - self.start_date).days + 1)
+
+
+_opened = {'key': None, 'store': None}
+
+
+def open_store():
+    """
+    The current store, reopened only when a sync has replaced its meta
+    file. Returns None when the store has not been built.
+    """
+    path = store_path()
+    try:
+        key = (path, os.stat(os.path.join(path, META_FILE)).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _opened['key'] != key:
+        _opened['store'] = TrainingStore.open(path)
+        _opened['key'] = key
+    return _opened['store']
+
+
+def _allocate(filename, column, n_products, n_days, previous=None):
+    """
+    Create the file of one column, copying every synced day of `previous`
+    into it
+    """
+    calendar = column in CALENDAR_COLUMNS
+    array = np.lib.format.open_memmap(
+        filename, mode='w+',
+        dtype=CALENDAR_COLUMNS[column] if calendar else SERIES_COLUMNS[column],
+        shape=(n_days,) if calendar else (n_products, n_days),
+    )
+    if previous is not None:
+        old = previous.days(column, 0, previous.n_days, rows=None if calendar else slice(None))
+        if calendar:
+            array[:old.shape[0]] = old
+        else:
+            array[:old.shape[0], :old.shape[1]] = old
+    array.flush()
+    del array
+
+
+def _remove_unused(path, keep):
+    """Remove every column file of `path` that is not in `keep`"""
+    for name in os.listdir(path):
+        filename = os.path.join(path, name)
+        if name.endswith('.npy') and filename not in keep:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+
+def sync(through=None, path=None):
+    """
+    Bring the store up to date with SalesMetrics through `through`
+    (yesterday by default).
+
+    The first sync exports the full history; later syncs only re-read the
+    last REFRESH_DAYS stored days and append new ones. New products are
+    appended as rows. Days that the next sync will re-read go into a new
+    tail file, and days that just became final are written into the base
+    file in place: open readers take those days from their own tail file,
+    so they never see them half-written. The base is only copied into a
+    new generation when it has to grow or the store is synced backwards.
+    The meta file is swapped in last. Returns the number of SalesMetrics
+    rows read.
+    """
+    path = path or store_path()
+    through = through or timezone.localdate() - timedelta(days=1)
+    os.makedirs(path, exist_ok=True)
+
+    with _exclusive(path):
+        current = TrainingStore.open(path)
+        if current is None:
+            first_day = SalesMetrics.objects.aggregate(first=Min('date'))['first']
+            if first_day is None:
+                return 0
+            start_date, read_from, products = first_day, first_day, []
+        else:
+            start_date = current.start_date
+            read_from = max(start_date, current.synced_through - timedelta(days=REFRESH_DAYS - 1))
+            products = list(current.product_ids)
+        if through < read_from:
+            return 0
+
+        rows = SalesMetrics.objects.filter(date__gte=read_from, date__lte=through)
+        offsets = {product_id: row for row, product_id in enumerate(products)}
+        for product_id in rows.order_by().values_list('product_id', flat=True).distinct().iterator():
+            if str(product_id) not in offsets:
+                offsets[str(product_id)] = len(products)
+                products.append(str(product_id))
+
+        n_days = (through - start_date).days + 1
+        first = (read_from - start_date).days
+        # Days from tail_start on are re-read by the next sync
+        tail_start = max(0, n_days - REFRESH_DAYS)
+        capacity = current.meta['capacity'] if current else [0, 0]
+        grown = len(products) > capacity[0] or n_days > capacity[1]
+        if grown:
+            capacity = [len(products) + SPARE_PRODUCTS, n_days + SPARE_DAYS]
+        generation = current.meta['generation'] + 1 if current else 1
+        # Readers only take base days before their tail_start, so base days
+        # from the current tail_start on can be rewritten in place
+        rebuild = (
+            current is None or grown
+            or through < current.synced_through or first < current.tail_start
+        )
+        base = generation if rebuild else current.base
+        for column in {**SERIES_COLUMNS, **CALENDAR_COLUMNS}:
+            if rebuild:
+                _allocate(_column_file(path, column, base), column, capacity[0], capacity[1], previous=current)
+            _allocate(_tail_file(path, column, generation), column, capacity[0], n_days - tail_start)
+
+        columns = {
+            column: np.load(_column_file(path, column, base), mmap_mode='r+')
+            for column in {**SERIES_COLUMNS, **CALENDAR_COLUMNS}
+        }
+        tails = {
+            column: np.load(_tail_file(path, column, generation), mmap_mode='r+')
+            for column in {**SERIES_COLUMNS, **CALENDAR_COLUMNS}
+        }
+        for column in columns:
+            # Tail days before the re-read ones (after a backwards sync) keep their values
+            tails[column][..., :max(0, first - tail_start)] = columns[column][..., tail_start:first]
+            columns[column][..., first:tail_start] = 0
+
+        fields = ('product_id', 'date', *SERIES_COLUMNS, *CALENDAR_COLUMNS)
+        read = 0
+        batch = []
+        for row in rows.order_by().values_list(*fields).iterator(chunk_size=20000):
+            batch.append(row)
+            if len(batch) >= READ_BATCH_SIZE:
+                read += _scatter(columns, tails, tail_start, batch, offsets, start_date)
+                batch = []
+        if batch:
+            read += _scatter(columns, tails, tail_start, batch, offsets, start_date)
+
+        for array in (*columns.values(), *tails.values()):
+            array.flush()
+        del columns, tails
+
+        meta = {
+            'generation': generation,
+            'base': base,
+            'tail_start': tail_start,
+            'capacity': capacity,
+            'start_date': start_date.isoformat(),
+            'synced_through': through.isoformat(),
+            'n_days': n_days,
+            'products': products,
+            'columns': {
+                column: np.dtype(dtype).name
+                for column, dtype in {**SERIES_COLUMNS, **CALENDAR_COLUMNS}.items()
+            },
+        }
+        _write_meta(path, meta)
+        # The replaced generation's files stay for readers that opened its
+        # meta but have not mapped every column yet; mapped files outlive
+        # removal
+        _remove_unused(path, _meta_files(path, meta) | (_meta_files(path, current.meta) if current else set()))
+
+    logger.info("Training store synced through %s: %s rows, %s products", through, read, len(products))
+    return read
+
+
+def _scatter(columns, tails, tail_start, batch, offsets, start_date):
+    """
+    Write one batch of SalesMetrics rows into the base column arrays, or
+    into the tail arrays for days from `tail_start` on
+    """
+    count = len(batch)
+    rows = np.fromiter((offsets[str(row[0])] for row in batch), dtype=np.int64, count=count)
+    days = np.fromiter(((row[1] - start_date).days for row in batch), dtype=np.int64, count=count)
+    in_tail = days >= tail_start
+    for position, column in enumerate((*SERIES_COLUMNS, *CALENDAR_COLUMNS), start=2):
+        dtype = SERIES_COLUMNS.get(column) or CALENDAR_COLUMNS[column]
+        values = np.fromiter((row[position] for row in batch), dtype=np.float64, count=count).astype(dtype)
+        for target, selected, offset in ((columns, ~in_tail, 0), (tails, in_tail, tail_start)):
+            if column in CALENDAR_COLUMNS:
+                np.maximum.at(target[column], days[selected] - offset, values[selected])
+            else:
+                target[column][rows[selected], days[selected] - offset] = values[selected]
+    return count
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('forecast/', views.ForecastView.as_view(), name='forecast'),
+    path('forecast/batch/', views.ForecastBatchView.as_view(), name='forecast-batch'),
+    path('forecast/accuracy/', views.ForecastAccuracyView.as_view(), name='forecast-accuracy'),
+]
@@ -0,0 +1,220 @@
+"""
+API views for analytics and AI forecasting
+"""
+
+import json
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.inventory.models import Product
+
+from . import backtest, forecast_cache
+from .forecasting import predict_from_artifacts
+from .models import ForecastModel, SalesForecast
+
+MAX_FORECAST_DAYS = 365
+MAX_BATCH_PRODUCTS = 2000
+
+
+class AccuracyPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def parse_horizon(value):
+    """Validate a `days` query parameter"""
+    if value in (None, ''):
+        return settings.FORECASTING_PERIOD_DAYS
+    days = int(value)
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_FORECAST_DAYS}")
+    return days
+
+
+class ForecastView(APIView):
+    """
+    Sales forecast horizon for a single product from the active model.
+
+    Horizons are served from the forecast cache; the database is only read
+    on a cache miss, after which the product's horizon is cached.
+    """
+
+    def get(self, request):
+        product_id = request.query_params.get('product_id')
+        if not product_id:
+            return Response({'detail': 'product_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = parse_horizon(request.query_params.get('days'))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        active = forecast_cache.get_active_model()
+        if active is None:
+            return Response({'detail': 'No active forecast model'}, status=status.HTTP_404_NOT_FOUND)
+
+        start = timezone.localdate()
+        cached = forecast_cache.get_many(active, [product_id]).get(product_id)
+        if cached is not None:
+            return Response({
+                'product_id': product_id,
+                'model': active['model'],
+                'forecasts': forecast_cache.slice_horizon(cached, start, days),
+            })
+
+        try:
+            product_exists = Product.objects.filter(pk=product_id).exists()
+        except ValidationError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        if not product_exists:
+            return Response({'detail': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        stored = dict(forecast_cache.load_horizons(active, [product_id], start))
+        data = forecast_cache.slice_horizon(stored.get(str(product_id), []), start, days)
+
+        model = None if data else ForecastModel.objects.get(pk=active['model']['id'])
+        if model is not None and model.model_file_path:
+            predictions, lower, upper = predict_from_artifacts(model, product_id, days)
+            data = [
+                {
+                    'forecast_date': start + timedelta(days=i),
+                    'predicted_sales': int(round(predictions[i])),
+                    'confidence_lower': round(float(lower[i]), 2),
+                    'confidence_upper': round(float(upper[i]), 2),
+                    'confidence_level': 95.0,
+                    'actual_sales': None,
+                    'accuracy_percentage': None,
+                }
+                for i in range(days)
+            ]
+
+        return Response({
+            'product_id': product_id,
+            'model': active['model'],
+            'forecasts': data,
+        })
+
+
+class ForecastBatchView(APIView):
+    """
+    Sales forecast horizons for many products in one request.
+
+    Takes `product_ids` (a list, repeated or comma-separated) or a
+    `category_id`, plus `days`, from the query string (GET) or JSON body
+    (POST). Cached horizons are fetched with one multi-get and the misses
+    with a single query over the (product, forecast_date) index. Pass
+    `output=ndjson` to stream one JSON line per product instead.
+    """
+
+    def get(self, request):
+        return self._respond(request, request.query_params, getlist=request.query_params.getlist)
+
+    def post(self, request):
+        return self._respond(request, request.data)
+
+    def _respond(self, request, params, getlist=None):
+        try:
+            days = parse_horizon(params.get('days'))
+            product_ids = self._product_ids(params, getlist)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        active = forecast_cache.get_active_model()
+        if active is None:
+            return Response({'detail': 'No active forecast model'}, status=status.HTTP_404_NOT_FOUND)
+
+        start = timezone.localdate()
+        horizons = self._iter_horizons(active, product_ids, start, days)
+
+        if 'ndjson' in (params.get('output'), request.query_params.get('output')):
+            lines = (
+                json.dumps({'product_id': product_id, 'forecasts': forecasts}, cls=DjangoJSONEncoder) + '\n'
+                for product_id, forecasts in horizons
+            )
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+        return Response({
+            'model': active['model'],
+            'days': days,
+            'forecasts': dict(horizons),
+        })
+
+    def _product_ids(self, params, getlist):
+        category_id = params.get('category_id')
+        if category_id not in (None, ''):
+            product_ids = list(
+                Product.objects.filter(category_id=int(category_id), is_active=True)
+                .order_by('pk').values_list('pk', flat=True)[:MAX_BATCH_PRODUCTS + 1]
+            )
+        else:
+            raw = getlist('product_ids') if getlist else params.get('product_ids', [])
+            if isinstance(raw, str):
+                raw = [raw]
+            product_ids = [value.strip() for item in raw for value in str(item).split(',') if value.strip()]
+            if not product_ids:
+                raise ValueError("product_ids or category_id is required")
+            product_ids = [uuid.UUID(value) for value in dict.fromkeys(product_ids)]
+        if len(product_ids) > MAX_BATCH_PRODUCTS:
+            raise ValueError(f"At most {MAX_BATCH_PRODUCTS} products can be requested at once")
+        return [str(product_id) for product_id in product_ids]
+
+    def _iter_horizons(self, active, product_ids, start, days):
+        """Yield (product_id, forecasts) from the cache, then from one query"""
+        cached = forecast_cache.get_many(active, product_ids)
+        for product_id in product_ids:
+            if product_id in cached:
+                yield product_id, forecast_cache.slice_horizon(cached[product_id], start, days)
+
+        misses = [product_id for product_id in product_ids if product_id not in cached]
+        if not misses:
+            return
+        found = set()
+        for product_id, horizon in forecast_cache.load_horizons(active, misses, start):
+            found.add(product_id)
+            yield product_id, forecast_cache.slice_horizon(horizon, start, days)
+        for product_id in misses:
+            if product_id not in found:
+                yield product_id, []
+
+
+class ForecastAccuracyView(APIView):
+    """
+    MAE, RMSE, MAPE and accuracy of stored forecasts against actual sales.
+
+    `group_by` takes a comma-separated subset of model, product and
+    category (default: model); `model_id`, `start_date` and `end_date`
+    narrow the forecasts scored. Groupings by product grow with the
+    catalogue and are paginated with `page` and `page_size`. Accuracy by
+    horizon comes from the model's latest backtest (`backtest_results`).
+    """
+    pagination_class = AccuracyPagination
+
+    def get(self, request):
+        params = request.query_params
+        group_by = [name.strip() for name in params.get('group_by', 'model').split(',') if name.strip()]
+        forecasts = SalesForecast.objects.all()
+        try:
+            if params.get('model_id'):
+                forecasts = forecasts.filter(model_id=int(params['model_id']))
+            start_date = date.fromisoformat(params['start_date']) if params.get('start_date') else None
+            end_date = date.fromisoformat(params['end_date']) if params.get('end_date') else None
+            rows = backtest.accuracy_queryset(group_by, start_date, end_date, queryset=forecasts)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'product' not in group_by:
+            return Response({'group_by': group_by, 'results': [backtest.accuracy_row(row, group_by) for row in rows]})
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        response = paginator.get_paginated_response([backtest.accuracy_row(row, group_by) for row in page])
+        response.data['group_by'] = group_by
+        return response
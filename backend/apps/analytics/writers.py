@@ -0,0 +1,150 @@
+"""
+Bulk writers for high-volume analytics tables
+"""
+
+import csv
+import io
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import forecast_cache
+from .models import SalesForecast
+
+
+class SalesForecastWriter:
+    """
+    Streams forecast arrays into SalesForecast in bounded batches.
+
+    Rows are buffered as plain tuples (no model instances) and flushed every
+    `batch_size` rows, either as a multi-row INSERT ... ON CONFLICT DO UPDATE
+    (method='upsert') or by COPYing into a temporary staging table that is
+    merged into SalesForecast with one INSERT ... SELECT ... ON CONFLICT
+    (method='copy'). Existing actual_sales values are left untouched.
+    These statements bypass post_save, so the cached horizons of each
+    batch's products are dropped once the batch commits.
+
+    Use as a context manager so the final partial batch is flushed:
+
+        with SalesForecastWriter(model) as writer:
+            writer.add_arrays(product_ids, first_date, predictions, lower, upper)
+    """
+
+    METHODS = ('upsert', 'copy')
+    COLUMNS = (
+        'product_id', 'model_id', 'forecast_date', 'predicted_sales',
+        'confidence_lower', 'confidence_upper', 'confidence_level',
+    )
+    # Postgres allows at most 65535 bind parameters per statement
+    MAX_UPSERT_ROWS = 65535 // (len(COLUMNS) + 2)
+    STAGING_TABLE = 'analytics_salesforecast_staging'
+
+    def __init__(self, model, method='upsert', batch_size=5000, confidence_level=95):
+        if method not in self.METHODS:
+            raise ValueError(f"method must be one of {', '.join(self.METHODS)}")
+        self.model_id = model.pk
+        self.method = method
+        self.batch_size = batch_size if method == 'copy' else min(batch_size, self.MAX_UPSERT_ROWS)
+        self.confidence_level = confidence_level
+        self.rows_written = 0
+        self.product_ids = set()
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, product_id, forecast_date, predicted_sales, confidence_lower, confidence_upper):
+        """Buffer a single forecast row"""
+        self._buffer.append((
+            product_id, self.model_id, forecast_date, int(predicted_sales),
+            round(float(confidence_lower), 2), round(float(confidence_upper), 2),
+            self.confidence_level,
+        ))
+        self.product_ids.add(str(product_id))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def add_arrays(self, product_ids, first_date, predictions, lower, upper):
+        """Buffer (products x horizon) forecast arrays starting at `first_date`"""
+        horizon = predictions.shape[1]
+        dates = [first_date + timedelta(days=i) for i in range(horizon)]
+        rounded = np.rint(predictions).astype(np.int64)
+        for i, product_id in enumerate(product_ids):
+            for j, forecast_date in enumerate(dates):
+                self.add(product_id, forecast_date, rounded[i, j], lower[i, j], upper[i, j])
+
+    def flush(self):
+        """Write any buffered rows"""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        product_ids = {row[0] for row in rows}
+        with transaction.atomic():
+            if self.method == 'copy':
+                self._copy_merge(rows)
+            else:
+                self._upsert(rows)
+            transaction.on_commit(lambda: forecast_cache.invalidate_products(self.model_id, product_ids))
+        self.rows_written += len(rows)
+
+    def _conflict_clause(self):
+        return """
+            ON CONFLICT (product_id, model_id, forecast_date) DO UPDATE SET
+                predicted_sales = EXCLUDED.predicted_sales,
+                confidence_lower = EXCLUDED.confidence_lower,
+                confidence_upper = EXCLUDED.confidence_upper,
+                confidence_level = EXCLUDED.confidence_level,
+                updated_at = EXCLUDED.updated_at
+        """
+
+    def _upsert(self, rows):
+        table = connection.ops.quote_name(SalesForecast._meta.db_table)
+        columns = self.COLUMNS + ('created_at', 'updated_at')
+        placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        now = timezone.now()
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            + ', '.join([placeholder] * len(rows))
+            + self._conflict_clause()
+        )
+        params = [value for row in rows for value in row + (now, now)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _copy_merge(self, rows):
+        table = connection.ops.quote_name(SalesForecast._meta.db_table)
+        staging = self.STAGING_TABLE
+        columns = ', '.join(self.COLUMNS)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {staging} (
+                    product_id uuid NOT NULL,
+                    model_id bigint NOT NULL,
+                    forecast_date date NOT NULL,
+                    predicted_sales integer NOT NULL,
+                    confidence_lower numeric(10, 2) NOT NULL,
+                    confidence_upper numeric(10, 2) NOT NULL,
+                    confidence_level numeric(5, 2) NOT NULL
+                )
+            """)
+            cursor.execute(f"TRUNCATE {staging}")
+            cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}, created_at, updated_at) "
+                f"SELECT {columns}, now(), now() FROM {staging}"
+                + self._conflict_clause()
+            )
+            cursor.execute(f"TRUNCATE {staging}")
@@ -0,0 +1,98 @@
+"""
+Incremental evaluation of stock level alerts
+"""
+
+from django.utils import timezone
+
+from .models import InventoryAlert, Product
+
+
+# Alert types driven by stock thresholds, with the priority each is raised at
+STOCK_ALERT_PRIORITIES = {
+    'OUT_OF_STOCK': 'CRITICAL',
+    'LOW_STOCK': 'HIGH',
+    'REORDER': 'MEDIUM',
+    'OVERSTOCK': 'LOW',
+}
+
+
+def stock_alert_types(current_stock, min_stock_level, reorder_point, max_stock_level):
+    """Stock alerts that should be open for the given stock level"""
+    if current_stock == 0:
+        return {'OUT_OF_STOCK'}
+    if current_stock <= min_stock_level:
+        return {'LOW_STOCK'}
+    if current_stock <= reorder_point:
+        return {'REORDER'}
+    if current_stock > max_stock_level:
+        return {'OVERSTOCK'}
+    return set()
+
+
+def crosses_threshold(old_stock, new_stock, min_stock_level, reorder_point, max_stock_level):
+    """Whether a stock change moves a product into a different alert state"""
+    thresholds = (min_stock_level, reorder_point, max_stock_level)
+    return (
+        stock_alert_types(old_stock, *thresholds)
+        != stock_alert_types(new_stock, *thresholds)
+    )
+
+
+def _alert_message(alert_type, product):
+    name, sku, stock = product['name'], product['sku'], product['current_stock']
+    if alert_type == 'OUT_OF_STOCK':
+        return f"{name} ({sku}) is out of stock"
+    if alert_type == 'LOW_STOCK':
+        return f"{name} ({sku}) is low on stock: {stock} left, minimum is {product['min_stock_level']}"
+    if alert_type == 'REORDER':
+        return f"{name} ({sku}) reached its reorder point: {stock} left, reorder at {product['reorder_point']}"
+    return f"{name} ({sku}) is overstocked: {stock} in stock, maximum is {product['max_stock_level']}"
+
+
+def evaluate_stock_alerts(product_ids):
+    """
+    Open and resolve stock alerts for the given products.
+
+    Open alerts are unique per (product, alert_type), enforced by a partial
+    unique constraint, so new alerts are bulk-inserted with conflicts
+    ignored instead of checking for duplicates first. Alerts whose
+    condition no longer holds are resolved with one UPDATE per alert type.
+    Returns the number of alerts that should be open and the number that
+    were resolved.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0, 0
+
+    products = Product.objects.filter(pk__in=product_ids).values(
+        'pk', 'name', 'sku', 'current_stock', 'min_stock_level', 'reorder_point', 'max_stock_level',
+    )
+
+    to_open = []
+    keep_open = {alert_type: [] for alert_type in STOCK_ALERT_PRIORITIES}
+    for product in products:
+        alert_types = stock_alert_types(
+            product['current_stock'], product['min_stock_level'],
+            product['reorder_point'], product['max_stock_level'],
+        )
+        for alert_type in alert_types:
+            keep_open[alert_type].append(product['pk'])
+            to_open.append(InventoryAlert(
+                product_id=product['pk'],
+                alert_type=alert_type,
+                priority=STOCK_ALERT_PRIORITIES[alert_type],
+                message=_alert_message(alert_type, product),
+            ))
+
+    resolved = 0
+    now = timezone.now()
+    for alert_type, open_ids in keep_open.items():
+        resolved += (
+            InventoryAlert.objects
+            .filter(product_id__in=product_ids, alert_type=alert_type, is_resolved=False)
+            .exclude(product_id__in=open_ids)
+            .update(is_resolved=True, resolved_at=now)
+        )
+
+    InventoryAlert.objects.bulk_create(to_open, ignore_conflicts=True)
+    return len(to_open), resolved
@@ -0,0 +1,31 @@
+"""
+Filters for inventory API endpoints
+"""
+
+import django_filters
+
+from .models import Product
+
+STOCK_STATUS_CHOICES = [
+    ('in_stock', 'In Stock'),
+    ('low_stock', 'Low Stock'),
+    ('out_of_stock', 'Out of Stock'),
+]
+
+
+class ProductFilter(django_filters.FilterSet):
+    stock_status = django_filters.ChoiceFilter(choices=STOCK_STATUS_CHOICES, method='filter_stock_status')
+    low_stock = django_filters.BooleanFilter(method='filter_low_stock')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'brand', 'is_active']
+
+    def filter_stock_status(self, queryset, name, value):
+        return queryset.with_stock_status(value)
+
+    def filter_low_stock(self, queryset, name, value):
+        """Matches Product.is_low_stock, i.e. includes out of stock products"""
+        if value is None:
+            return queryset
+        return queryset.low_stock() if value else queryset.in_stock()
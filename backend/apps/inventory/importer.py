@@ -0,0 +1,353 @@
+"""
+Streaming bulk import of products and stock counts from CSV/XLSX files
+"""
+
+import csv
+import logging
+import os
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .alerts import evaluate_stock_alerts
+from .ledger import apply_stock_movements
+from .models import Category, Product, StockMovement
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+# Row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+def _text(max_length):
+    def parse(value):
+        value = str(value).strip()
+        if len(value) > max_length:
+            raise ValueError(f"longer than {max_length} characters")
+        return value
+    return parse
+
+
+def _decimal(max_digits, decimal_places=2):
+    limit = Decimal(10) ** (max_digits - decimal_places)
+
+    def parse(value):
+        try:
+            number = Decimal(str(value).strip().replace(',', ''))
+        except InvalidOperation:
+            raise ValueError("not a number")
+        if not number.is_finite() or number < 0:
+            raise ValueError("must be a non-negative number")
+        number = number.quantize(Decimal(1).scaleb(-decimal_places))
+        if number >= limit:
+            raise ValueError(f"must be less than {limit}")
+        return number
+    return parse
+
+
+def _count(value):
+    try:
+        number = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError("not a whole number")
+    if not number.is_finite() or number != number.to_integral_value() or number < 0:
+        raise ValueError("must be a non-negative whole number")
+    return int(number)
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError("must be true or false")
+
+
+# Importable Product columns and their parsers. `category` holds the
+# category name and `stock` the counted quantity on hand.
+PRODUCT_COLUMNS = {
+    'sku': _text(100),
+    'name': _text(200),
+    'category': _text(100),
+    'brand': _text(100),
+    'description': str,
+    'price': _decimal(10),
+    'cost': _decimal(10),
+    'min_stock_level': _count,
+    'max_stock_level': _count,
+    'reorder_point': _count,
+    'weight': _decimal(8),
+    'dimensions': _text(100),
+    'location': _text(50),
+    'barcode': _text(100),
+    'is_active': _boolean,
+    'is_trackable': _boolean,
+}
+STOCK_COLUMN = 'stock'
+# Columns a row needs when it creates a product
+REQUIRED_FOR_NEW = ('name', 'category', 'brand', 'price', 'cost', 'barcode')
+THRESHOLD_COLUMNS = {'min_stock_level', 'max_stock_level', 'reorder_point'}
+
+
+def normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def read_rows(path):
+    """
+    Stream (row number, {column: value}) pairs from a CSV or XLSX file.
+
+    CSV is read line by line and XLSX through openpyxl's read-only mode,
+    so memory use does not grow with the file. Blank cells are left out.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        yield from _read_csv(path)
+    elif extension == '.xlsx':
+        yield from _read_xlsx(path)
+    else:
+        raise ValidationError(f"Unsupported file type {extension or '(none)'}; use CSV or XLSX")
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        header = [normalize_header(value) for value in next(reader, [])]
+        for number, values in enumerate(reader, start=2):
+            row = {key: value for key, value in zip(header, values) if key and value.strip() != ''}
+            if row:
+                yield number, row
+
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [normalize_header(value) for value in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            row = {
+                key: value for key, value in zip(header, values)
+                if key and value is not None and str(value).strip() != ''
+            }
+            if row:
+                yield number, row
+    finally:
+        workbook.close()
+
+
+def clean_row(row):
+    """Parse the known columns of one row; returns (values, errors)"""
+    values, errors = {}, []
+    for column, raw in row.items():
+        parser = PRODUCT_COLUMNS.get(column)
+        if column == STOCK_COLUMN:
+            parser = _count
+        if parser is None:
+            continue
+        try:
+            values[column] = parser(raw)
+        except ValueError as exc:
+            errors.append(f"{column}: {exc}")
+    if not values.get('sku') and not values.get('barcode'):
+        errors.append("sku or barcode is required")
+    return values, errors
+
+
+class ProductImporter:
+    """
+    Upserts products and applies stock counts from a stream of rows.
+
+    Rows are validated and written a chunk at a time. Each chunk looks up
+    its existing products by sku and barcode in one query, creates new
+    products with bulk_create and updates existing ones with bulk_update
+    (only the columns the row carries). Rows match on sku, or on barcode
+    when they have no sku. Categories are resolved by name
+    from an in-memory map, and missing ones are created. A `stock` column
+    sets the quantity on hand through the stock ledger, as one ADJUSTMENT
+    movement per product for the difference. Invalid rows are reported
+    and skipped, never aborting the import.
+    """
+
+    def __init__(self, user, reference='', chunk_size=IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.reference = reference[:100]
+        self.chunk_size = chunk_size
+        self.categories = None
+        self.result = {'rows': 0, 'created': 0, 'updated': 0, 'stock_adjusted': 0, 'error_count': 0, 'errors': []}
+
+    def run(self, rows, progress=None):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if progress is not None:
+                progress(self.result)
+        return self.result
+
+    def error(self, number, messages):
+        self.result['error_count'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'row': number, 'errors': list(messages)})
+
+    def category_ids(self, names):
+        """Category ids by (case-insensitive) name, creating missing categories"""
+        if self.categories is None:
+            self.categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+        missing = {name.lower(): name for name in names if name.lower() not in self.categories}
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing.values()], ignore_conflicts=True)
+            for pk, name in Category.objects.filter(name__in=missing.values()).values_list('pk', 'name'):
+                self.categories[name.lower()] = pk
+        return self.categories
+
+    def import_chunk(self, chunk):
+        self.result['rows'] += len(chunk)
+        cleaned = []
+        seen = set()
+        for number, row in chunk:
+            values, errors = clean_row(row)
+            keys = {(column, values[column]) for column in ('sku', 'barcode') if values.get(column)}
+            if not errors and keys & seen:
+                errors.append("duplicate sku or barcode earlier in the same chunk")
+            if errors:
+                self.error(number, errors)
+                continue
+            seen |= keys
+            cleaned.append((number, values))
+
+        skus = [values['sku'] for _, values in cleaned if values.get('sku')]
+        barcodes = [values['barcode'] for _, values in cleaned if values.get('barcode')]
+        existing = list(Product.objects.filter(Q(sku__in=skus) | Q(barcode__in=barcodes)))
+        by_sku = {product.sku: product for product in existing}
+        by_barcode = {product.barcode: product for product in existing if product.barcode}
+        categories = self.category_ids({values['category'] for _, values in cleaned if values.get('category')})
+
+        creates, updates, counts = [], [], []
+        for number, values in cleaned:
+            # Rows match on sku, or on barcode when they have no sku
+            other = by_barcode.get(values.get('barcode'))
+            product = by_sku.get(values['sku']) if values.get('sku') else other
+            if other is not None and (product is None or other.pk != product.pk):
+                self.error(number, [f"barcode {values['barcode']} belongs to product {other.sku}"])
+                continue
+            fields = {key: value for key, value in values.items() if key != STOCK_COLUMN}
+            if 'category' in fields:
+                fields['category_id'] = categories[fields.pop('category').lower()]
+
+            if product is None:
+                missing = [column for column in REQUIRED_FOR_NEW if column not in values]
+                if 'sku' not in values:
+                    missing.insert(0, 'sku')
+                if missing:
+                    self.error(number, [f"new product needs: {', '.join(missing)}"])
+                    continue
+                product = Product(**fields)
+                creates.append((number, product))
+            else:
+                for key, value in fields.items():
+                    setattr(product, key, value)
+                updates.append((number, product, set(fields)))
+            if STOCK_COLUMN in values:
+                counts.append((number, product, values[STOCK_COLUMN]))
+
+        written = self.write_products(creates, updates)
+        self.apply_counts([(number, product, count) for number, product, count in counts if number in written])
+        touched = [product.pk for number, product in creates if number in written]
+        touched += [
+            product.pk for number, product, fields in updates
+            if number in written and fields & THRESHOLD_COLUMNS
+        ]
+        # bulk_create and bulk_update skip the post_save signal that keeps alerts current
+        evaluate_stock_alerts(touched)
+
+    def write_products(self, creates, updates):
+        """Bulk-write the chunk, falling back to row by row to isolate bad rows"""
+        now = timezone.now()
+        for _, product, _ in updates:
+            product.updated_at = now
+        fields = sorted({field for _, _, changed in updates for field in changed} | {'updated_at'})
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create([product for _, product in creates])
+                if updates:
+                    Product.objects.bulk_update([product for _, product, _ in updates], fields)
+        except DatabaseError:
+            logger.info("Bulk write of an import chunk failed, retrying row by row", exc_info=True)
+        else:
+            self.result['created'] += len(creates)
+            self.result['updated'] += len(updates)
+            return {number for number, _ in creates} | {number for number, _, _ in updates}
+
+        written = set()
+        for number, product in creates:
+            try:
+                with transaction.atomic():
+                    product.save(force_insert=True)
+            except DatabaseError as exc:
+                self.error(number, [str(exc).strip().splitlines()[0]])
+                continue
+            written.add(number)
+            self.result['created'] += 1
+        for number, product, changed in updates:
+            try:
+                with transaction.atomic():
+                    product.save(update_fields=sorted(changed | {'updated_at'}))
+            except DatabaseError as exc:
+                self.error(number, [str(exc).strip().splitlines()[0]])
+                continue
+            written.add(number)
+            self.result['updated'] += 1
+        return written
+
+    def apply_counts(self, counts):
+        """Set counted stock through the ledger, one ADJUSTMENT per product"""
+        if not counts:
+            return
+        with transaction.atomic():
+            current = dict(
+                Product.objects.select_for_update()
+                .filter(pk__in=[product.pk for _, product, _ in counts])
+                .order_by('pk')
+                .values_list('pk', 'current_stock')
+            )
+            movements = [
+                StockMovement(
+                    product_id=product.pk,
+                    movement_type='ADJUSTMENT',
+                    quantity=count - current[product.pk],
+                    reference_number=self.reference,
+                    notes=f"Stock count import, row {number}",
+                    created_by=self.user,
+                )
+                for number, product, count in counts
+                if count != current[product.pk]
+            ]
+            apply_stock_movements(movements)
+        self.result['stock_adjusted'] += len(movements)
+
+
+def import_products(path, user, reference=None, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import a CSV/XLSX file of products and stock counts; returns the report"""
+    importer = ProductImporter(user, reference or os.path.basename(path), chunk_size)
+    result = importer.run(read_rows(path), progress)
+    logger.info(
+        "Imported %s: %s rows, %s created, %s updated, %s stock adjustments, %s errors",
+        path, result['rows'], result['created'], result['updated'], result['stock_adjusted'],
+        result['error_count'],
+    )
+    return result
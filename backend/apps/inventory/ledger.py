@@ -0,0 +1,119 @@
+"""
+Stock Ledger for applying batches of stock movements atomically
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+from .alerts import crosses_threshold, evaluate_stock_alerts
+from .models import Product, StockMovement
+
+
+# Movement types whose quantity always adds to or removes from stock.
+# ADJUSTMENT and TRANSFER carry a signed quantity and are applied as-is.
+INBOUND_MOVEMENT_TYPES = {'IN', 'RETURN'}
+OUTBOUND_MOVEMENT_TYPES = {'OUT', 'DAMAGE'}
+MOVEMENT_TYPE_CODES = {code for code, _ in StockMovement.MOVEMENT_TYPES}
+
+
+def movement_delta(movement):
+    """Signed change in stock caused by a single movement"""
+    if movement.movement_type in INBOUND_MOVEMENT_TYPES:
+        return abs(movement.quantity)
+    if movement.movement_type in OUTBOUND_MOVEMENT_TYPES:
+        return -abs(movement.quantity)
+    return movement.quantity
+
+
+def signed_quantity_expression():
+    """SQL expression for movement_delta(), for use in aggregations"""
+    return Case(
+        When(movement_type__in=INBOUND_MOVEMENT_TYPES, then=Abs('quantity')),
+        When(movement_type__in=OUTBOUND_MOVEMENT_TYPES, then=-Abs('quantity')),
+        default=F('quantity'),
+    )
+
+
+def net_deltas(movements):
+    """Net stock change per product id for a batch of movements"""
+    deltas = defaultdict(int)
+    for movement in movements:
+        if movement.movement_type not in MOVEMENT_TYPE_CODES:
+            raise ValidationError(f"Unknown movement type: {movement.movement_type}")
+        deltas[movement.product_id] += movement_delta(movement)
+    return dict(deltas)
+
+
+def apply_stock_movements(movements, batch_size=500):
+    """
+    Record a batch of unsaved StockMovement instances and update stock.
+
+    The affected products are locked in primary key order, the whole batch
+    is validated against their current stock before anything is written,
+    the movements are inserted with bulk_create and each product gets a
+    single `current_stock = current_stock + delta` update. Everything
+    happens in one transaction, so the audit log and stock levels cannot
+    drift apart. Products whose stock crosses an alert threshold have their
+    stock alerts re-evaluated in the same transaction.
+    """
+    movements = list(movements)
+    if not movements:
+        return []
+
+    deltas = net_deltas(movements)
+
+    with transaction.atomic():
+        levels = {
+            row[0]: row[1:] for row in
+            Product.objects.select_for_update()
+            .filter(pk__in=deltas)
+            .order_by('pk')
+            .values_list('pk', 'current_stock', 'min_stock_level', 'reorder_point', 'max_stock_level')
+        }
+        stock_levels = {product_id: level[0] for product_id, level in levels.items()}
+
+        missing = set(deltas) - set(stock_levels)
+        if missing:
+            raise ValidationError(f"Unknown products: {', '.join(sorted(map(str, missing)))}")
+
+        shortages = [
+            f"{product_id} (stock {stock_levels[product_id]}, change {delta})"
+            for product_id, delta in deltas.items()
+            if stock_levels[product_id] + delta < 0
+        ]
+        if shortages:
+            raise ValidationError(f"Insufficient stock for: {', '.join(shortages)}")
+
+        created = StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+
+        now = timezone.now()
+        restocked = {
+            movement.product_id for movement in movements
+            if movement.movement_type == 'IN' and movement.quantity
+        }
+        for product_id, delta in deltas.items():
+            updates = {'current_stock': F('current_stock') + delta, 'updated_at': now}
+            if product_id in restocked:
+                updates['last_restock_date'] = now
+            elif delta == 0:
+                continue
+            Product.objects.filter(pk=product_id).update(**updates)
+
+        crossed = [
+            product_id for product_id, delta in deltas.items()
+            if crosses_threshold(stock_levels[product_id], stock_levels[product_id] + delta,
+                                 *levels[product_id][1:])
+        ]
+        evaluate_stock_alerts(crossed)
+
+    return created
+
+
+def record_stock_movement(**fields):
+    """Record a single stock movement through the ledger"""
+    return apply_stock_movements([StockMovement(**fields)])[0]
@@ -0,0 +1,65 @@
+"""
+Import products and stock counts from a CSV or XLSX file
+"""
+
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV/XLSX file, matched on sku or barcode, "
+        "and set counted stock from a `stock` column through the stock ledger. "
+        "Rows with errors are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument('--user', required=True,
+                            help='Username recorded on the stock adjustments')
+        parser.add_argument('--reference', default='',
+                            help='Reference number for the stock adjustments (defaults to the file name)')
+        parser.add_argument('--chunk-size', type=int, default=importer.IMPORT_CHUNK_SIZE,
+                            help='Rows validated and written per batch')
+        parser.add_argument('--errors', dest='errors_path',
+                            help='Write the per-row error report to this JSON file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f"No such file: {options['path']}")
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {options['user']}")
+
+        def progress(result):
+            self.stdout.write(
+                f"{result['rows']} rows: {result['created']} created, {result['updated']} updated, "
+                f"{result['stock_adjusted']} stock adjustments, {result['error_count']} errors"
+            )
+
+        try:
+            result = importer.import_products(
+                options['path'], user, options['reference'], progress if options['verbosity'] > 1 else None,
+                chunk_size=options['chunk_size'],
+            )
+        except ValidationError as exc:
+            raise CommandError(exc.messages[0])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} rows: {result['created']} created, {result['updated']} updated, "
+            f"{result['stock_adjusted']} stock adjustments"
+        ))
+        if result['error_count']:
+            self.stdout.write(self.style.WARNING(f"{result['error_count']} rows skipped"))
+            for error in result['errors'][:20]:
+                self.stdout.write(f"  row {error['row']}: {'; '.join(error['errors'])}")
+        if options['errors_path']:
+            with open(options['errors_path'], 'w') as handle:
+                json.dump(result['errors'], handle, indent=2)
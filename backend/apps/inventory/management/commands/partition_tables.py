@@ -0,0 +1,68 @@
+"""
+Convert and maintain the monthly partitions of StockMovement and SalesMetrics
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_ai import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions and detach partitions past their "
+        "retention period. With --convert, first rebuild plain tables as "
+        "partitioned tables (takes an exclusive lock; run in a maintenance window)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert tables that are not partitioned yet')
+        parser.add_argument('--table', choices=[spec.model_label for spec in partitioning.PARTITIONED_TABLES],
+                            help='Only handle this model')
+        parser.add_argument('--months-ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD,
+                            help='Number of future months to create partitions for')
+        parser.add_argument('--detach-before', type=date.fromisoformat,
+                            help='Detach partitions ending on or before this date (YYYY-MM-DD), '
+                                 'overriding the configured retention')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop detached partitions instead of moving them to the archive schema')
+
+    def handle(self, *args, **options):
+        specs = [
+            spec for spec in partitioning.PARTITIONED_TABLES
+            if options['table'] in (None, spec.model_label)
+        ]
+        today = date.today()
+
+        for spec in specs:
+            if not partitioning.is_partitioned(spec):
+                if not options['convert']:
+                    raise CommandError(f"{spec.table} is not partitioned; rerun with --convert")
+                self.stdout.write(f"Converting {spec.table}...")
+                partitioning.convert_to_partitioned(spec, options['months_ahead'])
+                self.stdout.write(self.style.WARNING(
+                    f"{spec.table}_legacy holds the original rows; drop it once the data is verified"
+                ))
+
+            partitioning.ensure_partitions(spec, options['months_ahead'], today=today)
+
+            cutoff = options['detach_before']
+            if cutoff is None and spec.retention_months:
+                cutoff = partitioning.add_months(partitioning.month_start(today), -spec.retention_months)
+            if cutoff is not None:
+                detached = partitioning.detach_partitions_before(
+                    spec, cutoff,
+                    archive_schema=settings.PARTITION_ARCHIVE_SCHEMA,
+                    drop=options['drop'],
+                )
+                for name in detached:
+                    self.stdout.write(f"Detached {name}")
+
+            partitions = partitioning.list_partitions(spec)
+            self.stdout.write(self.style.SUCCESS(
+                f"{spec.table}: {len(partitions)} monthly partitions"
+                + (f", {partitions[0][0]:%Y-%m} to {partitions[-1][0]:%Y-%m}" if partitions else '')
+            ))
@@ -3,6 +3,7 @@ Inventory Management Models for AI-Based Inventory System
 """
 
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 import uuid
@@ -41,6 +42,57 @@ class Supplier(models.Model):
         return self.name
 
 
+def stock_ratio_expression():
+    """current_stock / max_stock_level, NULL when there is no maximum"""
+    return Cast('current_stock', models.FloatField()) / NullIf(
+        'max_stock_level', models.Value(0), output_field=models.FloatField()
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    """Database-side equivalents of the Product stock properties"""
+
+    def low_stock(self):
+        """Same condition as Product.is_low_stock (includes out of stock)"""
+        return self.filter(current_stock__lte=models.F('min_stock_level'))
+
+    def out_of_stock(self):
+        return self.filter(current_stock=0)
+
+    def in_stock(self):
+        return self.filter(current_stock__gt=models.F('min_stock_level'))
+
+    def with_stock_status(self, status):
+        """Filter by a Product.stock_status value"""
+        if status == 'out_of_stock':
+            return self.out_of_stock()
+        if status == 'low_stock':
+            return self.low_stock().exclude(current_stock=0)
+        if status == 'in_stock':
+            return self.in_stock()
+        raise ValueError(f"Unknown stock status: {status}")
+
+    def annotate_stock(self):
+        """
+        Annotate `stock_state`, `stock_ratio` and `stock_percentage`.
+
+        Ordering by `stock_ratio` within low-stock rows of a category is
+        served by the product_low_stock_idx partial expression index.
+        """
+        return self.annotate(
+            stock_state=models.Case(
+                models.When(current_stock=0, then=models.Value('out_of_stock')),
+                models.When(current_stock__lte=models.F('min_stock_level'), then=models.Value('low_stock')),
+                default=models.Value('in_stock'),
+                output_field=models.CharField(),
+            ),
+            stock_ratio=stock_ratio_expression(),
+            stock_percentage=Coalesce(
+                stock_ratio_expression() * 100, models.Value(0.0), output_field=models.FloatField()
+            ),
+        )
+
+
 class Product(models.Model):
     """Main product model with inventory tracking"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -77,12 +129,24 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_restock_date = models.DateTimeField(null=True, blank=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
         indexes = [
             models.Index(fields=['sku']),
             models.Index(fields=['category']),
             models.Index(fields=['current_stock']),
+            models.Index(
+                models.F('category'), stock_ratio_expression(),
+                condition=models.Q(current_stock__lte=models.F('min_stock_level')),
+                name='product_low_stock_idx',
+            ),
+            models.Index(
+                fields=['category'],
+                condition=models.Q(current_stock=0),
+                name='product_out_of_stock_idx',
+            ),
         ]
 
     def __str__(self):
@@ -144,6 +208,7 @@ class StockMovement(models.Model):
         indexes = [
             models.Index(fields=['product', '-created_at']),
             models.Index(fields=['movement_type']),
+            models.Index(fields=['-created_at', '-id']),
         ]
 
     def __str__(self):
@@ -183,6 +248,13 @@ class InventoryAlert(models.Model):
             models.Index(fields=['is_resolved', '-created_at']),
             models.Index(fields=['priority']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'alert_type'],
+                condition=models.Q(is_resolved=False),
+                name='unique_open_alert_per_product_type',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.alert_type}"
@@ -0,0 +1,74 @@
+"""
+Serializers for inventory management
+"""
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Category, InventoryAlert, Product, StockMovement, Supplier
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'description']
+
+
+class SupplierSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Supplier
+        fields = ['id', 'name', 'contact_email', 'contact_phone', 'address', 'payment_terms', 'is_active']
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    stock_status = serializers.ReadOnlyField()
+    stock_level_percentage = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'sku', 'category', 'category_name', 'brand', 'description',
+            'price', 'cost', 'current_stock', 'min_stock_level', 'max_stock_level',
+            'reorder_point', 'weight', 'dimensions', 'location', 'barcode',
+            'is_active', 'is_trackable', 'stock_status', 'stock_level_percentage',
+            'created_at', 'updated_at', 'last_restock_date',
+        ]
+        # Stock only changes through the stock ledger
+        read_only_fields = ['current_stock', 'last_restock_date']
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    created_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'product', 'product_name', 'movement_type', 'quantity', 'reference_number',
+            'notes', 'created_by', 'created_at', 'purchase_order', 'sale_order',
+        ]
+
+
+class InventoryAlertSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = InventoryAlert
+        fields = [
+            'id', 'product', 'product_name', 'alert_type', 'priority', 'message',
+            'is_read', 'is_resolved', 'created_at', 'resolved_at', 'resolved_by',
+        ]
+        read_only_fields = ['product', 'alert_type', 'priority', 'message', 'created_at', 'resolved_at', 'resolved_by']
+
+    def validate_is_resolved(self, value):
+        # Reopening could collide with a newer open alert of the same type
+        if self.instance is not None and self.instance.is_resolved and not value:
+            raise serializers.ValidationError('Resolved alerts cannot be reopened.')
+        return value
+
+    def update(self, instance, validated_data):
+        if validated_data.get('is_resolved') and not instance.is_resolved:
+            validated_data['resolved_at'] = timezone.now()
+            validated_data['resolved_by'] = self.context['request'].user
+        return super().update(instance, validated_data)
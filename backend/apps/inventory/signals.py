@@ -0,0 +1,19 @@
+"""
+Signal handlers for inventory models
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .alerts import evaluate_stock_alerts
+from .models import Product
+
+STOCK_FIELDS = {'current_stock', 'min_stock_level', 'reorder_point', 'max_stock_level'}
+
+
+@receiver(post_save, sender=Product)
+def evaluate_alerts_on_product_save(sender, instance, created, update_fields=None, **kwargs):
+    """Re-evaluate stock alerts when stock or thresholds are edited directly"""
+    if update_fields is not None and not STOCK_FIELDS & set(update_fields):
+        return
+    evaluate_stock_alerts([instance.pk])
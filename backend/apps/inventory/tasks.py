@@ -0,0 +1,116 @@
+"""
+Celery tasks for inventory management
+"""
+
+import logging
+import os
+import uuid
+from datetime import date
+
+from celery import shared_task
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from inventory_ai import exports, partitioning
+
+from . import importer
+from .alerts import evaluate_stock_alerts
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CHUNK_SIZE = 1000
+# Failed task results hold only the exception, so the user who started an
+# import or export is kept alongside for as long as Celery keeps results
+FAILED_OWNER_TIMEOUT = 24 * 60 * 60
+
+
+def failed_owner_key(task_id):
+    return f"inventory:failed-task-owner:{task_id}"
+
+
+def failed_task_owner(task_id):
+    """Id of the user who started a failed import/export task, or None"""
+    return cache.get(failed_owner_key(task_id))
+
+
+@shared_task
+def reconcile_stock_alerts():
+    """
+    Re-evaluate stock alerts for every product.
+
+    The stock ledger, product saves and the bulk writers keep alerts
+    current, but stock or thresholds changed with a queryset update or raw
+    SQL skip all of them, so this runs nightly to catch those products.
+    """
+    product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+    opened = resolved = 0
+    for start in range(0, len(product_ids), RECONCILE_CHUNK_SIZE):
+        chunk_opened, chunk_resolved = evaluate_stock_alerts(product_ids[start:start + RECONCILE_CHUNK_SIZE])
+        opened += chunk_opened
+        resolved += chunk_resolved
+    logger.info("Reconciled stock alerts: %s open, %s resolved", opened, resolved)
+    return {'open': opened, 'resolved': resolved}
+
+
+@shared_task
+def maintain_partitions():
+    """Create the next months' partitions and detach partitions past retention"""
+    summary = partitioning.maintain_partitions()
+    logger.info("Maintained partitions: %s", summary)
+    return summary
+
+
+@shared_task(bind=True)
+def import_products(self, path, user_id, reference=''):
+    """
+    Import an uploaded product/stock file, publishing the running counts
+    as PROGRESS task state after every chunk. The progress and the report
+    carry `user_id`, so only the uploader can read them. The file is
+    removed afterwards.
+    """
+    def progress(result):
+        self.update_state(state='PROGRESS', meta={
+            **{key: value for key, value in result.items() if key != 'errors'},
+            'user_id': user_id,
+        })
+
+    try:
+        result = importer.import_products(path, User.objects.get(pk=user_id), reference, progress)
+        return {**result, 'user_id': user_id}
+    except Exception:
+        cache.set(failed_owner_key(self.request.id), user_id, FAILED_OWNER_TIMEOUT)
+        raise
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@shared_task(bind=True)
+def export_dataset(self, name, export_format, user_id, start_date=None, end_date=None, filters=None):
+    """
+    Write an export to a file under EXPORT_PATH for download, for XLSX
+    workbooks and exports too large to stream within a request. The result
+    carries `user_id`, so only the requesting user can download it.
+    """
+    path = exports.export_path(name, export_format, uuid.uuid4().hex)
+    try:
+        rows = exports.write_export(
+            name, export_format, path,
+            date.fromisoformat(start_date) if start_date else None,
+            date.fromisoformat(end_date) if end_date else None,
+            filters,
+        )
+    except Exception:
+        cache.set(failed_owner_key(self.request.id), user_id, FAILED_OWNER_TIMEOUT)
+        raise
+    logger.info("Exported %s rows of %s to %s", rows, name, path)
+    return {'dataset': name, 'format': export_format, 'rows': rows, 'file': os.path.basename(path), 'user_id': user_id}
+
+
+@shared_task
+def remove_expired_exports():
+    """Remove export files older than EXPORT_RETENTION_HOURS"""
+    return exports.remove_expired_exports()
@@ -0,0 +1,34 @@
+import pytest
+
+from apps.inventory.ledger import record_stock_movement
+from apps.inventory.models import InventoryAlert, Product
+from apps.inventory.tasks import reconcile_stock_alerts
+
+pytestmark = pytest.mark.django_db
+
+
+def open_alerts(product):
+    return set(
+        InventoryAlert.objects.filter(product=product, is_resolved=False).values_list('alert_type', flat=True)
+    )
+
+
+def test_crossing_a_threshold_opens_and_resolves_alerts(make_product, user):
+    product = make_product(current_stock=30, min_stock_level=10, reorder_point=20)
+    record_stock_movement(product=product, movement_type='OUT', quantity=30, created_by=user)
+    assert open_alerts(product) == {'OUT_OF_STOCK'}
+    record_stock_movement(product=product, movement_type='IN', quantity=50, created_by=user)
+    assert not InventoryAlert.objects.filter(is_resolved=False).exists()
+
+
+def test_reconcile_follows_thresholds_changed_outside_the_ledger(make_product):
+    raised = make_product(current_stock=15, min_stock_level=5, reorder_point=10)
+    lowered = make_product(current_stock=15, min_stock_level=5, reorder_point=10)
+    Product.objects.filter(pk=raised.pk).update(reorder_point=20)
+    reconcile_stock_alerts()
+    assert open_alerts(raised) == {'REORDER'}
+
+    Product.objects.filter(pk=raised.pk).update(reorder_point=10)
+    reconcile_stock_alerts()
+    assert not open_alerts(raised)
+    assert not open_alerts(lowered)
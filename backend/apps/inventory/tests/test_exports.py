@@ -0,0 +1,110 @@
+import csv
+import io
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.inventory.models import StockMovement
+from inventory_ai import exports
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def movements(make_product, user):
+    hammer, saw = make_product(name='Hammer'), make_product(name='Saw')
+    rows = [
+        StockMovement.objects.create(product=hammer, movement_type='IN', quantity=10, created_by=user),
+        StockMovement.objects.create(product=hammer, movement_type='OUT', quantity=-3, created_by=user),
+        StockMovement.objects.create(product=saw, movement_type='IN', quantity=4, created_by=user),
+    ]
+    # The first movement happened two days ago
+    StockMovement.objects.filter(pk=rows[0].pk).update(created_at=timezone.now() - timedelta(days=2))
+    return hammer, saw
+
+
+def test_every_dataset_lists_one_lookup_per_header():
+    for name, spec in exports.DATASETS.items():
+        queryset = exports.export_queryset(name)
+        assert len(exports.headers(name)) == len(queryset.query.values_select) == len(spec['columns'])
+
+
+def test_rows_follow_the_dataset_columns(movements, user):
+    hammer, _ = movements
+
+    rows = list(exports.export_queryset('stock-movements', filters={'product': hammer.pk}))
+
+    row = dict(zip(exports.headers('stock-movements'), rows[0]))
+    assert row['sku'] == hammer.sku
+    assert row['product'] == 'Hammer'
+    assert (row['movement_type'], row['quantity']) == ('IN', 10)
+    assert row['created_by'] == user.username
+    assert row['po_number'] is None
+
+
+def test_filters_and_date_range_narrow_the_rows(movements):
+    hammer, saw = movements
+    today = timezone.localdate()
+
+    def quantities(**params):
+        return [row[4] for row in exports.export_queryset('stock-movements', **params)]
+
+    assert quantities(filters={'movement_type': 'IN'}) == [10, 4]
+    assert quantities(filters={'product': hammer.pk, 'movement_type': 'IN'}) == [10]
+    assert quantities(start_date=today) == [-3, 4]
+    assert quantities(end_date=today - timedelta(days=1)) == [10]
+
+
+def test_unknown_datasets_and_filters_are_rejected():
+    with pytest.raises(ValueError, match='Unknown export'):
+        exports.export_queryset('customers')
+    with pytest.raises(ValueError, match='Unknown filter'):
+        exports.export_queryset('sales-metrics', filters={'movement_type': 'IN'})
+
+
+def test_csv_download_applies_query_filters(movements, user):
+    _, saw = movements
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse('inventory:export', args=['stock-movements']), {'product': str(saw.pk)})
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+    assert rows[0] == exports.headers('stock-movements')
+    assert [(row[2], row[4]) for row in rows[1:]] == [('Saw', '4')]
+
+
+def test_malformed_dates_are_a_bad_request(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.get(reverse('inventory:export', args=['stock-movements']), {'start_date': '18/10/2026'})
+
+    assert response.status_code == 400
+    assert 'start_date' in response.json()
+
+
+def test_expired_export_files_are_removed(settings, tmp_path):
+    settings.EXPORT_PATH = str(tmp_path)
+    settings.EXPORT_RETENTION_HOURS = 2
+    old, recent = tmp_path / 'old.csv', tmp_path / 'recent.xlsx'
+    old.write_text('sku\n')
+    recent.write_text('sku\n')
+    three_hours_ago = time.time() - 3 * 3600
+    os.utime(old, (three_hours_ago, three_hours_ago))
+
+    assert exports.remove_expired_exports() == 1
+    assert not old.exists()
+    assert recent.exists()
+
+
+def test_missing_export_directory_is_not_an_error(settings, tmp_path):
+    settings.EXPORT_PATH = str(tmp_path / 'missing')
+
+    assert exports.remove_expired_exports() == 0
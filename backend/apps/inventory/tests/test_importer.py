@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+import pytest
+
+from apps.inventory.importer import ProductImporter, clean_row
+from apps.inventory.models import Product, StockMovement
+
+pytestmark = pytest.mark.django_db
+
+
+def new_row(number, **values):
+    row = {
+        'sku': f'NEW-{number}', 'name': f'New {number}', 'category': 'Garden', 'brand': 'Acme',
+        'price': '12.50', 'cost': '7', 'barcode': f'NB-{number}',
+    }
+    row.update(values)
+    return number, row
+
+
+def run(user, rows, chunk_size=1000):
+    return ProductImporter(user, 'test.csv', chunk_size).run(rows)
+
+
+def test_clean_row_reports_every_bad_column():
+    values, errors = clean_row({'price': 'cheap', 'min_stock_level': '2.5', 'is_active': 'maybe', 'name': 'Hammer'})
+
+    assert values == {'name': 'Hammer'}
+    assert sorted(errors) == [
+        'is_active: must be true or false',
+        'min_stock_level: must be a non-negative whole number',
+        'price: not a number',
+        'sku or barcode is required',
+    ]
+
+
+def test_invalid_rows_are_reported_and_skipped(user):
+    result = run(user, [
+        new_row(2),
+        new_row(3, price='-1'),
+        (4, {'sku': 'NEW-4', 'name': 'Incomplete'}),
+    ])
+
+    assert result['created'] == 1
+    assert result['error_count'] == 2
+    assert [error['row'] for error in result['errors']] == [3, 4]
+    assert result['errors'][1]['errors'] == ["new product needs: category, brand, price, cost, barcode"]
+    assert list(Product.objects.values_list('sku', flat=True)) == ['NEW-2']
+
+
+def test_existing_products_are_updated_by_sku_or_barcode(user, make_product):
+    by_sku = make_product()
+    by_barcode = make_product()
+
+    result = run(user, [
+        (2, {'sku': by_sku.sku, 'price': '11'}),
+        (3, {'barcode': by_barcode.barcode, 'name': 'Renamed'}),
+    ])
+
+    assert (result['created'], result['updated'], result['error_count']) == (0, 2, 0)
+    by_sku.refresh_from_db()
+    by_barcode.refresh_from_db()
+    assert by_sku.price == Decimal('11.00')
+    assert by_barcode.name == 'Renamed'
+
+
+def test_barcode_of_another_product_is_a_conflict(user, make_product):
+    first = make_product()
+    second = make_product()
+
+    result = run(user, [
+        (2, {'sku': first.sku, 'barcode': second.barcode}),
+        new_row(3, barcode=first.barcode),
+    ])
+
+    assert result['updated'] == result['created'] == 0
+    assert result['errors'] == [
+        {'row': 2, 'errors': [f"barcode {second.barcode} belongs to product {second.sku}"]},
+        {'row': 3, 'errors': [f"barcode {first.barcode} belongs to product {first.sku}"]},
+    ]
+    first.refresh_from_db()
+    assert first.barcode != second.barcode
+
+
+def test_duplicate_keys_in_a_chunk_keep_the_first_row(user):
+    result = run(user, [new_row(2), new_row(3, sku='NEW-2'), new_row(4, barcode='NB-2')])
+
+    assert result['created'] == 1
+    assert [error['row'] for error in result['errors']] == [3, 4]
+    assert result['errors'][0]['errors'] == ["duplicate sku or barcode earlier in the same chunk"]
+
+
+def test_products_created_by_earlier_chunks_are_matched(user):
+    result = run(user, [new_row(2), new_row(3, barcode='NB-2'), (4, {'sku': 'NEW-2', 'name': 'Renamed'})], chunk_size=1)
+
+    assert (result['created'], result['updated']) == (1, 1)
+    assert result['errors'] == [{'row': 3, 'errors': ["barcode NB-2 belongs to product NEW-2"]}]
+    assert Product.objects.get().name == 'Renamed'
+
+
+def test_stock_counts_are_applied_as_adjustments(user, make_product):
+    product = make_product()
+
+    result = run(user, [(2, {'sku': product.sku, 'stock': '12'}), new_row(3, stock='0')])
+
+    assert result['stock_adjusted'] == 1
+    product.refresh_from_db()
+    assert product.current_stock == 12
+    movement = StockMovement.objects.get(product=product)
+    assert (movement.movement_type, movement.quantity) == ('ADJUSTMENT', 12)
@@ -0,0 +1,59 @@
+import pytest
+from django.core.exceptions import ValidationError
+
+from apps.inventory.ledger import apply_stock_movements, movement_delta, net_deltas
+from apps.inventory.models import StockMovement
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('movement_type, quantity, delta', [
+    ('IN', 5, 5),
+    ('IN', -5, 5),
+    ('RETURN', -2, 2),
+    ('OUT', 3, -3),
+    ('OUT', -3, -3),
+    ('DAMAGE', 1, -1),
+    ('ADJUSTMENT', -4, -4),
+    ('ADJUSTMENT', 4, 4),
+    ('TRANSFER', -6, -6),
+])
+def test_movement_delta(movement_type, quantity, delta):
+    assert movement_delta(StockMovement(movement_type=movement_type, quantity=quantity)) == delta
+
+
+def test_net_deltas_sums_per_product_and_rejects_unknown_types(make_product):
+    first, second = make_product(), make_product()
+    movements = [
+        StockMovement(product=first, movement_type='IN', quantity=10),
+        StockMovement(product=first, movement_type='OUT', quantity=4),
+        StockMovement(product=second, movement_type='DAMAGE', quantity=1),
+    ]
+    assert net_deltas(movements) == {first.pk: 6, second.pk: -1}
+    with pytest.raises(ValidationError):
+        net_deltas([StockMovement(product=first, movement_type='LOST', quantity=1)])
+
+
+def test_apply_updates_stock_and_records_movements(make_product, user):
+    product = make_product(current_stock=5)
+    apply_stock_movements([
+        StockMovement(product=product, movement_type='IN', quantity=10, created_by=user),
+        StockMovement(product=product, movement_type='OUT', quantity=3, created_by=user),
+    ])
+    product.refresh_from_db()
+    assert product.current_stock == 12
+    assert product.last_restock_date is not None
+    assert StockMovement.objects.filter(product=product).count() == 2
+
+
+def test_insufficient_stock_rejects_the_whole_batch(make_product, user):
+    stocked, short = make_product(current_stock=10), make_product(current_stock=1)
+    with pytest.raises(ValidationError):
+        apply_stock_movements([
+            StockMovement(product=stocked, movement_type='OUT', quantity=5, created_by=user),
+            StockMovement(product=short, movement_type='OUT', quantity=2, created_by=user),
+        ])
+    stocked.refresh_from_db()
+    assert stocked.current_stock == 10
+    assert not StockMovement.objects.exists()
+
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.inventory.models import StockMovement
+from inventory_ai import partitioning
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'postgresql', reason='partitioning needs PostgreSQL'),
+]
+
+STOCK_MOVEMENTS = partitioning.PARTITIONED_TABLES[0]
+
+
+def foreign_keys(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [table],
+        )
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def movements(make_product, user):
+    product = make_product()
+    rows = [
+        StockMovement.objects.create(product=product, movement_type='IN', quantity=quantity, created_by=user)
+        for quantity in (10, 5)
+    ]
+    StockMovement.objects.filter(pk=rows[0].pk).update(created_at=timezone.now() - timedelta(days=62))
+    # Fire the deferred foreign key checks as a commit would; Postgres will
+    # not alter a table with pending trigger events
+    connection.check_constraints()
+    return product, rows
+
+
+def test_add_months_crosses_years():
+    assert partitioning.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert partitioning.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_conversion_copies_rows_into_monthly_partitions(movements, user):
+    product, rows = movements
+
+    partitioning.convert_to_partitioned(STOCK_MOVEMENTS, months_ahead=1)
+
+    assert partitioning.is_partitioned(STOCK_MOVEMENTS)
+    months = [month for month, _ in partitioning.list_partitions(STOCK_MOVEMENTS)]
+    oldest = partitioning.month_start(rows[0].created_at.date() - timedelta(days=62))
+    current = partitioning.month_start(timezone.localdate())
+    assert months[0] <= oldest
+    assert months[-1] == partitioning.add_months(current, 1)
+    assert sorted(StockMovement.objects.values_list('pk', flat=True)) == sorted(row.pk for row in rows)
+    added = StockMovement.objects.create(product=product, movement_type='OUT', quantity=2, created_by=user)
+    assert added.pk > max(row.pk for row in rows)
+
+
+def test_the_legacy_table_does_not_hold_on_to_referenced_rows(movements):
+    product, _ = movements
+    table = STOCK_MOVEMENTS.table
+
+    partitioning.convert_to_partitioned(STOCK_MOVEMENTS, months_ahead=1)
+
+    assert foreign_keys(f"{table}_legacy") == 0
+    assert foreign_keys(table) > 0
+    product.delete()
+    connection.check_constraints()
+
+
+def test_command_requires_convert_for_plain_tables():
+    with pytest.raises(CommandError, match='rerun with --convert'):
+        call_command('partition_tables', table='inventory.StockMovement')
+
+
+def test_command_converts_and_detaches_old_partitions(movements, capsys):
+    current = partitioning.month_start(timezone.localdate())
+    call_command('partition_tables', convert=True, table='inventory.StockMovement', months_ahead=0)
+    connection.check_constraints()
+    call_command(
+        'partition_tables', table='inventory.StockMovement', months_ahead=0, detach_before=current, drop=True,
+    )
+
+    output = capsys.readouterr().out
+    assert 'Converting' in output and 'Detached' in output
+    assert [month for month, _ in partitioning.list_partitions(STOCK_MOVEMENTS)] == [current]
+    assert StockMovement.objects.count() == 1
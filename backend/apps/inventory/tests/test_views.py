@@ -0,0 +1,175 @@
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.inventory.models import InventoryAlert, StockMovement
+from apps.inventory.tasks import failed_owner_key
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Failed task owners are cached; none may leak between tests
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def pages(client, url):
+    seen = []
+    while url:
+        body = client.get(url).json()
+        seen.append([row['id'] for row in body['results']])
+        url = body['next']
+    return seen
+
+
+def test_cursor_pages_through_rows_sharing_a_timestamp(client, make_product, user):
+    product = make_product()
+    created_at = timezone.now() - timedelta(hours=1)
+    movements = [
+        StockMovement.objects.create(product=product, movement_type='IN', quantity=1, created_by=user)
+        for _ in range(7)
+    ]
+    # Five rows at the same instant straddle the page boundaries
+    StockMovement.objects.filter(pk__in=[movement.pk for movement in movements[:5]]).update(created_at=created_at)
+    expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    seen = pages(client, reverse('inventory:stockmovement-list') + '?page_size=2')
+
+    assert [len(page) for page in seen] == [2, 2, 2, 1]
+    assert [pk for page in seen for pk in page] == expected
+
+
+def test_previous_link_returns_the_previous_page(client, make_product, user):
+    product = make_product()
+    for _ in range(5):
+        StockMovement.objects.create(product=product, movement_type='IN', quantity=1, created_by=user)
+    first = client.get(reverse('inventory:stockmovement-list') + '?page_size=2').json()
+    second = client.get(first['next']).json()
+
+    previous = client.get(second['previous']).json()
+
+    assert [row['id'] for row in previous['results']] == [row['id'] for row in first['results']]
+
+
+def test_malformed_cursor_is_not_found(client):
+    response = client.get(reverse('inventory:stockmovement-list') + '?cursor=cD1ub3QtYS1kYXRl')
+
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def alert(make_product):
+    return InventoryAlert.objects.create(
+        product=make_product(), alert_type='LOW_STOCK', priority='HIGH', message='Low stock',
+    )
+
+
+def test_resolving_an_alert_records_who_and_when(client, alert, user):
+    response = client.patch(reverse('inventory:inventoryalert-detail', args=[alert.pk]), {'is_resolved': True})
+
+    assert response.status_code == 200
+    alert.refresh_from_db()
+    assert alert.is_resolved
+    assert alert.resolved_by == user
+    assert alert.resolved_at is not None
+
+
+def test_resolved_alerts_cannot_be_reopened(client, alert):
+    url = reverse('inventory:inventoryalert-detail', args=[alert.pk])
+    client.patch(url, {'is_resolved': True})
+    InventoryAlert.objects.create(product=alert.product, alert_type='LOW_STOCK', priority='HIGH', message='Low again')
+
+    response = client.patch(url, {'is_resolved': False})
+
+    assert response.status_code == 400
+    assert 'is_resolved' in response.json()
+
+
+def test_resolution_fields_are_read_only(client, alert):
+    response = client.patch(
+        reverse('inventory:inventoryalert-detail', args=[alert.pk]), {'resolved_at': timezone.now().isoformat()},
+    )
+
+    assert response.status_code == 200
+    alert.refresh_from_db()
+    assert alert.resolved_at is None
+
+
+class FakeResult:
+    def __init__(self, state, info=None):
+        # A fresh id per result, so no cached owner outlives its test
+        self.id = str(uuid.uuid4())
+        self.state = state
+        self.info = self.result = info
+
+
+def import_status(client, result):
+    with mock.patch('apps.inventory.views.import_products.AsyncResult', return_value=result):
+        return client.get(reverse('inventory:product-import-status', args=[result.id]))
+
+
+def test_import_report_is_shown_to_the_uploader(client, user):
+    response = import_status(client, FakeResult('SUCCESS', {'rows': 3, 'errors': [], 'user_id': user.pk}))
+
+    assert response.status_code == 200
+    assert response.json()['result'] == {'rows': 3, 'errors': []}
+
+
+@pytest.mark.parametrize('state', ['PROGRESS', 'SUCCESS'])
+def test_other_users_imports_are_not_found(client, user, state):
+    response = import_status(client, FakeResult(state, {'rows': 3, 'user_id': user.pk + 1}))
+
+    assert response.status_code == 404
+
+
+def test_failed_imports_are_only_shown_to_the_uploader(client, user):
+    result = FakeResult('FAILURE', ValueError('bad file'))
+    assert import_status(client, result).status_code == 404
+
+    cache.set(failed_owner_key(result.id), user.pk)
+    response = import_status(client, result)
+
+    assert response.status_code == 200
+    assert response.json()['detail'] == 'bad file'
+
+
+def export_status(client, result):
+    with mock.patch('apps.inventory.views.export_dataset.AsyncResult', return_value=result):
+        return client.get(reverse('inventory:export-status', args=[result.id]))
+
+
+def test_failed_exports_are_only_shown_to_the_requester(client, user):
+    result = FakeResult('FAILURE', ValueError('Unknown filter'))
+    assert export_status(client, result).status_code == 404
+
+    cache.set(failed_owner_key(result.id), user.pk)
+    response = export_status(client, result)
+
+    assert response.status_code == 200
+    assert response.json()['detail'] == 'Unknown filter'
+
+
+def test_export_result_hides_the_owner(client, user):
+    result = FakeResult('SUCCESS', {'dataset': 'sales-metrics', 'rows': 2, 'user_id': user.pk})
+
+    response = export_status(client, result)
+
+    assert response.status_code == 200
+    assert response.json()['result'] == {'dataset': 'sales-metrics', 'rows': 2}
+    assert response.json()['download'].endswith(reverse('inventory:export-download', args=[result.id]))
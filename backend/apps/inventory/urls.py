@@ -0,0 +1,22 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = 'inventory'
+
+router = DefaultRouter()
+router.register('categories', views.CategoryViewSet)
+router.register('suppliers', views.SupplierViewSet)
+router.register('products', views.ProductViewSet)
+router.register('stock-movements', views.StockMovementViewSet)
+router.register('alerts', views.InventoryAlertViewSet)
+
+urlpatterns = [
+    path('products/import/', views.ProductImportView.as_view(), name='product-import'),
+    path('products/import/<uuid:task_id>/', views.ProductImportStatusView.as_view(), name='product-import-status'),
+    path('exports/tasks/<uuid:task_id>/', views.ExportStatusView.as_view(), name='export-status'),
+    path('exports/tasks/<uuid:task_id>/download/', views.ExportDownloadView.as_view(), name='export-download'),
+    path('exports/<slug:dataset>/', views.ExportView.as_view(), name='export'),
+    path('', include(router.urls)),
+]
@@ -0,0 +1,244 @@
+"""
+API views for inventory management
+"""
+
+import os
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from inventory_ai import exports
+from inventory_ai.pagination import CreatedAtCursorPagination
+
+from .filters import ProductFilter
+from .importer import SUPPORTED_EXTENSIONS
+from .ledger import record_stock_movement
+from .models import Category, InventoryAlert, Product, StockMovement, Supplier
+from .serializers import (
+    CategorySerializer, InventoryAlertSerializer, ProductSerializer, StockMovementSerializer,
+    SupplierSerializer,
+)
+from .tasks import export_dataset, failed_task_owner, import_products
+
+
+class CategoryViewSet(viewsets.ModelViewSet):
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+    search_fields = ['name']
+
+
+class SupplierViewSet(viewsets.ModelViewSet):
+    queryset = Supplier.objects.all()
+    serializer_class = SupplierSerializer
+    filterset_fields = ['is_active']
+    search_fields = ['name', 'contact_email']
+
+
+class ProductViewSet(viewsets.ModelViewSet):
+    """
+    Products with database-side stock filters.
+
+    `stock_status` / `low_stock` filter in SQL and `ordering=stock_ratio`
+    sorts by stock as a share of max_stock_level, so "low stock in a
+    category, emptiest first" is a single indexed, paginated query.
+    """
+    queryset = Product.objects.select_related('category').annotate_stock()
+    serializer_class = ProductSerializer
+    filterset_class = ProductFilter
+    search_fields = ['name', 'sku', 'barcode', 'brand']
+    ordering_fields = ['name', 'sku', 'current_stock', 'stock_ratio', 'created_at']
+
+
+class StockMovementViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Stock movement audit log; new movements are posted through the stock ledger"""
+    queryset = StockMovement.objects.select_related('product', 'created_by')
+    serializer_class = StockMovementSerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ['product', 'movement_type', 'purchase_order', 'sale_order']
+    search_fields = ['reference_number']
+    ordering = CreatedAtCursorPagination.ordering
+    ordering_fields = ['created_at']
+
+    def perform_create(self, serializer):
+        try:
+            serializer.instance = record_stock_movement(
+                created_by=self.request.user, **serializer.validated_data
+            )
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+
+class InventoryAlertViewSet(mixins.UpdateModelMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = InventoryAlert.objects.select_related('product')
+    serializer_class = InventoryAlertSerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ['product', 'alert_type', 'priority', 'is_read', 'is_resolved']
+    ordering = CreatedAtCursorPagination.ordering
+    ordering_fields = ['created_at']
+
+
+class ProductImportView(APIView):
+    """
+    Upload a CSV or XLSX file of products and/or stock counts.
+
+    The file is stored under IMPORT_UPLOAD_PATH and imported by a Celery
+    task; the response carries the task id to poll for progress and the
+    per-row error report.
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        extension = os.path.splitext(upload.name)[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            return Response({'detail': 'Upload a CSV or XLSX file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        os.makedirs(settings.IMPORT_UPLOAD_PATH, exist_ok=True)
+        path = os.path.join(settings.IMPORT_UPLOAD_PATH, f"{uuid.uuid4().hex}{extension}")
+        with open(path, 'wb') as handle:
+            for chunk in upload.chunks():
+                handle.write(chunk)
+
+        task = import_products.delay(path, request.user.pk, upload.name)
+        return Response({'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+
+
+def task_owner(result):
+    """Id of the user who started an import/export task, once it has any state to show"""
+    if result.state in ('PROGRESS', 'SUCCESS'):
+        return result.info.get('user_id')
+    if result.state == 'FAILURE':
+        return failed_task_owner(result.id)
+    return None
+
+
+class ProductImportStatusView(APIView):
+    """
+    State of an import task: running counts while in progress, the report
+    when done. Other users' imports are not found.
+    """
+
+    def get(self, request, task_id):
+        result = import_products.AsyncResult(str(task_id))
+        if result.state != 'PENDING' and task_owner(result) != request.user.pk:
+            raise Http404
+        body = {'task_id': str(task_id), 'state': result.state}
+        if result.state == 'PROGRESS':
+            body['progress'] = {key: value for key, value in result.info.items() if key != 'user_id'}
+        elif result.state == 'SUCCESS':
+            body['result'] = {key: value for key, value in result.result.items() if key != 'user_id'}
+        elif result.state == 'FAILURE':
+            body['detail'] = str(result.result)
+        return Response(body)
+
+
+def export_params(data, name):
+    """
+    Date range and filters of an export request, checked against the
+    dataset; raises serializers.ValidationError
+    """
+    if name not in exports.DATASETS:
+        raise Http404
+    params = {'start_date': None, 'end_date': None, 'filters': {}}
+    for key in ('start_date', 'end_date'):
+        if data.get(key):
+            try:
+                params[key] = date.fromisoformat(data[key])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError({key: 'Use YYYY-MM-DD'})
+    for key in exports.DATASETS[name]['filters']:
+        if data.get(key):
+            params['filters'][key] = data[key]
+    try:
+        exports.export_queryset(name, **params)
+    except ValueError as exc:
+        raise serializers.ValidationError({'detail': str(exc)})
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError({'detail': exc.messages[0]})
+    return params
+
+
+class ExportView(APIView):
+    """
+    Export stock movements, sales metrics or order lines, optionally
+    between start_date and end_date (inclusive) and filtered by the
+    dataset's filters.
+
+    GET streams CSV as rows are read from a server-side cursor. POST
+    generates the file (CSV or XLSX) in a Celery task and returns the task
+    id to poll; use it for XLSX and for exports too large to download
+    within a request.
+    """
+
+    def get(self, request, dataset):
+        params = export_params(request.query_params, dataset)
+        rows = exports.iter_rows(dataset, **params)
+        response = StreamingHttpResponse(exports.stream_csv(dataset, rows), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.csv"'
+        return response
+
+    def post(self, request, dataset):
+        params = export_params(request.data, dataset)
+        export_format = request.data.get('format', 'xlsx')
+        if export_format not in exports.FORMATS:
+            return Response({'format': f"Use one of {', '.join(exports.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        start_date, end_date = params['start_date'], params['end_date']
+        task = export_dataset.delay(
+            dataset, export_format, request.user.pk,
+            start_date.isoformat() if start_date else None,
+            end_date.isoformat() if end_date else None,
+            params['filters'],
+        )
+        return Response({'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+
+
+def finished_export(task_id, user):
+    """Result of a successful export task started by `user`, or None"""
+    result = export_dataset.AsyncResult(str(task_id))
+    if result.state != 'SUCCESS' or result.result.get('user_id') != user.pk:
+        return None
+    return result.result
+
+
+class ExportStatusView(APIView):
+    """
+    State of an export task, with its download link when the file is
+    ready. Other users' exports are not found.
+    """
+
+    def get(self, request, task_id):
+        result = export_dataset.AsyncResult(str(task_id))
+        if result.state != 'PENDING' and task_owner(result) != request.user.pk:
+            raise Http404
+        body = {'task_id': str(task_id), 'state': result.state}
+        if result.state == 'SUCCESS':
+            body['result'] = {key: value for key, value in result.result.items() if key != 'user_id'}
+            body['download'] = request.build_absolute_uri(
+                reverse('inventory:export-download', args=[task_id])
+            )
+        elif result.state == 'FAILURE':
+            body['detail'] = str(result.result)
+        return Response(body)
+
+
+class ExportDownloadView(APIView):
+    """Download the file written by a finished export task"""
+
+    def get(self, request, task_id):
+        export = finished_export(task_id, request.user)
+        if export is None:
+            raise Http404
+        path = os.path.join(settings.EXPORT_PATH, os.path.basename(export['file']))
+        if not os.path.exists(path):
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=export['file'])
@@ -2,12 +2,92 @@
 Order Management Models for Purchase and Sale Orders
 """
 
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Max
+from django.db.models.functions import Cast, Substr
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 import uuid
 
 
+class OrderNumberSequence(models.Model):
+    """Per-year counters used to allocate gap-free order numbers"""
+    SEQUENCE_TYPES = [
+        ('PO', 'Purchase Order'),
+        ('SO', 'Sale Order'),
+    ]
+
+    sequence_type = models.CharField(max_length=10, choices=SEQUENCE_TYPES)
+    year = models.PositiveIntegerField()
+    last_value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['sequence_type', 'year']
+
+    def __str__(self):
+        return f"{self.sequence_type}-{self.year}: {self.last_value}"
+
+    @classmethod
+    def reserve(cls, sequence_type, count=1, year=None):
+        """
+        Reserve `count` consecutive numbers and return them as a range.
+
+        The counter row is advanced by a single upsert on the caller's
+        connection and stays locked until the surrounding transaction ends,
+        so numbers are only handed out once and roll back with the order
+        that used them, which keeps the sequence free of gaps. Reserve
+        inside the transaction that saves the orders.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        year = year or timezone.localdate().year
+        alias = router.db_for_write(cls)
+        with transaction.atomic(using=alias):
+            last = cls._advance(connections[alias], sequence_type, year, count)
+        return range(last - count + 1, last + 1)
+
+    @classmethod
+    def _advance(cls, connection, sequence_type, year, count):
+        """Add `count` to the counter, locking its row; returns its new value"""
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET last_value = last_value + %s, updated_at = %s "
+                f"WHERE sequence_type = %s AND year = %s RETURNING last_value",
+                [count, timezone.now(), sequence_type, year],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                initial = cls._initial_value(sequence_type, year)
+                cursor.execute(
+                    f"INSERT INTO {table} (sequence_type, year, last_value, updated_at) VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT (sequence_type, year) DO UPDATE "
+                    f"SET last_value = {table}.last_value + %s, updated_at = EXCLUDED.updated_at "
+                    f"RETURNING last_value",
+                    [sequence_type, year, initial + count, timezone.now(), count],
+                )
+                row = cursor.fetchone()
+        return row[0]
+
+    @staticmethod
+    def _initial_value(sequence_type, year):
+        """Seed a new counter from the highest number already used that year"""
+        model, field = (PurchaseOrder, 'po_number') if sequence_type == 'PO' else (SaleOrder, 'order_number')
+        prefix = f"{year}-"
+        return (
+            model.objects
+            .filter(**{f'{field}__regex': rf'^{year}-[0-9]+$'})
+            .annotate(value=Cast(Substr(field, len(prefix) + 1), models.BigIntegerField()))
+            .aggregate(highest=Max('value'))['highest']
+        ) or 0
+
+    @staticmethod
+    def format_number(year, value):
+        return f"{year}-{value:04d}"
+
+
 class PurchaseOrder(models.Model):
     """Purchase orders for restocking inventory"""
     STATUS_CHOICES = [
@@ -52,22 +132,29 @@ class PurchaseOrder(models.Model):
             models.Index(fields=['po_number']),
             models.Index(fields=['status']),
             models.Index(fields=['supplier']),
+            models.Index(fields=['-created_at', '-id']),
         ]
 
     def __str__(self):
         return f"PO-{self.po_number} - {self.supplier.name}"
 
     def save(self, *args, **kwargs):
-        if not self.po_number:
-            self.po_number = self.generate_po_number()
-        super().save(*args, **kwargs)
+        # A reserved number commits or rolls back with the order itself
+        with transaction.atomic():
+            if not self.po_number:
+                self.po_number = self.generate_po_number()
+            super().save(*args, **kwargs)
 
     def generate_po_number(self):
         """Generate unique PO number"""
-        from datetime import datetime
-        year = datetime.now().year
-        count = PurchaseOrder.objects.filter(created_at__year=year).count() + 1
-        return f"{year}-{count:04d}"
+        return self.reserve_po_numbers(1)[0]
+
+    @classmethod
+    def reserve_po_numbers(cls, count):
+        """Reserve a block of PO numbers, e.g. for bulk imports"""
+        year = timezone.localdate().year
+        values = OrderNumberSequence.reserve('PO', count, year)
+        return [OrderNumberSequence.format_number(year, value) for value in values]
 
 
 class PurchaseOrderItem(models.Model):
@@ -139,22 +226,30 @@ class SaleOrder(models.Model):
             models.Index(fields=['order_number']),
             models.Index(fields=['status']),
             models.Index(fields=['customer_email']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"SO-{self.order_number} - {self.customer_name}"
 
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            self.order_number = self.generate_order_number()
-        super().save(*args, **kwargs)
+        # A reserved number commits or rolls back with the order itself
+        with transaction.atomic():
+            if not self.order_number:
+                self.order_number = self.generate_order_number()
+            super().save(*args, **kwargs)
 
     def generate_order_number(self):
         """Generate unique order number"""
-        from datetime import datetime
-        year = datetime.now().year
-        count = SaleOrder.objects.filter(created_at__year=year).count() + 1
-        return f"{year}-{count:04d}"
+        return self.reserve_order_numbers(1)[0]
+
+    @classmethod
+    def reserve_order_numbers(cls, count):
+        """Reserve a block of order numbers, e.g. for bulk imports"""
+        year = timezone.localdate().year
+        values = OrderNumberSequence.reserve('SO', count, year)
+        return [OrderNumberSequence.format_number(year, value) for value in values]
 
 
 class SaleOrderItem(models.Model):
@@ -169,6 +264,9 @@ class SaleOrderItem(models.Model):
 
     class Meta:
         unique_together = ['sale_order', 'product']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
@@ -0,0 +1,228 @@
+"""
+Supplier-grouped purchase orders from open REORDER recommendations
+"""
+
+import logging
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from apps.analytics.models import AIRecommendation
+from apps.inventory.models import Product
+
+from .models import PurchaseOrder, PurchaseOrderItem
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+# Orders whose items still count as stock on the way
+OPEN_ORDER_STATUSES = ('DRAFT', 'PENDING', 'APPROVED', 'ORDERED')
+
+
+def open_recommendations():
+    """Unimplemented, unexpired REORDER recommendations for active products"""
+    return AIRecommendation.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        recommendation_type='REORDER',
+        is_implemented=False,
+        suggested_quantity__gt=0,
+        product__is_active=True,
+    )
+
+
+def quantities_on_order(product_ids):
+    """Undelivered quantity per product on purchase orders that are still open"""
+    rows = (
+        PurchaseOrderItem.objects
+        .filter(product_id__in=product_ids, purchase_order__status__in=OPEN_ORDER_STATUSES,
+                quantity__gt=F('quantity_delivered'))
+        .values('product_id')
+        .annotate(outstanding=Sum(F('quantity') - F('quantity_delivered')))
+        .values_list('product_id', 'outstanding')
+        .order_by()
+    )
+    return dict(rows)
+
+
+def last_suppliers(product_ids):
+    """
+    Supplier and unit price of each product's most recent purchase from an
+    active supplier, as {product_id: (supplier_id, unit_price)}
+    """
+    rows = (
+        PurchaseOrderItem.objects
+        .filter(product_id__in=product_ids, purchase_order__supplier__is_active=True)
+        .exclude(purchase_order__status='CANCELLED')
+        .order_by('product_id', '-purchase_order__created_at')
+        .values_list('product_id', 'purchase_order__supplier_id', 'unit_price')
+    )
+    suppliers = {}
+    for product_id, supplier_id, unit_price in rows.iterator(chunk_size=5000):
+        suppliers.setdefault(product_id, (supplier_id, unit_price))
+    return suppliers
+
+
+def plan_replenishment(recommendations=None):
+    """
+    Group open REORDER recommendations into purchase order lines per supplier.
+
+    The newest recommendation of each product sets the quantity wanted,
+    net of what is already on order and not yet delivered. Each product is
+    ordered from the supplier it was last bought from, at that price
+    (falling back to the product's cost). Products with nothing left to
+    order are recorded as covered, and products never bought before as
+    without a supplier. Everything is read in a handful of grouped queries.
+
+    Returns a dict with 'lines' ({supplier_id: [line]}), 'covered' and
+    'without_supplier' product ids, and the ids of the recommendations
+    already covered by open orders.
+    """
+    recommendations = recommendations if recommendations is not None else open_recommendations()
+    wanted = {}
+    recommendation_ids = defaultdict(list)
+    rows = recommendations.order_by('product_id', '-created_at').values_list('id', 'product_id', 'suggested_quantity')
+    for recommendation_id, product_id, quantity in rows:
+        wanted.setdefault(product_id, quantity)
+        recommendation_ids[product_id].append(recommendation_id)
+
+    plan = {'lines': defaultdict(list), 'covered': [], 'covered_recommendation_ids': [], 'without_supplier': []}
+    if not wanted:
+        return plan
+    product_ids = list(wanted)
+    on_order = quantities_on_order(product_ids)
+    suppliers = last_suppliers(product_ids)
+    costs = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'cost'))
+
+    for product_id in product_ids:
+        quantity = wanted[product_id] - (on_order.get(product_id) or 0)
+        if quantity <= 0:
+            plan['covered'].append(product_id)
+            plan['covered_recommendation_ids'].extend(recommendation_ids[product_id])
+            continue
+        if product_id not in suppliers:
+            plan['without_supplier'].append(product_id)
+            continue
+        supplier_id, unit_price = suppliers[product_id]
+        unit_price = unit_price or costs.get(product_id) or Decimal('0')
+        plan['lines'][supplier_id].append({
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_price': unit_price * quantity,
+            'recommendation_ids': recommendation_ids[product_id],
+        })
+    return plan
+
+
+def replenishment_user():
+    """User recorded as the creator of generated purchase orders"""
+    username = settings.REPLENISHMENT_USERNAME
+    users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+    user = users.order_by('pk').first()
+    if user is None:
+        raise ImproperlyConfigured(
+            "Set REPLENISHMENT_USERNAME to an existing user to create purchase orders automatically"
+        )
+    return user
+
+
+def create_purchase_orders(plan, user, tax_rate=None):
+    """
+    Create one DRAFT purchase order per supplier in `plan`, with its items
+    and totals, in a single transaction.
+
+    Order numbers are reserved as one block, orders and items are inserted
+    with bulk_create, and the recommendations they fulfil are marked as
+    implemented. Returns the created purchase orders.
+    """
+    if not plan['lines']:
+        return []
+    tax_rate = Decimal(str(tax_rate if tax_rate is not None else settings.PURCHASE_TAX_RATE))
+    suppliers = sorted(plan['lines'], key=str)
+
+    with transaction.atomic():
+        numbers = PurchaseOrder.reserve_po_numbers(len(suppliers))
+        orders = []
+        items = []
+        for po_number, supplier_id in zip(numbers, suppliers):
+            lines = plan['lines'][supplier_id]
+            subtotal = sum((line['total_price'] for line in lines), Decimal('0')).quantize(CENT, ROUND_HALF_UP)
+            tax_amount = (subtotal * tax_rate).quantize(CENT, ROUND_HALF_UP)
+            order = PurchaseOrder(
+                po_number=po_number,
+                supplier_id=supplier_id,
+                status='DRAFT',
+                subtotal=subtotal,
+                tax_amount=tax_amount,
+                total_amount=subtotal + tax_amount,
+                notes=f"Generated from {len(lines)} reorder recommendations",
+                created_by=user,
+                is_ai_generated=True,
+            )
+            orders.append(order)
+            items.extend(
+                # bulk_create skips save(), so total_price is set here
+                PurchaseOrderItem(
+                    purchase_order=order,
+                    product_id=line['product_id'],
+                    quantity=line['quantity'],
+                    unit_price=line['unit_price'],
+                    total_price=line['total_price'],
+                )
+                for line in lines
+            )
+        PurchaseOrder.objects.bulk_create(orders, batch_size=1000)
+        PurchaseOrderItem.objects.bulk_create(items, batch_size=5000)
+
+        implemented_at = timezone.now()
+        for order, supplier_id in zip(orders, suppliers):
+            AIRecommendation.objects.filter(pk__in=[
+                recommendation_id
+                for line in plan['lines'][supplier_id]
+                for recommendation_id in line['recommendation_ids']
+            ]).update(
+                is_implemented=True,
+                implementation_date=implemented_at,
+                implementation_notes=f"Ordered on PO-{order.po_number}",
+            )
+        # Recommendations already covered by open orders need no new order either
+        AIRecommendation.objects.filter(pk__in=plan['covered_recommendation_ids']).update(
+            is_implemented=True,
+            implementation_date=implemented_at,
+            implementation_notes="Already on order",
+        )
+    return orders
+
+
+def replenish(user=None, tax_rate=None):
+    """
+    Plan and create purchase orders for every open REORDER recommendation.
+    Returns a summary of what was ordered and skipped.
+
+    The recommendations are locked while they are planned and ordered, so
+    a concurrent run (the nightly task and the API action, say) skips them
+    instead of ordering the same products twice.
+    """
+    user = user or replenishment_user()
+    with transaction.atomic():
+        recommendations = open_recommendations().select_for_update(skip_locked=True, of=('self',))
+        plan = plan_replenishment(recommendations)
+        orders = create_purchase_orders(plan, user, tax_rate) if plan['lines'] else []
+    if plan['without_supplier']:
+        logger.warning(
+            "%s products need reordering but have never been bought from an active supplier",
+            len(plan['without_supplier']),
+        )
+    return {
+        'purchase_orders': len(orders),
+        'products': sum(len(lines) for lines in plan['lines'].values()),
+        'covered_by_open_orders': len(plan['covered']),
+        'without_supplier': [str(product_id) for product_id in plan['without_supplier']],
+        'po_numbers': [order.po_number for order in orders],
+    }
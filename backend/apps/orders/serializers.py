@@ -0,0 +1,51 @@
+"""
+Serializers for purchase and sale orders
+"""
+
+from rest_framework import serializers
+
+from .models import PurchaseOrder, PurchaseOrderItem, SaleOrder, SaleOrderItem
+
+
+class PurchaseOrderItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = PurchaseOrderItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'total_price', 'quantity_delivered']
+
+
+class PurchaseOrderSerializer(serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    items = PurchaseOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = [
+            'id', 'po_number', 'supplier', 'supplier_name', 'status', 'created_at', 'updated_at',
+            'order_date', 'expected_delivery_date', 'actual_delivery_date', 'subtotal',
+            'tax_amount', 'total_amount', 'notes', 'is_ai_generated', 'is_paid',
+            'payment_date', 'payment_reference', 'items',
+        ]
+        read_only_fields = ['po_number', 'is_ai_generated']
+
+
+class SaleOrderItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = SaleOrderItem
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'total_price']
+
+
+class SaleOrderSerializer(serializers.ModelSerializer):
+    items = SaleOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = SaleOrder
+        fields = [
+            'id', 'order_number', 'customer_name', 'customer_email', 'customer_phone', 'status',
+            'created_at', 'updated_at', 'order_date', 'shipped_date', 'delivered_date',
+            'subtotal', 'tax_amount', 'total_amount', 'notes', 'items',
+        ]
+        read_only_fields = ['order_number']
@@ -0,0 +1,23 @@
+"""
+Celery tasks for purchase and sale orders
+"""
+
+import logging
+
+from celery import shared_task
+
+from . import replenishment
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def replenish_stock():
+    """Turn every open REORDER recommendation into supplier purchase orders"""
+    summary = replenishment.replenish()
+    logger.info(
+        "Replenishment created %s purchase orders for %s products (%s already on order, %s without a supplier)",
+        summary['purchase_orders'], summary['products'], summary['covered_by_open_orders'],
+        len(summary['without_supplier']),
+    )
+    return summary
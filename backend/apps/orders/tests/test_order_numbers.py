@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.orders.models import OrderNumberSequence, PurchaseOrder, SaleOrder
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def reserve_in_thread(count, atomic):
+    try:
+        if atomic:
+            with transaction.atomic():
+                return list(OrderNumberSequence.reserve('PO', count))
+        return list(OrderNumberSequence.reserve('PO', count))
+    finally:
+        connection.close()
+
+
+def test_concurrent_reservations_never_repeat_a_number():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(reserve_in_thread, [1, 3] * 20, [False, True] * 20))
+    numbers = [number for result in results for number in result]
+    assert len(numbers) == 80
+    assert sorted(numbers) == list(range(1, 81))
+
+
+def test_concurrent_orders_get_unique_numbers(user, supplier):
+    def create_order(_):
+        try:
+            with transaction.atomic():
+                return PurchaseOrder.objects.create(supplier=supplier, created_by=user).po_number
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(create_order, range(24)))
+    assert len(set(numbers)) == 24
+
+
+def test_counter_is_seeded_from_the_highest_number_in_use(user):
+    year = timezone.localdate().year
+    for number in (f'{year}-0001', f'{year}-0007', f'{year - 1}-0050', 'legacy-99'):
+        SaleOrder.objects.create(order_number=number, customer_name='A', customer_email='a@b.test', created_by=user)
+    SaleOrder.objects.filter(order_number=f'{year}-0001').delete()
+
+    order = SaleOrder.objects.create(customer_name='B', customer_email='b@b.test', created_by=user)
+    assert order.order_number == f'{year}-0008'
+
+
+def test_reserve_a_block():
+    first = OrderNumberSequence.reserve('SO', 5)
+    second = OrderNumberSequence.reserve('SO', 2)
+    assert list(first) == [1, 2, 3, 4, 5]
+    assert list(second) == [6, 7]
+    with pytest.raises(ValueError):
+        OrderNumberSequence.reserve('SO', 0)
+
+
+def test_numbers_of_rolled_back_orders_are_reused(user, supplier):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            PurchaseOrder.objects.create(supplier=supplier, created_by=user)
+            raise RuntimeError
+
+    order = PurchaseOrder.objects.create(supplier=supplier, created_by=user)
+    assert order.po_number == f'{timezone.localdate().year}-0001'
+
+
+def test_reservations_hold_the_counter_until_commit():
+    seen = []
+
+    def reserve_while_locked():
+        try:
+            seen.append(list(OrderNumberSequence.reserve('PO')))
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with transaction.atomic():
+            assert list(OrderNumberSequence.reserve('PO')) == [1]
+            waiting = pool.submit(reserve_while_locked)
+            with pytest.raises(TimeoutError):
+                waiting.result(timeout=0.5)
+        waiting.result(timeout=10)
+    assert seen == [[2]]
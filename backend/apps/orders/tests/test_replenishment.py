@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+
+from apps.analytics.models import AIRecommendation
+from apps.orders import replenishment
+from apps.orders.models import PurchaseOrder, PurchaseOrderItem
+
+pytestmark = pytest.mark.django_db
+
+
+def recommend(product, quantity):
+    return AIRecommendation.objects.create(
+        product=product, recommendation_type='REORDER', priority='HIGH', title='Reorder',
+        description='Stock is running low', suggested_quantity=quantity, confidence_score=Decimal('0.9'),
+    )
+
+
+def order(supplier, user, product, quantity, status='ORDERED', delivered=0, unit_price=Decimal('5.00')):
+    purchase_order = PurchaseOrder.objects.create(supplier=supplier, created_by=user, status=status)
+    PurchaseOrderItem.objects.create(
+        purchase_order=purchase_order, product=product, quantity=quantity,
+        unit_price=unit_price, quantity_delivered=delivered,
+    )
+    return purchase_order
+
+
+def test_plan_nets_undelivered_quantities_on_open_orders(make_product, supplier, user):
+    product = make_product()
+    order(supplier, user, product, 10, delivered=4)
+    order(supplier, user, product, 50, status='CANCELLED')
+    recommend(product, 15)
+
+    plan = replenishment.plan_replenishment()
+
+    [line] = plan['lines'][supplier.pk]
+    assert line['quantity'] == 9
+    assert line['unit_price'] == Decimal('5.00')
+    assert line['total_price'] == Decimal('45.00')
+
+
+def test_newest_recommendation_sets_the_quantity(make_product, supplier, user):
+    product = make_product()
+    order(supplier, user, product, 1, status='DELIVERED', delivered=1)
+    older = recommend(product, 40)
+    newer = recommend(product, 12)
+
+    [line] = replenishment.plan_replenishment()['lines'][supplier.pk]
+
+    assert line['quantity'] == 12
+    assert sorted(line['recommendation_ids']) == sorted([older.pk, newer.pk])
+
+
+def test_products_fully_on_order_are_covered(make_product, supplier, user):
+    covered = make_product()
+    order(supplier, user, covered, 20)
+    recommendation = recommend(covered, 20)
+    unknown = make_product()
+    recommend(unknown, 5)
+
+    plan = replenishment.plan_replenishment()
+
+    assert plan['covered'] == [covered.pk]
+    assert plan['covered_recommendation_ids'] == [recommendation.pk]
+    assert plan['without_supplier'] == [unknown.pk]
+    assert not plan['lines']
+
+
+def test_replenish_marks_recommendations_implemented(make_product, supplier, user):
+    product = make_product()
+    order(supplier, user, product, 2, status='DELIVERED', delivered=2)
+    recommendation = recommend(product, 8)
+
+    summary = replenishment.replenish(user=user)
+
+    assert summary['purchase_orders'] == 1
+    recommendation.refresh_from_db()
+    assert recommendation.is_implemented
+    assert summary['po_numbers'][0] in recommendation.implementation_notes
+    assert replenishment.replenish(user=user)['purchase_orders'] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_runs_order_each_recommendation_once(make_product, supplier, user):
+    for _ in range(20):
+        product = make_product()
+        order(supplier, user, product, 1, status='DELIVERED', delivered=1)
+        recommend(product, 5)
+
+    def run(_):
+        try:
+            return replenishment.replenish(user=user)['products']
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        ordered = list(pool.map(run, range(4)))
+
+    assert sum(ordered) == 20
+    assert PurchaseOrderItem.objects.filter(purchase_order__is_ai_generated=True).count() == 20
@@ -0,0 +1,14 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = 'orders'
+
+router = DefaultRouter()
+router.register('purchase-orders', views.PurchaseOrderViewSet)
+router.register('sale-orders', views.SaleOrderViewSet)
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
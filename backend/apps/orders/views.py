@@ -0,0 +1,49 @@
+"""
+API views for purchase and sale orders
+"""
+
+from django.db.models import Prefetch
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from inventory_ai.pagination import CreatedAtCursorPagination
+
+from . import replenishment
+from .models import PurchaseOrder, PurchaseOrderItem, SaleOrder, SaleOrderItem
+from .serializers import PurchaseOrderSerializer, SaleOrderSerializer
+
+
+class PurchaseOrderViewSet(viewsets.ModelViewSet):
+    queryset = PurchaseOrder.objects.select_related('supplier').prefetch_related(
+        Prefetch('items', queryset=PurchaseOrderItem.objects.select_related('product'))
+    )
+    serializer_class = PurchaseOrderSerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ['supplier', 'status', 'is_ai_generated', 'is_paid']
+    search_fields = ['po_number']
+    ordering = CreatedAtCursorPagination.ordering
+    ordering_fields = ['created_at']
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def replenish(self, request):
+        """Create draft purchase orders for every open reorder recommendation"""
+        return Response(replenishment.replenish(user=request.user))
+
+
+class SaleOrderViewSet(viewsets.ModelViewSet):
+    queryset = SaleOrder.objects.prefetch_related(
+        Prefetch('items', queryset=SaleOrderItem.objects.select_related('product'))
+    )
+    serializer_class = SaleOrderSerializer
+    pagination_class = CreatedAtCursorPagination
+    filterset_fields = ['status', 'customer_email']
+    search_fields = ['order_number', 'customer_name']
+    ordering = CreatedAtCursorPagination.ordering
+    ordering_fields = ['created_at']
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
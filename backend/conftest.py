@@ -0,0 +1,49 @@
+"""
+Shared pytest fixtures
+"""
+
+import itertools
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+
+from apps.inventory.models import Category, Product, Supplier
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='manager', password='secret')
+
+
+@pytest.fixture
+def supplier(db):
+    return Supplier.objects.create(
+        name='Acme Supplies', contact_email='orders@acme.test', contact_phone='0200000000', address='Accra',
+    )
+
+
+@pytest.fixture
+def category(db):
+    return Category.objects.create(name='Hardware')
+
+
+@pytest.fixture
+def make_product(category):
+    """Create products with unique sku and barcode"""
+    counter = itertools.count(1)
+
+    def make(**fields):
+        number = next(counter)
+        values = {
+            'name': f'Product {number}',
+            'sku': f'SKU-{number:04d}',
+            'barcode': f'BC-{number:04d}',
+            'category': category,
+            'brand': 'Acme',
+            'price': Decimal('10.00'),
+            'cost': Decimal('6.00'),
+        }
+        values.update(fields)
+        return Product.objects.create(**values)
+    return make
@@ -5,6 +5,8 @@ Used for background tasks like AI model training and forecasting.
 
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import task_prerun
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -21,22 +23,63 @@ app.autodiscover_tasks()
 
 # Celery Beat Schedule for Periodic Tasks
 app.conf.beat_schedule = {
+    'refresh-sales-metrics': {
+        'task': 'apps.analytics.tasks.refresh_sales_metrics',
+        'schedule': 900.0,  # Execute every 15 minutes
+    },
+    'maintain-partitions-daily': {
+        'task': 'apps.inventory.tasks.maintain_partitions',
+        'schedule': 86400.0,  # Execute every 24 hours
+    },
+    'remove-expired-exports-hourly': {
+        'task': 'apps.inventory.tasks.remove_expired_exports',
+        'schedule': 3600.0,  # Execute every hour
+    },
+    'sync-training-store-daily': {
+        'task': 'apps.analytics.tasks.sync_training_store',
+        'schedule': crontab(hour=0, minute=30),  # After the last metrics refresh of the day
+    },
     'update-forecasts-daily': {
         'task': 'apps.analytics.tasks.update_daily_forecasts',
         'schedule': 86400.0,  # Execute every 24 hours
     },
-    'retrain-models-weekly': {
-        'task': 'apps.analytics.tasks.retrain_models',
+    'score-forecast-models-daily': {
+        'task': 'apps.analytics.tasks.score_forecast_models',
+        'schedule': crontab(hour=1, minute=30),  # After actual sales are recorded
+    },
+    'detect-demand-patterns-weekly': {
+        'task': 'apps.analytics.tasks.detect_demand_patterns',
         'schedule': 604800.0,  # Execute every week
     },
-    'generate-low-stock-alerts': {
-        'task': 'apps.inventory.tasks.check_low_stock_alerts',
-        'schedule': 3600.0,  # Execute every hour
+    'retrain-drifted-models-daily': {
+        'task': 'apps.analytics.tasks.retrain_models',
+        'schedule': crontab(hour=1, minute=0),  # Only products whose forecasts drifted
+    },
+    'optimize-stock-policies-nightly': {
+        'task': 'apps.analytics.tasks.optimize_stock_policies',
+        'schedule': crontab(hour=2, minute=0),  # After the nightly forecasts and scores
+    },
+    'reconcile-stock-alerts-nightly': {
+        'task': 'apps.inventory.tasks.reconcile_stock_alerts',
+        'schedule': crontab(hour=2, minute=15),  # Catches stock and thresholds changed outside the ledger
+    },
+    'replenish-stock-nightly': {
+        'task': 'apps.orders.tasks.replenish_stock',
+        'schedule': crontab(hour=2, minute=30),  # After the nightly recommendations
     },
 }
 
 app.conf.timezone = 'Africa/Accra'
 
+
+@task_prerun.connect
+def reset_database_pin(**kwargs):
+    # Worker processes run many tasks; a write in one task must not keep
+    # the next one off the read replica.
+    from inventory_ai.db_routers import reset_pin
+    reset_pin()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -0,0 +1,191 @@
+"""
+Database routing between the primary and an optional read replica
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+# Wall-clock time until which reads stay on the primary after a write
+_pinned_until = ContextVar('db_pinned_until', default=0.0)
+# Explicit override for the current context: 'replica', 'primary' or None
+_read_preference = ContextVar('db_read_preference', default=None)
+
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': 0.0, 'healthy': False}
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def pin_to_primary(seconds=None):
+    """Keep reads in the current context on the primary for `seconds`"""
+    seconds = settings.REPLICA_PIN_SECONDS if seconds is None else seconds
+    _pinned_until.set(max(_pinned_until.get(), time.time() + seconds))
+
+
+def pinned_until():
+    return _pinned_until.get()
+
+
+def is_pinned():
+    return _pinned_until.get() > time.time()
+
+
+def reset_pin(value=0.0):
+    """Start a new unit of work (request or task); returns a token for restore_pin"""
+    return _pinned_until.set(value)
+
+
+def restore_pin(token):
+    _pinned_until.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Send every read in the block to the replica while it is healthy"""
+    token = _read_preference.set(REPLICA)
+    try:
+        yield
+    finally:
+        _read_preference.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Send every read in the block to the primary"""
+    token = _read_preference.set(PRIMARY)
+    try:
+        yield
+    finally:
+        _read_preference.reset(token)
+
+
+def replica_lag():
+    """Replication lag of the replica in seconds, or None if it is unknown"""
+    try:
+        with connections[REPLICA].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning("Replica lag check failed", exc_info=True)
+        return None
+    return None if lag is None else float(lag)
+
+
+def replica_healthy():
+    """
+    Whether the replica is within REPLICA_MAX_LAG seconds of the primary.
+
+    The result is cached per process for REPLICA_LAG_CHECK_INTERVAL seconds
+    so routing does not add a query to every read.
+    """
+    now = time.monotonic()
+    with _lag_lock:
+        if now - _lag_state['checked_at'] < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return _lag_state['healthy']
+        _lag_state['checked_at'] = now
+
+    lag = replica_lag()
+    healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+    if not healthy:
+        logger.warning("Replica unavailable or lagging (%s seconds); reading from primary", lag)
+    with _lag_lock:
+        _lag_state['healthy'] = healthy
+    return healthy
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes reads of the analytics apps (REPLICA_READ_APPS) to the `replica`
+    database and everything else to `default`.
+
+    Reads fall back to the primary when no replica is configured, when the
+    replica lags more than REPLICA_MAX_LAG seconds, and for
+    REPLICA_PIN_SECONDS after the current request or task wrote anything,
+    so callers always read their own writes. Models listed in
+    REPLICA_EXCLUDED_MODELS (small control rows that are cached or read
+    back right after they change) are always read from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_configured() or is_pinned():
+            return PRIMARY
+        preference = _read_preference.get()
+        if preference == PRIMARY:
+            return PRIMARY
+        if preference != REPLICA:
+            if model._meta.app_label not in settings.REPLICA_READ_APPS:
+                return PRIMARY
+            if model._meta.label_lower in settings.REPLICA_EXCLUDED_MODELS:
+                return PRIMARY
+        return REPLICA if replica_healthy() else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaPinningMiddleware:
+    """
+    Carries the primary pin across requests in a cookie, so a client that
+    just wrote keeps reading from the primary on its next requests until
+    the replica has caught up.
+    """
+
+    COOKIE_NAME = 'db_pinned_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            initial = float(request.COOKIES.get(self.COOKIE_NAME, 0))
+        except ValueError:
+            initial = 0.0
+        if not math.isfinite(initial):
+            initial = 0.0
+        # The cookie is client-controlled: never pin for longer than one write would
+        initial = min(initial, time.time() + settings.REPLICA_PIN_SECONDS)
+        token = reset_pin(initial)
+        try:
+            if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                pin_to_primary()
+            response = self.get_response(request)
+            expires = pinned_until()
+            if replica_configured() and expires > max(initial, time.time()):
+                response.set_cookie(
+                    self.COOKIE_NAME, f"{expires:.3f}",
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+            return response
+        finally:
+            restore_pin(token)
@@ -0,0 +1,277 @@
+"""
+Streaming CSV/XLSX exports of stock movements, sales metrics and orders
+"""
+
+import csv
+import io
+import logging
+import os
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from inventory_ai.db_routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 5000
+# CSV rows written per chunk of the streamed response
+CSV_ROWS_PER_WRITE = 500
+# Rows per XLSX worksheet, including the header (Excel's limit)
+XLSX_MAX_ROWS = 1_048_576
+FORMATS = ('csv', 'xlsx')
+
+# Exportable datasets: the model, the (header, lookup) columns read with
+# values_list, the field that date ranges and ordering apply to, and the
+# query parameters accepted as filters
+DATASETS = {
+    'stock-movements': {
+        'model': 'inventory.StockMovement',
+        'date_field': 'created_at',
+        'filters': {'product': 'product_id', 'movement_type': 'movement_type'},
+        'columns': [
+            ('created_at', 'created_at'),
+            ('sku', 'product__sku'),
+            ('product', 'product__name'),
+            ('movement_type', 'movement_type'),
+            ('quantity', 'quantity'),
+            ('reference_number', 'reference_number'),
+            ('notes', 'notes'),
+            ('created_by', 'created_by__username'),
+            ('po_number', 'purchase_order__po_number'),
+            ('order_number', 'sale_order__order_number'),
+        ],
+    },
+    'sales-metrics': {
+        'model': 'analytics.SalesMetrics',
+        'date_field': 'date',
+        'filters': {'product': 'product_id'},
+        'columns': [
+            ('date', 'date'),
+            ('sku', 'product__sku'),
+            ('product', 'product__name'),
+            ('quantity_sold', 'quantity_sold'),
+            ('revenue', 'revenue'),
+            ('opening_stock', 'opening_stock'),
+            ('closing_stock', 'closing_stock'),
+            ('stock_in', 'stock_in'),
+            ('stock_out', 'stock_out'),
+            ('is_holiday', 'is_holiday'),
+            ('is_weekend', 'is_weekend'),
+        ],
+    },
+    'purchase-orders': {
+        'model': 'orders.PurchaseOrderItem',
+        'date_field': 'purchase_order__created_at',
+        'filters': {'supplier': 'purchase_order__supplier_id', 'status': 'purchase_order__status'},
+        'columns': [
+            ('po_number', 'purchase_order__po_number'),
+            ('order_date', 'purchase_order__order_date'),
+            ('supplier', 'purchase_order__supplier__name'),
+            ('status', 'purchase_order__status'),
+            ('sku', 'product__sku'),
+            ('product', 'product__name'),
+            ('quantity', 'quantity'),
+            ('quantity_delivered', 'quantity_delivered'),
+            ('unit_price', 'unit_price'),
+            ('total_price', 'total_price'),
+            ('order_subtotal', 'purchase_order__subtotal'),
+            ('order_tax', 'purchase_order__tax_amount'),
+            ('order_total', 'purchase_order__total_amount'),
+            ('is_paid', 'purchase_order__is_paid'),
+        ],
+    },
+    'sale-orders': {
+        'model': 'orders.SaleOrderItem',
+        'date_field': 'sale_order__created_at',
+        'filters': {'status': 'sale_order__status'},
+        'columns': [
+            ('order_number', 'sale_order__order_number'),
+            ('order_date', 'sale_order__order_date'),
+            ('customer', 'sale_order__customer_name'),
+            ('customer_email', 'sale_order__customer_email'),
+            ('status', 'sale_order__status'),
+            ('sku', 'product__sku'),
+            ('product', 'product__name'),
+            ('quantity', 'quantity'),
+            ('unit_price', 'unit_price'),
+            ('total_price', 'total_price'),
+            ('order_subtotal', 'sale_order__subtotal'),
+            ('order_tax', 'sale_order__tax_amount'),
+            ('order_total', 'sale_order__total_amount'),
+        ],
+    },
+}
+
+
+def headers(name):
+    return [header for header, _ in DATASETS[name]['columns']]
+
+
+def _day_bound(model, date_field, value):
+    """Range bound for `date_field`: the date itself, or local midnight for datetimes"""
+    field = model._meta.get_field(date_field.split('__')[0])
+    if '__' in date_field:
+        field = field.related_model._meta.get_field(date_field.split('__')[1])
+    if field.get_internal_type() == 'DateTimeField':
+        return timezone.make_aware(datetime.combine(value, time.min))
+    return value
+
+
+def export_queryset(name, start_date=None, end_date=None, filters=None):
+    """
+    values_list queryset of dataset `name` between two dates (inclusive),
+    ordered by its date field, with optional `filters` by query parameter
+    name. Raises ValueError for unknown datasets or filters.
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Unknown export: {name}")
+    spec = DATASETS[name]
+    model = apps.get_model(spec['model'])
+    rows = model.objects.all()
+    date_field = spec['date_field']
+    if start_date:
+        rows = rows.filter(**{f'{date_field}__gte': _day_bound(model, date_field, start_date)})
+    if end_date:
+        rows = rows.filter(**{f'{date_field}__lt': _day_bound(model, date_field, end_date + timedelta(days=1))})
+    for key, value in (filters or {}).items():
+        if key not in spec['filters']:
+            raise ValueError(f"Unknown filter for {name}: {key}")
+        rows = rows.filter(**{spec['filters'][key]: value})
+    return rows.order_by(date_field, 'pk').values_list(*[lookup for _, lookup in spec['columns']])
+
+
+def iter_rows(name, start_date=None, end_date=None, filters=None):
+    """
+    Stream the dataset's rows as tuples through a server-side cursor,
+    EXPORT_CHUNK_SIZE rows at a time, from the replica when it is healthy.
+
+    The cursor is read inside a transaction: outside one, PostgreSQL would
+    materialize the whole result before returning the first row.
+    """
+    queryset = export_queryset(name, start_date, end_date, filters)
+    with replica_reads():
+        database = router.db_for_read(queryset.model)
+    with transaction.atomic(using=database):
+        yield from queryset.using(database).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _cell(value):
+    """Plain value for a spreadsheet cell"""
+    if isinstance(value, datetime):
+        # xlsxwriter cannot store timezone-aware datetimes
+        return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def stream_csv(name, rows):
+    """Yield the CSV text of a header row and `rows`, a few hundred rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers(name))
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([timezone.localtime(value).isoformat() if isinstance(value, datetime) else value
+                         for value in row])
+        if count % CSV_ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(path, name, rows):
+    """
+    Write the dataset to an XLSX file with xlsxwriter in constant-memory
+    mode, which flushes every row to disk as it is written. Rows beyond
+    Excel's sheet limit continue on further sheets. Returns the number of
+    data rows written.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        columns = headers(name)
+        sheet, row_index, written = None, XLSX_MAX_ROWS, 0
+        for row in rows:
+            if row_index >= XLSX_MAX_ROWS:
+                sheet = workbook.add_worksheet(f"{name[:25]}-{len(workbook.worksheets()) + 1}")
+                sheet.write_row(0, 0, columns)
+                row_index = 1
+            for column, value in enumerate(row):
+                value = _cell(value)
+                if isinstance(value, datetime):
+                    sheet.write_datetime(row_index, column, value, datetime_format)
+                elif isinstance(value, date):
+                    sheet.write_datetime(row_index, column, datetime.combine(value, time.min), date_format)
+                elif value is None:
+                    continue
+                else:
+                    sheet.write(row_index, column, value)
+            row_index += 1
+            written += 1
+        if sheet is None:
+            workbook.add_worksheet(name[:31]).write_row(0, 0, columns)
+    finally:
+        workbook.close()
+    return written
+
+
+def export_path(name, export_format, export_id):
+    return os.path.join(settings.EXPORT_PATH, f"{name}-{export_id}.{export_format}")
+
+
+def remove_expired_exports(now=None):
+    """
+    Remove export files last written more than EXPORT_RETENTION_HOURS ago.
+    Returns the number of files removed.
+    """
+    cutoff = (now or timezone.now()).timestamp() - settings.EXPORT_RETENTION_HOURS * 3600
+    removed = 0
+    try:
+        entries = list(os.scandir(settings.EXPORT_PATH))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+            continue
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+    if removed:
+        logger.info("Removed %s expired export files", removed)
+    return removed
+
+
+def write_export(name, export_format, path, start_date=None, end_date=None, filters=None):
+    """Write a dataset to `path` as CSV or XLSX; returns the number of rows"""
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = iter_rows(name, start_date, end_date, filters)
+    if export_format == 'xlsx':
+        return write_xlsx(path, name, rows)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    with open(path, 'w', newline='') as handle:
+        for chunk in stream_csv(name, counted()):
+            handle.write(chunk)
+    return count
@@ -0,0 +1,249 @@
+"""
+Monthly range partitioning for the large time series tables
+
+StockMovement (by created_at) and SalesMetrics (by date) are append-mostly
+and by far the biggest tables. Postgres declarative partitioning keeps each
+month in its own table, so time-bounded queries only scan the partitions
+they need, vacuum and index maintenance work on small tables, and old
+months are removed by detaching a partition instead of a mass DELETE.
+
+Partitions are named `<table>_pYYYY_MM`, and each table also has a
+`<table>_default` partition so rows outside the prepared range are never
+rejected.
+"""
+
+import logging
+import re
+from datetime import date
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionSpec:
+    """A model table partitioned by month on one of its date/datetime columns"""
+
+    def __init__(self, model_label, column, retention_setting):
+        self.model_label = model_label
+        self.column = column
+        self.retention_setting = retention_setting
+
+    @property
+    def retention_months(self):
+        # 0 keeps every partition
+        return getattr(settings, self.retention_setting)
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    def partition_name(self, month):
+        return f"{self.table}_p{month.year:04d}_{month.month:02d}"
+
+
+PARTITIONED_TABLES = [
+    PartitionSpec('inventory.StockMovement', 'created_at', 'STOCK_MOVEMENT_RETENTION_MONTHS'),
+    PartitionSpec('analytics.SalesMetrics', 'date', 'SALES_METRICS_RETENTION_MONTHS'),
+]
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(spec):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [spec.table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(spec):
+    """Monthly partitions of a table as (month, partition name), oldest first"""
+    pattern = re.compile(rf"^{re.escape(spec.table)}_p(\d{{4}})_(\d{{2}})$")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [spec.table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def create_partition(spec, month):
+    """Create the partition holding `month` if it does not exist yet"""
+    qn = connection.ops.quote_name
+    upper = add_months(month, 1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(spec.partition_name(month))} "
+            f"PARTITION OF {qn(spec.table)} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+
+
+def ensure_partitions(spec, months_ahead, today=None):
+    """Create partitions from the current month up to `months_ahead` months ahead"""
+    current = month_start(today or timezone.localdate())
+    for offset in range(months_ahead + 1):
+        create_partition(spec, add_months(current, offset))
+
+
+def detach_partitions_before(spec, cutoff, archive_schema=None, drop=False):
+    """
+    Detach every monthly partition that ends on or before `cutoff`.
+
+    Detached partitions are moved to `archive_schema` when given, dropped
+    when `drop` is set, and otherwise left as standalone tables. Returns
+    the names of the partitions detached.
+    """
+    qn = connection.ops.quote_name
+    detached = []
+    for month, name in list_partitions(spec):
+        if add_months(month, 1) > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(spec.table)} DETACH PARTITION {qn(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            elif archive_schema:
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {qn(archive_schema)}")
+                cursor.execute(f"ALTER TABLE {qn(name)} SET SCHEMA {qn(archive_schema)}")
+        logger.info("Detached partition %s", name)
+        detached.append(name)
+    return detached
+
+
+def convert_to_partitioned(spec, months_ahead):
+    """
+    Rebuild an existing plain table as a partitioned table.
+
+    The table is renamed to `<table>_legacy`, a partitioned table with the
+    same columns, defaults, constraints and indexes is created in its place
+    (the primary key becomes (id, <partition column>), as Postgres requires
+    the partition key in every unique constraint), monthly partitions are
+    created for the existing data and the rows are copied across. The new
+    table gets its own id identity, restarted above the highest copied id,
+    so dropping the legacy table does not take the id sequence with it.
+    Runs in one transaction and takes an exclusive lock, so use a
+    maintenance window. The legacy table is kept for verification, without
+    its foreign keys, and must be dropped manually.
+    """
+    qn = connection.ops.quote_name
+    table = spec.table
+    legacy = f"{table}_legacy"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE contype = 'p')",
+            [table],
+        )
+        index_definitions = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min({qn(spec.column)}), max({qn(spec.column)}) FROM {qn(table)}")
+        oldest, newest = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        cursor.execute(
+            "SELECT conname, contype FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')",
+            [legacy],
+        )
+        for constraint, kind in cursor.fetchall():
+            if kind == 'f':
+                # The legacy copy must not keep referenced rows (products,
+                # orders, users) from being deleted
+                cursor.execute(f"ALTER TABLE {qn(legacy)} DROP CONSTRAINT {qn(constraint)}")
+            else:
+                cursor.execute(
+                    f"ALTER TABLE {qn(legacy)} RENAME CONSTRAINT {qn(constraint)} TO {qn(constraint + '_legacy')}"
+                )
+        for name, _ in index_definitions:
+            cursor.execute(f"ALTER INDEX IF EXISTS {qn(name)} RENAME TO {qn(name + '_legacy')}")
+
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} "
+            f"(LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE ({qn(spec.column)})"
+        )
+        cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [table])
+        if not cursor.fetchone()[0]:
+            # Tables created before Django 4.1 have serial ids, whose copied
+            # default still draws from the legacy table's sequence
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ALTER COLUMN id DROP DEFAULT, "
+                f"ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY"
+            )
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(spec.column)})")
+        for name, definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+        cursor.execute(f"CREATE TABLE {qn(table + '_default')} PARTITION OF {qn(table)} DEFAULT")
+
+        if oldest is not None:
+            month = month_start(oldest)
+            while month <= month_start(newest):
+                create_partition(spec, month)
+                month = add_months(month, 1)
+        ensure_partitions(spec, months_ahead)
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+        cursor.execute(f"SELECT COALESCE(max(id), 0) + 1 FROM {qn(table)}")
+        (next_id,) = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id RESTART WITH {int(next_id)}")
+    logger.info("Converted %s to a partitioned table", table)
+
+
+def maintain_partitions(today=None):
+    """
+    Create upcoming partitions and detach expired ones for every
+    partitioned table. Tables that have not been converted are skipped.
+    Returns {table: {'created_through': month, 'detached': [names]}}.
+    """
+    current = month_start(today or timezone.localdate())
+    summary = {}
+    for spec in PARTITIONED_TABLES:
+        if not is_partitioned(spec):
+            logger.warning("%s is not partitioned; run manage.py partition_tables --convert", spec.table)
+            continue
+        ensure_partitions(spec, settings.PARTITION_MONTHS_AHEAD, today=current)
+        detached = []
+        if spec.retention_months:
+            cutoff = add_months(current, -spec.retention_months)
+            detached = detach_partitions_before(spec, cutoff, archive_schema=settings.PARTITION_ARCHIVE_SCHEMA)
+        summary[spec.table] = {
+            'created_through': add_months(current, settings.PARTITION_MONTHS_AHEAD).isoformat(),
+            'detached': detached,
+        }
+    return summary
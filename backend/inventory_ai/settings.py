@@ -4,6 +4,7 @@ AI-Based Inventory Management System
 """
 
 import os
+from decimal import Decimal
 from pathlib import Path
 from decouple import config
 
@@ -48,6 +49,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'inventory_ai.db_routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,9 +90,39 @@ DATABASES = {
     }
 }
 
+# Optional streaming replica for analytics reads and model training
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['inventory_ai.db_routers.PrimaryReplicaRouter']
+REPLICA_READ_APPS = ['analytics']
+REPLICA_EXCLUDED_MODELS = ['analytics.forecastmodel', 'analytics.aggregationcheckpoint']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)  # Read-your-writes window
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=10.0, cast=float)  # Seconds
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=5.0, cast=float)  # Seconds
+
 # Redis Configuration for Celery
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'inventory_ai',
+    },
+}
+FORECAST_CACHE_ALIAS = 'default'
+FORECAST_CACHE_TIMEOUT = 60 * 60 * 36  # Survives until the next nightly refill
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -99,6 +131,16 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Model fitting runs on dedicated workers (`celery -A inventory_ai worker -Q ml`)
+# so the default queue never loads the ML backends
+CELERY_TASK_ROUTES = {
+    'apps.analytics.tasks.forecast_product_chunk': {'queue': 'ml'},
+    'apps.analytics.tasks.retrain_product_chunk': {'queue': 'ml'},
+    'apps.analytics.tasks.sync_training_store': {'queue': 'ml'},
+    'apps.analytics.tasks.detect_demand_patterns': {'queue': 'ml'},
+    'apps.analytics.tasks.backtest_product_chunk': {'queue': 'ml'},
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -130,6 +172,12 @@ STATICFILES_DIRS = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploaded import files, read by the Celery workers (must be shared storage)
+IMPORT_UPLOAD_PATH = os.path.join(MEDIA_ROOT, 'imports')
+# Export files written by the Celery workers and served for download
+EXPORT_PATH = os.path.join(MEDIA_ROOT, 'exports')
+# Hours an export file is kept for download before the hourly cleanup removes it
+EXPORT_RETENTION_HOURS = config('EXPORT_RETENTION_HOURS', default=24, cast=int)
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -166,7 +214,62 @@ PAYSTACK_SECRET_KEY = config('PAYSTACK_SECRET_KEY', default='sk_live_51651750490
 
 # AI Model Configuration
 AI_MODELS_PATH = os.path.join(BASE_DIR, 'ai_models')
+TRAINING_STORE_PATH = os.path.join(AI_MODELS_PATH, 'training_store')
 FORECASTING_PERIOD_DAYS = config('FORECASTING_PERIOD_DAYS', default=30, cast=int)
+FORECAST_CHUNK_SIZE = config('FORECAST_CHUNK_SIZE', default=200, cast=int)
+FORECAST_PRODUCT_TIME_BUDGET = config('FORECAST_PRODUCT_TIME_BUDGET', default=20, cast=int)  # Seconds
+AI_MODEL_CACHE_BYTES = config('AI_MODEL_CACHE_BYTES', default=512 * 1024 * 1024, cast=int)
+STARTUP_TIME_BUDGET = config('STARTUP_TIME_BUDGET', default=3.0, cast=float)  # Seconds
+
+# Selective retraining: a product is retrained when its recent forecast error
+# (WAPE) or bias crosses a threshold, or its parameters are older than the max age
+RETRAIN_ERROR_THRESHOLD = config('RETRAIN_ERROR_THRESHOLD', default=0.35, cast=float)
+RETRAIN_BIAS_THRESHOLD = config('RETRAIN_BIAS_THRESHOLD', default=0.2, cast=float)
+RETRAIN_MAX_AGE_DAYS = config('RETRAIN_MAX_AGE_DAYS', default=90, cast=int)
+
+# ARIMA order search: seconds per product, seconds per run, and worker
+# processes outside Celery (0 uses every CPU)
+ARIMA_SEARCH_PRODUCT_BUDGET = config('ARIMA_SEARCH_PRODUCT_BUDGET', default=30, cast=int)
+ARIMA_SEARCH_TOTAL_BUDGET = config('ARIMA_SEARCH_TOTAL_BUDGET', default=1800, cast=int)
+ARIMA_SEARCH_PROCESSES = config('ARIMA_SEARCH_PROCESSES', default=0, cast=int)
+
+# Rolling-origin backtests: number of forecast origins and the days between them
+BACKTEST_ORIGINS = config('BACKTEST_ORIGINS', default=8, cast=int)
+BACKTEST_STEP_DAYS = config('BACKTEST_STEP_DAYS', default=7, cast=int)
+
+# Stock policy optimization: target probability of not stocking out during
+# a lead time, cost of placing one order, and annual holding cost as a share
+# of unit cost
+STOCK_SERVICE_LEVEL = config('STOCK_SERVICE_LEVEL', default=0.95, cast=float)
+STOCK_ORDERING_COST = config('STOCK_ORDERING_COST', default=50.0, cast=float)
+STOCK_HOLDING_COST_RATE = config('STOCK_HOLDING_COST_RATE', default=0.25, cast=float)
+STOCK_RECOMMENDATION_TTL_DAYS = config('STOCK_RECOMMENDATION_TTL_DAYS', default=2, cast=int)
+
+# Monte Carlo stock policy simulation: demand paths, days simulated, and
+# worker processes outside Celery (0 uses every CPU)
+SIMULATION_PATHS = config('SIMULATION_PATHS', default=1000, cast=int)
+SIMULATION_DAYS = config('SIMULATION_DAYS', default=90, cast=int)
+SIMULATION_PROCESSES = config('SIMULATION_PROCESSES', default=0, cast=int)
+# Nightly stock policy runs keep a product's thresholds when the candidates
+# simulate to a fill rate lower by more than this tolerance, using fewer
+# paths than an on-demand simulation
+STOCK_POLICY_SIMULATION_PATHS = config('STOCK_POLICY_SIMULATION_PATHS', default=200, cast=int)
+STOCK_POLICY_FILL_RATE_TOLERANCE = config('STOCK_POLICY_FILL_RATE_TOLERANCE', default=0.005, cast=float)
+
+# Automatic replenishment: creator of generated purchase orders (the first
+# superuser when empty) and the tax rate applied to their subtotal
+REPLENISHMENT_USERNAME = config('REPLENISHMENT_USERNAME', default='')
+PURCHASE_TAX_RATE = config('PURCHASE_TAX_RATE', default='0', cast=Decimal)
+
+# SalesMetrics refresh: minutes of rows re-read before the previous run, so
+# transactions that commit late are still picked up
+SALES_METRICS_LOOKBACK_MINUTES = config('SALES_METRICS_LOOKBACK_MINUTES', default=180, cast=int)
+
+# Monthly partitions of StockMovement and SalesMetrics (0 months keeps everything)
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=3, cast=int)
+PARTITION_ARCHIVE_SCHEMA = config('PARTITION_ARCHIVE_SCHEMA', default='archive')
+STOCK_MOVEMENT_RETENTION_MONTHS = config('STOCK_MOVEMENT_RETENTION_MONTHS', default=0, cast=int)
+SALES_METRICS_RETENTION_MONTHS = config('SALES_METRICS_RETENTION_MONTHS', default=0, cast=int)
 
 # Logging
 LOGGING = {